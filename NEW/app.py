@@ -6,6 +6,11 @@ import os
 from functools import wraps
 from mysql.connector import Error as DBError
 from contextlib import closing
+import sys
+
+# shared helpers live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sql_profiler import SQLProfiler
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
@@ -23,13 +28,22 @@ db_config = {
 #  HELPER FUNCTIONS
 # ======================
 
+# Query timing per endpoint, slow-query log and N+1 detection (SQL_PROFILE=0 disables)
+sql_profiler = None
+if os.environ.get('SQL_PROFILE', '1') != '0':
+    sql_profiler = SQLProfiler(
+        slow_ms=float(os.environ.get('SLOW_QUERY_MS', 200)),
+        n_plus_one=int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10)),
+        explain_connect=lambda: mysql.connector.connect(**db_config),
+    )
+
 def get_db_connection():
     """Establish database connection with error handling"""
     try:
         conn = mysql.connector.connect(**db_config)
         if conn.is_connected():
             print("✅ Database connection successful")
-            return conn
+            return sql_profiler.wrap(conn) if sql_profiler else conn
         print("❌ Database connection failed")
         return None
     except DBError as err:
@@ -93,6 +107,13 @@ def login_required(role=None):
 def before_request():
     """Refresh session lifetime with each request"""
     session.permanent = True
+    if sql_profiler:
+        sql_profiler.begin(request.endpoint)
+
+@app.teardown_request
+def teardown_request(exc):
+    if sql_profiler:
+        sql_profiler.end()
 
 @app.route('/')
 def home():
@@ -350,34 +371,41 @@ def book_appointment():
             SELECT day_of_week, start_time, end_time
             FROM DoctorSchedules
             WHERE doctor_id = %s
+            ORDER BY start_time
         """, (selected_doctor,), fetch='all')
 
+        # DoctorSchedules keeps day names; map each to date.weekday() (Monday = 0) once,
+        # keeping the first schedule row per day
+        weekdays = {name: i for i, name in enumerate(
+            ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'])}
+        by_weekday = {}
+        for schedule in schedules or []:
+            weekday = weekdays.get(str(schedule['day_of_week']).strip().lower())
+            if weekday is not None:
+                by_weekday.setdefault(weekday, schedule)
+
         today = date.today()
         for i in range(30):  # check next 30 days
             check_date = today + timedelta(days=i)
-            weekday = check_date.strftime('%A')
-
-            for schedule in schedules:
-                if schedule['day_of_week'] == weekday:
-                    available_dates.append(check_date.isoformat())
-
-                    # Generate available time slots (30-minute intervals)
-                    start_time = schedule['start_time']
-                    end_time = schedule['end_time']
-                    if isinstance(start_time, timedelta):
-                        start_time = (datetime.min + start_time).time()
-                    if isinstance(end_time, timedelta):
-                        end_time = (datetime.min + end_time).time()
-
-                    slot = datetime.combine(check_date, start_time)
-                    end_slot = datetime.combine(check_date, end_time)
-                    
-
-                    while slot < end_slot:
-                        time_slots.append(slot.strftime('%H:%M'))
-                        slot += timedelta(minutes=30)
-
-                    break  # matched this day, no need to check more
+            schedule = by_weekday.get(check_date.weekday())
+            if schedule is None:
+                continue
+            available_dates.append(check_date.isoformat())
+
+            # Generate available time slots (30-minute intervals)
+            start_time = schedule['start_time']
+            end_time = schedule['end_time']
+            if isinstance(start_time, timedelta):
+                start_time = (datetime.min + start_time).time()
+            if isinstance(end_time, timedelta):
+                end_time = (datetime.min + end_time).time()
+
+            slot = datetime.combine(check_date, start_time)
+            end_slot = datetime.combine(check_date, end_time)
+
+            while slot < end_slot:
+                time_slots.append(slot.strftime('%H:%M'))
+                slot += timedelta(minutes=30)
 
     # Handle booking submission
     if request.method == 'POST' and selected_doctor and date_str and time_str:
@@ -794,6 +822,14 @@ def add_department():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
     
+@app.route('/admin/perf')
+@login_required(role='admin')
+def admin_perf():
+    """Per-endpoint query counts and times, N+1 suspects and slow queries (debug only)"""
+    if not app.debug or not sql_profiler:
+        return jsonify({'success': False, 'message': 'Not found'}), 404
+    return jsonify(sql_profiler.report(top=int(request.args.get('top', 25))))
+
 # ======================
 #  INITIALIZATION
 # ======================
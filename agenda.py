@@ -0,0 +1,209 @@
+"""
+Per-doctor agenda for the doctor dashboard.
+
+`AgendaCache.get(connect, user_id)` loads a doctor's header (name,
+specialization) and every appointment from today through today + `days` in two
+queries, then serves later refreshes from memory until the day changes or `ttl`
+expires. `connect` is only called on a load, so a cached refresh doesn't even
+check a connection out of the pool.
+
+`record_change(cur, before, after)` is registered with
+`booking.on_appointment_change`, so bookings, cancellations, completions,
+reschedules and deletes update a cached agenda in place. A pure status change
+reuses the cached row; a booking or reschedule costs one primary-key lookup
+(reason, patient name and phone) inside the writer's transaction, and only when
+that doctor's agenda is cached.
+
+The cache is per process. With `generation(doctor_id)` (a factory of
+ref_cache.Generation tokens, one per doctor) the listener also bumps the
+doctor's token, and `get()` checks it before serving a cached agenda, so a
+change made by another worker is seen within the token's interval. The bump
+happens before the writer commits, so an agenda reloaded because of it is
+served once and loaded again on the next refresh. A change rolled back after
+the listener ran is picked up when `ttl` expires.
+
+`section(rows)` gives a JSON-ready list and a content tag for one part of the
+page, so a polling client can fetch only the sections whose tag changed.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import date, timedelta
+
+from availability import to_minutes
+
+DETAIL_COLUMNS = ('reason', 'patient_name', 'phone')
+
+
+def as_time(value):
+    """TIME values as timedelta (how MySQL returns them), whatever the writer passed."""
+    if value is None or isinstance(value, timedelta):
+        return value
+    minutes = to_minutes(value)
+    return timedelta(minutes=minutes) if minutes is not None else None
+
+
+def as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+class AgendaCache:
+    def __init__(self, days=10, upcoming_limit=15, ttl=300, generation=None):
+        self.days = days
+        self.upcoming_limit = upcoming_limit
+        self.ttl = ttl
+        self.generation = generation    # doctor_id -> ref_cache.Generation bumped by writers in any process
+        self._generations = {}          # doctor_id -> Generation
+        self._lock = threading.Lock()
+        self._agendas = {}     # doctor_id -> {'doctor', 'day', 'loaded_at', 'rows': {appointment_id: row}}
+        self._doctors = {}     # user_id -> doctor_id
+        self._changes = {}     # doctor_id -> appointment writes seen, to detect a write racing a load
+        self._counters = {'hits': 0, 'loads': 0, 'updates': 0}
+
+    # ---------- reads ----------
+    def get(self, connect, user_id, today=None):
+        """The doctor's agenda, or None if this user has no doctor row."""
+        today = today or date.today()
+        with self._lock:
+            doctor_id = self._doctors.get(user_id)
+            agenda = self._agendas.get(doctor_id)
+            fresh = agenda and agenda['day'] == today and time.monotonic() - agenda['loaded_at'] < self.ttl
+        if fresh and not self._changed_elsewhere(doctor_id):
+            with self._lock:
+                self._counters['hits'] += 1
+            return agenda
+        return self._load(connect(), user_id, today, reload_next=bool(fresh))
+
+    def _token(self, doctor_id):
+        with self._lock:
+            token = self._generations.get(doctor_id)
+            if token is None:
+                token = self._generations[doctor_id] = self.generation(doctor_id)
+            return token
+
+    def _changed_elsewhere(self, doctor_id):
+        return self.generation is not None and self._token(doctor_id).changed()
+
+    def _load(self, conn, user_id, today, reload_next=False):
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("""
+                SELECT d.doctor_id,
+                       COALESCE(u.full_name, u.username, 'Dr. Unknown') AS doctor_name,
+                       COALESCE(d.specialization, 'General') AS specialization
+                FROM doctors d
+                JOIN users u ON d.user_id = u.user_id
+                WHERE u.user_id = %s
+            """, (user_id,))
+            doctor = cur.fetchone()
+            if not doctor:
+                return None
+            doctor_id = doctor['doctor_id']
+            # note the shared token before reading, so a bump during the load is seen next time
+            self._changed_elsewhere(doctor_id)
+            with self._lock:
+                seen = self._changes.get(doctor_id, 0)
+            cur.execute("""
+                SELECT a.appointment_id, a.appointment_date, a.start_time, a.reason, a.status,
+                       COALESCE(u.full_name, u.username, 'Patient') AS patient_name,
+                       COALESCE(u.phone, '—') AS phone
+                FROM appointments a
+                LEFT JOIN users u ON a.user_id = u.user_id
+                WHERE a.doctor_id = %s AND a.appointment_date BETWEEN %s AND %s
+            """, (doctor_id, today, today + timedelta(days=self.days)))
+            rows = {row['appointment_id']: row for row in cur.fetchall()}
+
+        agenda = {'doctor': doctor, 'day': today, 'loaded_at': time.monotonic(), 'rows': rows}
+        with self._lock:
+            self._counters['loads'] += 1
+            if reload_next or self._changes.get(doctor_id, 0) != seen:
+                # a write landed between the two queries, or another worker's write may not have
+                # committed yet; serve this copy once, reload next time
+                agenda['loaded_at'] = float('-inf')
+            self._agendas[doctor_id] = agenda
+            self._doctors[user_id] = doctor_id
+        return agenda
+
+    def view(self, agenda):
+        """(today's appointments, upcoming appointments) in time order, as the dashboard lists them."""
+        with self._lock:
+            rows = sorted(agenda['rows'].values(), key=lambda r: (r['appointment_date'], r['start_time']))
+        today = [r for r in rows if r['appointment_date'] == agenda['day']]
+        return today, rows[:self.upcoming_limit]
+
+    # ---------- writes ----------
+    def record_change(self, cur, before, after):
+        """Appointment change listener: `before`/`after` are row snapshots, None for insert/delete."""
+        doctor_ids = {int(snapshot['doctor_id']) for snapshot in (before, after) if snapshot}
+        with self._lock:
+            for doctor_id in doctor_ids:
+                self._changes[doctor_id] = self._changes.get(doctor_id, 0) + 1
+        if self.generation is not None:
+            for doctor_id in doctor_ids:
+                self._token(doctor_id).bump()
+            target = self._agendas.get(after['doctor_id']) if after else None
+            cached = target['rows'].get(after['appointment_id']) if target else None
+        row = None
+        if target is not None and self._in_window(target, as_date(after['appointment_date'])):
+            row = dict(after, appointment_date=as_date(after['appointment_date']),
+                       start_time=as_time(after['start_time']))
+            row.pop('user_id', None)
+            row.pop('doctor_id', None)
+            status_only = cached is not None and before is not None and all(
+                before[k] == after[k] for k in after if k != 'status')
+            if not status_only:
+                cur.execute("""
+                    SELECT a.reason, COALESCE(u.full_name, u.username, 'Patient'), COALESCE(u.phone, '—')
+                    FROM appointments a
+                    LEFT JOIN users u ON a.user_id = u.user_id
+                    WHERE a.appointment_id = %s
+                """, (after['appointment_id'],))
+                found = cur.fetchone()
+                if found is None:
+                    row = None
+                else:
+                    row.update(zip(DETAIL_COLUMNS, found))
+            else:
+                row.update((c, cached[c]) for c in DETAIL_COLUMNS)
+        with self._lock:
+            if before:
+                agenda = self._agendas.get(before['doctor_id'])
+                if agenda is not None and agenda['rows'].pop(before['appointment_id'], None) is not None:
+                    self._counters['updates'] += 1
+            if row is not None and self._agendas.get(after['doctor_id']) is target:
+                target['rows'][after['appointment_id']] = row
+                self._counters['updates'] += 1
+
+    def _in_window(self, agenda, day):
+        return agenda['day'] <= day <= agenda['day'] + timedelta(days=self.days)
+
+    def invalidate(self, doctor_id=None):
+        """Drop one doctor's agenda (e.g. after a profile change) in every process, or all of them in this one."""
+        with self._lock:
+            if doctor_id is None:
+                self._agendas.clear()
+                self._doctors.clear()
+            else:
+                self._agendas.pop(int(doctor_id), None)
+        if doctor_id is not None and self.generation is not None:
+            self._token(int(doctor_id)).bump()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, doctors=len(self._agendas))
+
+
+def section(rows):
+    """(JSON-ready appointments, content tag) for one part of the agenda."""
+    items = [{
+        'appointment_id': r['appointment_id'],
+        'appointment_date': r['appointment_date'].isoformat(),
+        'start_time': '%02d:%02d' % divmod(to_minutes(r['start_time']) or 0, 60),
+        'reason': r['reason'],
+        'status': r['status'],
+        'patient_name': r['patient_name'],
+        'phone': r['phone'],
+    } for r in rows]
+    tag = hashlib.sha256(json.dumps(items, sort_keys=True).encode()).hexdigest()[:16]
+    return items, tag
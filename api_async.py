@@ -0,0 +1,272 @@
+"""
+Asyncio (ASGI) server for the JSON appointment API.
+
+Serves the JSON endpoints of app.py from an async MySQL pool (aiomysql), so a
+request waiting on MySQL holds a coroutine instead of a worker thread:
+
+- GET /api/doctor-availability/<doctor_id>?date=YYYY-MM-DD
+- GET /api/availability?doctor_ids=1,2&department_id=N&start=...&end=...&first=N
+- GET /doctor/<doctor_id>/profile   (login required; ETag / 304 as in app.py)
+
+Responses are the same as app.py's: weekly templates go through the same
+`availability` helpers and cache, profile documents are built by
+`app.finish_doctor_profile` and kept in the shared ref_cache store (so an
+invalidation made by the Flask app is seen here), and the login cookie is
+checked against the shared SQLite session store (SESSION_BACKEND=sqlite).
+Those SQLite reads and writes (sessions, ref_cache, the availability
+generation check) are blocking, so they run in the default thread pool via
+asyncio.to_thread rather than on the event loop.
+
+The HTML routes stay on the WSGI app. Run both and send the JSON paths here,
+e.g. with nginx:
+
+    location ~ ^/(api/|doctor/\\d+/profile$) { proxy_pass http://127.0.0.1:8001; }
+    location / { proxy_pass http://127.0.0.1:5000; }
+
+Usage:
+    pip install -r requirements-async.txt
+    uvicorn api_async:app --port 8001 [--workers 2]
+
+`ASYNC_DB_POOL_SIZE` [20] bounds the MySQL connections per process; requests
+beyond that wait for a free connection rather than for a free thread.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+import aiomysql
+
+import app as hospital
+from availability import BOOKED_RANGE_SQL, BOOKED_SQL, HOURS_SQL, SCHEDULES_SQL, booked_range_masks, \
+    collect_free, mask_to_slots, slots_mask
+
+POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 20))
+
+availability = hospital.availability
+pool = None
+_pool_lock = asyncio.Lock()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ---------- database ----------
+async def start_pool():
+    global pool
+    async with _pool_lock:
+        if pool is not None:
+            return
+        config = hospital.db_config
+        pool = await aiomysql.create_pool(
+            host=config['host'], user=config['user'], password=config['password'], db=config['database'],
+            minsize=1, maxsize=POOL_SIZE, autocommit=True, pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+        )
+
+
+async def stop_pool():
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+
+async def fetchall(sql, params=(), dictionary=False):
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor if dictionary else aiomysql.Cursor) as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchall()
+
+
+async def weeks(doctor_ids):
+    """Async counterpart of AvailabilityIndex.weeks(), sharing its cache."""
+    if availability.generation is not None and availability.generation.due():
+        # reads the shared ref_cache store; cached() below then skips the check
+        await asyncio.to_thread(availability.refresh)
+    found, missing = availability.cached(doctor_ids)
+    if not missing:
+        return found
+    placeholders = ', '.join(['%s'] * len(missing))
+    available_time = dict(await fetchall(HOURS_SQL.format(placeholders), tuple(missing)))
+    schedules = {doctor_id: [] for doctor_id in available_time}
+    if available_time:
+        for doctor_id, weekday, start, end in await fetchall(SCHEDULES_SQL.format(placeholders), tuple(missing)):
+            if doctor_id in schedules:
+                schedules[doctor_id].append((weekday, start, end))
+    found.update(availability.store(available_time, schedules))
+    return found
+
+
+# ---------- handlers ----------
+async def doctor_availability(request, doctor_id):
+    value = request['args'].get('date')
+    if not value:
+        raise HTTPError(400, 'Date parameter is required')
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPError(400, 'Invalid date format')
+
+    week = (await weeks([doctor_id])).get(doctor_id)
+    if week is None:
+        raise HTTPError(404, 'Doctor not found')
+    offered = week[day.weekday()]
+    if offered:
+        offered &= ~slots_mask(start for (start,) in await fetchall(BOOKED_SQL, (doctor_id, day)))
+    return 200, {'date': day.strftime('%Y-%m-%d'), 'available_slots': mask_to_slots(offered)}, {}
+
+
+async def batch_availability(request):
+    args = request['args']
+    try:
+        start = datetime.strptime(args.get('start', ''), '%Y-%m-%d').date()
+        end = datetime.strptime(args.get('end') or args['start'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        raise HTTPError(400, 'start (and optional end) must be YYYY-MM-DD')
+    if end < start or (end - start).days >= hospital.MAX_AVAILABILITY_DAYS:
+        raise HTTPError(400, f'Date range must be 1-{hospital.MAX_AVAILABILITY_DAYS} days')
+    try:
+        doctor_ids = [int(d) for d in args.get('doctor_ids', '').split(',') if d.strip()]
+        department_id = int(args['department_id']) if args.get('department_id') else None
+        first = int(args['first']) if args.get('first') else None
+    except ValueError:
+        raise HTTPError(400, 'doctor_ids must be a comma separated list of integers')
+    if not doctor_ids and not department_id:
+        raise HTTPError(400, 'doctor_ids or department_id is required')
+    if first is not None and first < 1:
+        raise HTTPError(400, 'first must be a positive integer')
+
+    if department_id:
+        doctor_ids.extend(r[0] for r in await fetchall("""
+            SELECT d.doctor_id
+            FROM doctors d
+            JOIN users u ON d.user_id = u.user_id
+            WHERE d.department_id = %s AND u.is_active = TRUE
+        """, (department_id,)))
+    doctor_ids = sorted(set(doctor_ids))
+    if len(doctor_ids) > hospital.MAX_AVAILABILITY_DOCTORS:
+        raise HTTPError(400, f'At most {hospital.MAX_AVAILABILITY_DOCTORS} doctors per request')
+
+    templates = await weeks(doctor_ids)
+    booked = {}
+    if templates:
+        placeholders = ', '.join(['%s'] * len(templates))
+        booked = booked_range_masks(await fetchall(BOOKED_RANGE_SQL.format(placeholders),
+                                                   (*sorted(templates), start, end)))
+    return 200, {
+        'start': start.strftime('%Y-%m-%d'),
+        'end': end.strftime('%Y-%m-%d'),
+        'availability': [
+            {'doctor_id': doctor_id, 'date': day.strftime('%Y-%m-%d'), 'available_slots': slots}
+            for day, doctor_id, slots in collect_free(templates, booked, start, end, first)
+        ],
+    }, {}
+
+
+async def doctor_profile(request, doctor_id):
+    if not (await load_session(request['headers'])).get('user_id'):
+        raise HTTPError(401, 'login required')
+    key = hospital.doctor_profile_key(doctor_id)
+    cached = await asyncio.to_thread(hospital.ref_cache.peek, key)
+    if cached is None:
+        rows = await fetchall(hospital.DOCTOR_PROFILE_SQL, (doctor_id,), dictionary=True)
+        if not rows:
+            raise HTTPError(404, 'not found')
+        schedules = await fetchall(hospital.DOCTOR_SCHEDULE_SQL, (doctor_id,), dictionary=True)
+        cached = hospital.doctor_profile_entry(hospital.finish_doctor_profile(rows[0], list(schedules)))
+        await asyncio.to_thread(hospital.ref_cache.put, key, cached, hospital.DOCTOR_PROFILE_TTL)
+
+    etag = f'"{cached["etag"]}"'
+    headers = {'etag': etag, 'cache-control': f'private, max-age={hospital.DOCTOR_PROFILE_MAX_AGE}'}
+    if etag in [t.strip() for t in request['headers'].get('if-none-match', '').split(',')]:
+        return 304, None, headers
+    return 200, cached['body'], headers
+
+
+ROUTES = [
+    (re.compile(r'^/api/doctor-availability/(\d+)$'), doctor_availability),
+    (re.compile(r'^/api/availability$'), batch_availability),
+    (re.compile(r'^/doctor/(\d+)/profile$'), doctor_profile),
+]
+
+
+# ---------- ASGI plumbing ----------
+async def load_session(headers):
+    """The Flask session for this request's cookie ({} if none or not logged in)."""
+    cookie = SimpleCookie(headers.get('cookie', ''))
+    name = hospital.app.config.get('SESSION_COOKIE_NAME', 'session')
+    lookup = getattr(hospital.app.session_interface, 'lookup', None)
+    if name not in cookie or lookup is None:
+        return {}
+    return await asyncio.to_thread(lookup, cookie[name].value) or {}
+
+
+async def send_response(send, status, body, headers, head=False):
+    if body is None:
+        payload = b''
+    elif isinstance(body, str):
+        payload = body.encode()
+    else:
+        payload = hospital.app.json.dumps(body).encode()
+    raw_headers = [(b'content-length', str(len(payload)).encode())]
+    if status != 304:
+        raw_headers.append((b'content-type', b'application/json'))
+    raw_headers.extend((k.encode(), v.encode()) for k, v in headers.items())
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': b'' if head or status == 304 else payload})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                await start_pool()
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await stop_pool()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    if pool is None:
+        # servers without lifespan support
+        await start_pool()
+    for pattern, handler in ROUTES:
+        match = pattern.match(scope['path'])
+        if match:
+            break
+    else:
+        return await send_response(send, 404, {'error': 'not found'}, {})
+    if scope['method'] not in ('GET', 'HEAD'):
+        return await send_response(send, 405, {'error': 'method not allowed'}, {'allow': 'GET, HEAD'})
+
+    headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+    request = {
+        'args': {k: v[0] for k, v in parse_qs(scope['query_string'].decode('latin-1')).items()},
+        'headers': headers,
+    }
+    try:
+        status, body, extra = await handler(request, *(int(g) for g in match.groups()))
+    except HTTPError as e:
+        status, body, extra = e.status, {'error': e.message}, {}
+    except Exception as e:
+        logging.exception('Async API error on %s', scope['path'])
+        status, body, extra = 500, {'error': str(e)}, {}
+    await send_response(send, status, body, extra, head=scope['method'] == 'HEAD')
@@ -1,20 +1,51 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, has_app_context, Response, abort
 from flask_session import Session
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime, timedelta, time as dtime
 import mysql.connector
 from mysql.connector import Error
 import os
 import logging
+import threading
+import time
 from functools import wraps
 import hashlib
+import json
+from db_pool import ConnectionPool, PoolExhausted
+from availability import AvailabilityIndex, DAY_NAMES
+from booking import reserve_slot, change_status, delete_appointment, on_appointment_change, SlotTaken
+import dashboard_stats
+import pagination
+from notification_hub import NotificationHub
+from agenda import AgendaCache, section as agenda_section
+from doctor_search import DoctorSearch
+from patient_search import search_patients
+import record_search
+import export
+import rollups
+from session_store import SQLiteSessionInterface
+from password_guard import PasswordHasher, LoginThrottle, Overloaded
+from sql_profiler import SQLProfiler
+from ref_cache import RefCache, MemoryBackend, SQLiteBackend, Generation
 
 app = Flask(__name__)
 # Use a stable secret key from env in production; fallback to random for development
 app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
-app.config['SESSION_TYPE'] = 'filesystem'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=1)
-Session(app)
+# Behind nginx (or any reverse proxy) set TRUSTED_PROXY_HOPS to the number of proxies, so
+# request.remote_addr is the client's address rather than the proxy's (the login throttle keys on it)
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS,
+                            x_host=TRUSTED_PROXY_HOPS)
+# SESSION_BACKEND=filesystem keeps the old Flask-Session pickle files
+if os.environ.get('SESSION_BACKEND', 'sqlite') == 'filesystem':
+    app.config['SESSION_TYPE'] = 'filesystem'
+    Session(app)
+else:
+    app.session_interface = SQLiteSessionInterface(
+        os.environ.get('SESSION_DB_PATH') or os.path.join(app.instance_path, 'sessions.sqlite3'))
 
 def safe_time(obj):
     if obj is None:
@@ -49,14 +80,165 @@ db_config = {
     'database': os.environ.get('DB_NAME', 'HospitalManagementSystem')
 }
 
+db_pool = ConnectionPool(
+    db_config,
+    size=int(os.environ.get('DB_POOL_SIZE', 10)),
+    max_overflow=int(os.environ.get('DB_POOL_MAX_OVERFLOW', 5)),
+    timeout=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    recycle=int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+    leak_timeout=float(os.environ.get('DB_POOL_LEAK_TIMEOUT', 60)),
+)
+
 def get_db_connection():
+    """Borrow a pooled connection.
+
+    Inside a request the same connection is reused by every call and is
+    returned to the pool in teardown, even if the route never closes it.
+    """
     try:
-        connection = mysql.connector.connect(**db_config)
-        return connection
-    except Error as e:
+        if not has_app_context():
+            return db_pool.acquire()
+        conn = g.get('db_conn')
+        if conn is None or conn.released:
+            conn = db_pool.acquire()
+            if sql_profiler:
+                conn = sql_profiler.wrap(conn)
+            g.db_conn = conn
+        return conn
+    except (Error, PoolExhausted) as e:
         logging.exception("Error connecting to MySQL")
         return None
 
+# Query timing per endpoint, slow-query log with EXPLAIN, N+1 detection (SQL_PROFILE=0 disables)
+sql_profiler = None
+if os.environ.get('SQL_PROFILE', '1') != '0':
+    sql_profiler = SQLProfiler(
+        slow_ms=float(os.environ.get('SLOW_QUERY_MS', 200)),
+        n_plus_one=int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10)),
+        # EXPLAINs run on the profiler's thread and are skipped when the pool has nothing free
+        explain_connect=lambda: db_pool.acquire(timeout=0),
+    )
+
+    @app.before_request
+    def begin_sql_profile():
+        sql_profiler.begin(request.endpoint)
+
+    @app.teardown_request
+    def end_sql_profile(exc):
+        sql_profiler.end()
+
+# Doctor directory and department list; invalidate after changing doctors, users or departments
+if os.environ.get('REF_CACHE_BACKEND', 'sqlite') == 'memory':
+    ref_cache = RefCache(MemoryBackend(), ttl=int(os.environ.get('REF_CACHE_TTL', 3600)))
+else:
+    ref_cache = RefCache(
+        SQLiteBackend(os.environ.get('REF_CACHE_DB_PATH') or os.path.join(app.instance_path, 'ref_cache.sqlite3')),
+        ttl=int(os.environ.get('REF_CACHE_TTL', 3600)),
+        local_ttl=float(os.environ.get('REF_CACHE_LOCAL_TTL', 1.0)),
+    )
+DOCTOR_DIRECTORY = 'doctor_directory'
+DEPARTMENTS = 'departments'
+
+# Serialized profile documents (ref_cache); clients may reuse one for max-age seconds, then revalidate
+DOCTOR_PROFILE_TTL = int(os.environ.get('DOCTOR_PROFILE_TTL', 3600))
+DOCTOR_PROFILE_MAX_AGE = int(os.environ.get('DOCTOR_PROFILE_MAX_AGE', 60))
+
+def doctor_directory(conn):
+    """Active doctors with display name and department (cached)."""
+    def load():
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("""
+                SELECT 
+                    d.doctor_id,
+                    d.specialization,
+                    COALESCE(u.full_name, u.username, 'Dr. Unknown') AS display_name,
+                    u.email, u.phone,
+                    dep.name AS department_name
+                FROM doctors d
+                JOIN users u ON d.user_id = u.user_id
+                LEFT JOIN departments dep ON d.department_id = dep.department_id
+                WHERE u.is_active = TRUE
+                LIMIT 50
+            """)
+            return cur.fetchall()
+    return ref_cache.get(DOCTOR_DIRECTORY, load)
+
+def department_list(conn):
+    """All departments ordered by name (cached)."""
+    def load():
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute("SELECT department_id, name FROM departments ORDER BY name")
+            return cur.fetchall()
+    return ref_cache.get(DEPARTMENTS, load)
+
+# Typeahead over doctor names, specializations and departments; call invalidate_doctor_search()
+# with ref_cache.invalidate(DOCTOR_DIRECTORY) (from any process sharing ref_cache)
+DOCTOR_SEARCH_GENERATION = 'doctor_search_generation'
+doctor_search = DoctorSearch(db_pool.acquire, ttl=int(os.environ.get('DOCTOR_SEARCH_TTL', 300)),
+                             generation=Generation(ref_cache, DOCTOR_SEARCH_GENERATION))
+
+def invalidate_doctor_search():
+    doctor_search.invalidate()
+    doctor_search.generation.bump()
+MAX_DOCTOR_SEARCH_RESULTS = 50
+MAX_PATIENT_SEARCH_RESULTS = 25
+
+# Weekly slot templates per doctor; call invalidate_availability() after changing doctor_schedules
+# or doctors.available_time (from any process sharing ref_cache)
+AVAILABILITY_GENERATION = 'availability_generation'
+availability = AvailabilityIndex(ttl=int(os.environ.get('AVAILABILITY_TTL', 300)),
+                                 generation=Generation(ref_cache, AVAILABILITY_GENERATION))
+
+def invalidate_availability():
+    availability.invalidate()
+    availability.generation.bump()
+
+# Admin dashboard counters follow every appointment write (see dashboard_stats.py)
+on_appointment_change(dashboard_stats.record_change)
+stats_reconciler = dashboard_stats.Reconciler(interval=int(os.environ.get('STATS_RECONCILE_SECONDS', 900)))
+
+# Utilization report rollups: adjusted by every appointment write, yesterday rebuilt nightly by cron,
+# or by nightly_rollup's thread in each worker (started by serve.py) if that didn't run (see rollups.py)
+on_appointment_change(rollups.record_change)
+nightly_rollup = rollups.NightlyRollup(availability, interval=int(os.environ.get('ROLLUP_CHECK_SECONDS', 3600)))
+UTILIZATION_DAYS = 28
+MAX_UTILIZATION_DAYS = 366
+
+# Doctor dashboard agendas (today + 10 days), updated in place by every appointment write;
+# other workers see the write through a per-doctor token in ref_cache
+AGENDA_GENERATION = 'agenda_generation'
+doctor_agendas = AgendaCache(days=10, upcoming_limit=15, ttl=int(os.environ.get('AGENDA_CACHE_TTL', 300)),
+                             generation=lambda doctor_id: Generation(ref_cache, f'{AGENDA_GENERATION}:{doctor_id}'))
+on_appointment_change(doctor_agendas.record_change)
+
+# Unread counts, incremental fetch and SSE push for notifications
+notification_hub = NotificationHub(db_pool.acquire, ttl=int(os.environ.get('NOTIFICATION_COUNT_TTL', 30)))
+NOTIFICATION_HEARTBEAT = 15
+# Each stream holds a server thread (but no DB connection) while open, so a worker serves at most
+# NOTIFICATION_STREAMS of them (serve.py adds that many threads on top of DB_POOL_SIZE) and ends
+# each after NOTIFICATION_STREAM_SECONDS; the browser reconnects and resumes from Last-Event-ID
+NOTIFICATION_STREAMS = int(os.environ.get('NOTIFICATION_STREAMS', 50))
+NOTIFICATION_STREAM_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_SECONDS', 300))
+NOTIFICATION_BUSY_RETRY_MS = 30000
+notification_stream_slots = threading.BoundedSemaphore(NOTIFICATION_STREAMS)
+
+# Password hashing runs on a bounded pool; failed logins are throttled per username and IP
+password_hasher = PasswordHasher(
+    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2)),
+    max_queue=int(os.environ.get('PASSWORD_HASH_QUEUE', 16)),
+)
+login_throttle = LoginThrottle(
+    max_per_user=int(os.environ.get('LOGIN_MAX_FAILURES_PER_USER', 5)),
+    max_per_ip=int(os.environ.get('LOGIN_MAX_FAILURES_PER_IP', 20)),
+    window=int(os.environ.get('LOGIN_FAILURE_WINDOW', 300)),
+)
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.close()
+
 
 # ----------------- DECORATORS -----------------
 def login_required(f):
@@ -101,6 +283,11 @@ def login():
         username = request.form['username'].strip()
         password = request.form['password'].strip()
 
+        retry_after = login_throttle.retry_after(username, request.remote_addr)
+        if retry_after:
+            flash(f'Too many failed login attempts. Try again in {retry_after} seconds.', 'danger')
+            return render_template('login.html'), 429
+
         conn = get_db_connection()
         if not conn:
             flash('Database connection error', 'danger')
@@ -110,36 +297,31 @@ def login():
             cursor = conn.cursor(dictionary=True)
             cursor.execute("""
                 SELECT user_id, username, password_hash, user_type 
-                FROM Users 
+                FROM users 
                 WHERE username = %s AND is_active = TRUE
             """, (username,))
             user = cursor.fetchone()
+            # don't hold a pooled connection while waiting for the hash
+            conn.close()
 
             password_ok = False
             if user:
                 stored_hash = user.get('password_hash') or ''
+                # Backwards compatibility: accept legacy SHA256 hex (length 64)
+                if len(stored_hash) == 64 and '$' not in stored_hash:
+                    if hashlib.sha256(password.encode()).hexdigest() == stored_hash:
+                        password_ok = True
+                        # Migrate to Werkzeug hash for future logins, off the request path
+                        password_hasher.run_in_background(migrate_legacy_hash, user['user_id'], password)
                 # Prefer Werkzeug salted hashes
-                if stored_hash and check_password_hash(stored_hash, password):
+                elif stored_hash and password_hasher.check(stored_hash, password):
                     password_ok = True
-                else:
-                    # Backwards compatibility: accept legacy SHA256 hex (length 64)
-                    if stored_hash and len(stored_hash) == 64:
-                        if hashlib.sha256(password.encode()).hexdigest() == stored_hash:
-                            password_ok = True
-                            # Migrate to Werkzeug hash for future logins
-                            try:
-                                with conn.cursor() as update_cursor:
-                                    update_cursor.execute(
-                                        """
-                                        UPDATE Users SET password_hash = %s WHERE user_id = %s
-                                        """,
-                                        (generate_password_hash(password), user['user_id'])
-                                    )
-                                    conn.commit()
-                            except Exception:
-                                logging.exception("Failed to migrate legacy SHA256 password")
 
             if password_ok:
+                login_throttle.reset(username)
+                # keep the cookie for PERMANENT_SESSION_LIFETIME, as Flask-Session's
+                # SESSION_PERMANENT default did, instead of ending with the browser
+                session.permanent = True
                 session['user_id'] = user['user_id']
                 session['username'] = user['username']
                 session['user_type'] = user['user_type']
@@ -154,8 +336,12 @@ def login():
                     # Regular users go to the generic user dashboard
                     return redirect(url_for('user_dashboard'))
             else:
+                login_throttle.record_failure(username, request.remote_addr)
                 flash('Invalid username or password', 'danger')
 
+        except Overloaded:
+            flash('The server is busy. Please try again in a moment.', 'warning')
+            return render_template('login.html'), 503
         except Exception as e:
             # Log full traceback and show message for development debugging
             logging.exception("Login error")
@@ -169,6 +355,18 @@ def login():
 
     return render_template('login.html')
 
+def migrate_legacy_hash(user_id, password):
+    """Replace a legacy SHA256 password hash with a Werkzeug one (runs on the hash pool)."""
+    conn = db_pool.acquire()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE users SET password_hash = %s WHERE user_id = %s AND LENGTH(password_hash) = 64
+            """, (generate_password_hash(password), user_id))
+        conn.commit()
+    finally:
+        conn.close()
+
 # ---------- REGISTER ----------
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -182,6 +380,13 @@ def register():
             flash('Passwords do not match!', 'danger')
             return redirect(url_for('register'))
 
+        # hash before borrowing a pooled connection
+        try:
+            password_hash = password_hasher.hash(password)
+        except Overloaded:
+            flash('The server is busy. Please try again in a moment.', 'warning')
+            return render_template('register.html'), 503
+
         conn = get_db_connection()
         if not conn:
             flash('Database connection error', 'danger')
@@ -189,15 +394,16 @@ def register():
 
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT user_id FROM Users WHERE username = %s", (username,))
+            cursor.execute("SELECT user_id FROM users WHERE username = %s", (username,))
             if cursor.fetchone():
                 flash('Username already exists', 'danger')
                 return redirect(url_for('register'))
 
             cursor.execute("""
-                INSERT INTO Users (username, password_hash, email, user_type)
+                INSERT INTO users (username, password_hash, email, user_type)
                 VALUES (%s, %s, %s, 'patient')
-            """, (username, generate_password_hash(password), email))
+            """, (username, password_hash, email))
+            dashboard_stats.bump(cursor, 'patients')
             conn.commit()
 
             flash('Registration successful! You can now log in.', 'success')
@@ -245,30 +451,20 @@ def user_dashboard():
             """, (session['user_id'],))
             appointments = cur.fetchall()
 
-            # 2. Doctors
-            # === 2. Fetch Doctors (FIXED - ALWAYS SHOWS NAME) ===
-            cur.execute("""
-                SELECT 
-                    d.doctor_id,
-                    d.specialization,
-                    COALESCE(u.full_name, u.username, 'Dr. Unknown') AS display_name,
-                    u.email, u.phone,
-                    dep.name AS department_name
-                FROM doctors d
-                JOIN users u ON d.user_id = u.user_id
-                LEFT JOIN departments dep ON d.department_id = dep.department_id
-                WHERE u.is_active = TRUE
-                LIMIT 50
-            """)
-            doctors = cur.fetchall()
+            # 2. Doctors (reference data, cached), or the matches for ?q=
+            search = request.args.get('q', '').strip()
+            if search:
+                doctors = doctor_search.search(connect_or_raise, search, limit=MAX_DOCTOR_SEARCH_RESULTS)
+            else:
+                doctors = doctor_directory(conn)
 
             # 3. Notifications
             cur.execute("SELECT * FROM notifications WHERE user_id = %s ORDER BY created_at DESC LIMIT 5", (session['user_id'],))
             notifications = cur.fetchall()
+            unread_count = notification_hub.unread_count(conn, session['user_id'])
 
             # 4. Departments
-            cur.execute("SELECT department_id, name FROM departments ORDER BY name")
-            departments = cur.fetchall()
+            departments = department_list(conn)
 
             # === SERVER-SIDE TIME SLOTS (NO JS) ===
             doctor_id = request.args.get('doctor_id')
@@ -281,7 +477,6 @@ def user_dashboard():
                 try:
                     date_obj = datetime.strptime(appointment_date, '%Y-%m-%d').date()
                     selected_date = appointment_date
-                    weekday = date_obj.strftime('%A').lower()
 
                     # Get doctor
                     cur.execute("""
@@ -296,74 +491,8 @@ def user_dashboard():
                     """, (doctor_id,))
                     selected_doctor = cur.fetchone()
 
-                    if not selected_doctor:
-                        available_slots = []
-                    else:
-                        slots = set()
-
-                        # METHOD 1: Use available_time (e.g., "09:00-17:00")
-                        avail = selected_doctor.get('available_time', '').strip()
-                        if avail and '-' in avail:
-                            try:
-                                start_str, end_str = avail.split('-', 1)
-                                start = datetime.strptime(start_str.strip(), '%H:%M').time()
-                                end = datetime.strptime(end_str.strip(), '%H:%M').time()
-                                current = datetime.combine(date_obj, start)
-                                end_dt = datetime.combine(date_obj, end)
-                                while current < end_dt:
-                                    slots.add(current.strftime('%H:%M'))
-                                    current += timedelta(minutes=30)
-                            except:
-                                pass  # skip bad format
-
-                        # METHOD 2: Use doctor_schedules table
-                        cur.execute("""
-                            SELECT start_time, end_time 
-                            FROM doctor_schedules 
-                            WHERE doctor_id = %s AND LOWER(day_of_week) = %s
-                        """, (doctor_id, weekday))
-                        rows = cur.fetchall()
-
-                        for row in rows:
-                            try:
-                                st = row['start_time']
-                                et = row['end_time']
-
-                                if isinstance(st, str):
-                                    st = datetime.strptime(st[:5], '%H:%M').time()
-                                if isinstance(et, str):
-                                    et = datetime.strptime(et[:5], '%H:%M').time()
-
-                                current = datetime.combine(date_obj, st)
-                                end_dt = datetime.combine(date_obj, et)
-
-                                while current < end_dt:
-                                    slots.add(current.strftime('%H:%M'))
-                                    current += timedelta(minutes=30)
-                            except:
-                                continue
-
-                        # METHOD 3: FALLBACK — Generate 9 AM to 5 PM if nothing else works
-                        if not slots:
-                            start = datetime.combine(date_obj, time(9, 0))
-                            end = datetime.combine(date_obj, time(17, 0))
-                            while start < end:
-                                slots.add(start.strftime('%H:%M'))
-                                start += timedelta(minutes=30)
-
-                        # Remove booked slots
-                        cur.execute("""
-                            SELECT start_time FROM appointments
-                            WHERE doctor_id = %s AND appointment_date = %s
-                            AND status IN ('Pending', 'Confirmed')
-                        """, (doctor_id, date_obj))
-                        booked = {
-                            r['start_time'].strftime('%H:%M') if hasattr(r['start_time'], 'strftime')
-                            else str(r['start_time'])[:5]
-                            for r in cur.fetchall()
-                        }
-
-                        available_slots = sorted([s for s in slots if s not in booked])
+                    if selected_doctor:
+                        available_slots = availability.free_slots(conn, doctor_id, date_obj) or []
 
                 except Exception as e:
                     logging.error(f"Time slot error: {e}")
@@ -373,7 +502,9 @@ def user_dashboard():
                                    appointments=appointments,
                                    doctors=doctors,
                                    notifications=notifications,
+                                   unread_count=unread_count,
                                    departments=departments,
+                                   search=search,
                                    today=datetime.now().date(),
                                    selected_doctor=selected_doctor,
                                    selected_date=selected_date,
@@ -396,18 +527,26 @@ def admin_dashboard():
 
     try:
         with conn.cursor(dictionary=True) as cur:
-            # STATS
-            cur.execute("SELECT COUNT(*) AS total FROM users WHERE user_type = 'patient'")
-            total_patients = cur.fetchone()['total'] or 0
-
-            cur.execute("SELECT COUNT(*) AS total FROM doctors")
-            total_doctors = cur.fetchone()['total'] or 0
-
-            cur.execute("SELECT COUNT(*) AS total FROM appointments")
-            total_appointments = cur.fetchone()['total'] or 0
+            # STATS: O(1) counters, or full scans with STATS_MODE=scan / ?verify=1
+            verify = request.args.get('verify') == '1'
+            if os.environ.get('STATS_MODE') == 'scan':
+                counts = dashboard_stats.scan(conn)
+            else:
+                stats_reconciler.maybe_run(conn)
+                counts = dashboard_stats.read(conn)
+                if verify:
+                    mismatched = dashboard_stats.drift(counts, dashboard_stats.scan(conn))
+                    if mismatched:
+                        flash(f'Counters out of sync, reconciled: {mismatched}', 'warning')
+                        dashboard_stats.reconcile(conn)
+                        counts = dashboard_stats.read(conn)
+                    else:
+                        flash('Counters match the tables', 'success')
 
-            cur.execute("SELECT COUNT(*) AS total FROM appointments WHERE status = 'Pending'")
-            pending_appointments = cur.fetchone()['total'] or 0
+            total_patients = counts.get('patients', 0)
+            total_doctors = counts.get('doctors', 0)
+            total_appointments = counts.get('appointments', 0)
+            pending_appointments = counts.get('appointments:Pending', 0)
 
             # ALL APPOINTMENTS WITH CORRECT NAMES (FIXED!)
             cur.execute("""
@@ -441,88 +580,33 @@ def admin_dashboard():
         flash(f'Dashboard error: {str(e)}', 'danger')
         return redirect(url_for('login'))
 
+def connect_or_raise():
+    conn = get_db_connection()
+    if not conn:
+        raise Error('database connection error')
+    return conn
+
 @app.route('/doctor/dashboard')
 @login_required
 @doctor_required
 def doctor_dashboard():
-    connection = get_db_connection()
-    
+    """Today's and upcoming appointments from the doctor's cached agenda (no queries once loaded)."""
     # DEFAULT SAFE VALUES
     doctor = {'doctor_name': 'Doctor', 'specialization': 'General'}
     today_appointments = []
     upcoming_appointments = []
     today = datetime.now().date()
-
-    if not connection:
-        flash('Cannot connect to database. Showing offline mode.', 'info')
-        return render_template('doctor_dashboard.html',
-                               doctor=doctor,
-                               today_appointments=today_appointments,
-                               upcoming_appointments=upcoming_appointments,
-                               today=today)
+    agenda_tags = {}
 
     try:
-        with connection.cursor(dictionary=True) as cursor:
-            # 1. Get doctor info
-            cursor.execute("""
-                SELECT d.doctor_id, 
-                       COALESCE(u.full_name, u.username, 'Dr. Unknown') AS doctor_name,
-                       COALESCE(d.specialization, 'General') AS specialization
-                FROM doctors d
-                JOIN users u ON d.user_id = u.user_id
-                WHERE u.user_id = %s
-            """, (session['user_id'],))
-            doctor_result = cursor.fetchone()
-            
-            if not doctor_result:
-                flash('Profile incomplete. Please contact admin.', 'warning')
-            else:
-                doctor = doctor_result
-
-            doctor_id = doctor.get('doctor_id')
-            if not doctor_id:
-                return render_template('doctor_dashboard.html',
-                                       doctor=doctor,
-                                       today_appointments=today_appointments,
-                                       upcoming_appointments=upcoming_appointments,
-                                       today=today)
-
-            # 2. Today's appointments
-            cursor.execute("""
-                SELECT 
-                    a.appointment_id,
-                    a.start_time,
-                    a.reason,
-                    a.status,
-                    COALESCE(u.full_name, u.username, 'Patient') AS patient_name,
-                    COALESCE(u.phone, '—') AS phone
-                FROM appointments a
-                LEFT JOIN users u ON a.user_id = u.user_id
-                WHERE a.doctor_id = %s AND a.appointment_date = %s
-                ORDER BY a.start_time
-            """, (doctor_id, today))
-            today_appointments = cursor.fetchall()
-
-            # 3. Upcoming (next 10 days)
-            cursor.execute("""
-                SELECT 
-                    a.appointment_date,
-                    a.start_time,
-                    a.reason,
-                    a.status,
-                    COALESCE(u.full_name, u.username, 'Patient') AS patient_name
-                FROM appointments a
-                LEFT JOIN users u ON a.user_id = u.user_id
-                WHERE a.doctor_id = %s 
-                  AND a.appointment_date >= %s 
-                  AND a.appointment_date <= %s
-                ORDER BY a.appointment_date, a.start_time
-                LIMIT 15
-            """, (doctor_id, today, today + timedelta(days=10)))
-            upcoming_appointments = cursor.fetchall()
-
-        # SUCCESS — NO ERRORS
-        flash('Dashboard loaded successfully', 'success')  # Optional: remove if too chatty
+        agenda = doctor_agendas.get(connect_or_raise, session['user_id'], today)
+        if not agenda:
+            flash('Profile incomplete. Please contact admin.', 'warning')
+        else:
+            doctor = agenda['doctor']
+            today_appointments, upcoming_appointments = doctor_agendas.view(agenda)
+            agenda_tags = {'today': agenda_section(today_appointments)[1],
+                           'upcoming': agenda_section(upcoming_appointments)[1]}
 
     except mysql.connector.Error as db_err:
         # ONLY REAL DB ERRORS
@@ -532,15 +616,37 @@ def doctor_dashboard():
         # ONLY UNEXPECTED CRASHES
         logging.exception("CRITICAL: Doctor dashboard crashed")
         flash('System error. Developers notified.', 'danger')
-    finally:
-        if connection and connection.is_connected():
-            connection.close()
 
     return render_template('doctor_dashboard.html',
                            doctor=doctor,
                            today_appointments=today_appointments or [],
                            upcoming_appointments=upcoming_appointments or [],
-                           today=today)
+                           today=today,
+                           agenda_tags=agenda_tags)
+
+@app.route('/doctor/agenda')
+@login_required
+@doctor_required
+def doctor_agenda():
+    """Poll for dashboard changes: `?today=<tag>&upcoming=<tag>` from the last response.
+
+    Every section carries its current tag; its appointments are included only
+    when the tag differs from the one the client sent.
+    """
+    try:
+        agenda = doctor_agendas.get(connect_or_raise, session['user_id'])
+    except Error as e:
+        logging.error(f"Agenda poll failed: {e}")
+        return jsonify({'error': 'database error'}), 503
+    if not agenda:
+        return jsonify({'error': 'doctor profile not found'}), 404
+    data = {}
+    for name, rows in zip(('today', 'upcoming'), doctor_agendas.view(agenda)):
+        items, tag = agenda_section(rows)
+        data[name] = {'tag': tag, 'count': len(items)}
+        if request.args.get(name) != tag:
+            data[name]['appointments'] = items
+    return jsonify(data)
 
 @app.route('/doctor/complete/<int:id>')
 @doctor_required
@@ -548,9 +654,7 @@ def doctor_complete(id):
     conn = get_db_connection()
     if conn:
         try:
-            with conn.cursor() as cur:
-                cur.execute("UPDATE appointments SET status='Completed' WHERE appointment_id=%s AND doctor_id IN (SELECT doctor_id FROM doctors WHERE user_id=%s)", 
-                           (id, session['user_id']))
+            change_status(conn, id, 'Completed', doctor_user_id=session['user_id'])
             conn.commit()
             flash('Marked as Completed', 'success')
         except Exception as e:
@@ -561,63 +665,97 @@ def doctor_complete(id):
     return redirect(url_for('doctor_dashboard'))
 
 
+DOCTOR_PROFILE_SQL = """
+    SELECT d.*, u.full_name, u.phone AS phone_number, dep.name AS department_name, u.email
+    FROM doctors d
+    JOIN users u ON d.user_id = u.user_id
+    LEFT JOIN departments dep ON d.department_id = dep.department_id
+    WHERE d.doctor_id = %s
+"""
+DOCTOR_SCHEDULE_SQL = "SELECT weekday, start_time, end_time FROM doctor_schedules WHERE doctor_id = %s ORDER BY weekday, start_time"
+
+def build_doctor_profile(conn, doctor_id):
+    """Doctor details, schedules and availability lines for the profile modal (None if not found)."""
+    with conn.cursor(dictionary=True) as cursor:
+        cursor.execute(DOCTOR_PROFILE_SQL, (doctor_id,))
+        doc = cursor.fetchone()
+        if not doc:
+            return None
+
+        cursor.execute(DOCTOR_SCHEDULE_SQL, (doctor_id,))
+        return finish_doctor_profile(doc, cursor.fetchall())
+
+def finish_doctor_profile(doc, schedules):
+    """Attach the schedule rows and readable availability lines to a doctor row (also used by api_async.py)."""
+    doc['schedules'] = schedules or []
+
+    # Convert any non-serializable types if present (mysql returns time as time objects)
+    availability_lines = []
+    for s in doc['schedules']:
+        # stringify time objects if needed (MySQL returns datetime.time)
+        st = s.get('start_time')
+        et = s.get('end_time')
+        if hasattr(st, 'strftime'):
+            s['start_time'] = st.strftime('%H:%M')
+        else:
+            s['start_time'] = str(st) if st is not None else ''
+        if hasattr(et, 'strftime'):
+            s['end_time'] = et.strftime('%H:%M')
+        else:
+            s['end_time'] = str(et) if et is not None else ''
+
+        # build a readable availability line like 'Monday → 09:00–13:00'
+        s['day_of_week'] = DAY_NAMES[s['weekday']]
+        if s.get('start_time') and s.get('end_time'):
+            availability_lines.append(f"{s['day_of_week']} → {s['start_time']}–{s['end_time']}")
+
+    # attach a friendly availability representation
+    doc['availability_lines'] = availability_lines
+    return doc
+
+def doctor_profile_key(doctor_id):
+    return f'doctor_profile:{doctor_id}'
+
+def doctor_profile_entry(doc):
+    """The cached form of a profile: serialized body and its strong ETag."""
+    body = app.json.dumps(doc)
+    return {'etag': hashlib.sha256(body.encode()).hexdigest()[:32], 'body': body}
+
+def invalidate_doctor_profiles(*doctor_ids):
+    """Call after changing a doctor, their user row or their schedule."""
+    if doctor_ids:
+        ref_cache.invalidate(*(doctor_profile_key(i) for i in doctor_ids))
+    for doctor_id in doctor_ids:
+        doctor_agendas.invalidate(doctor_id)
+
 @app.route('/doctor/<int:doctor_id>/profile')
 @login_required
 def doctor_profile(doctor_id):
-    """Return JSON with doctor details and schedules for client-side modal loading."""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'database connection error'}), 500
+    """Return JSON with doctor details and schedules for client-side modal loading.
 
-    try:
-        with conn.cursor(dictionary=True) as cursor:
-            cursor.execute("""
-                SELECT d.*, u.full_name, u.phone AS phone_number, dep.name AS department_name, u.email
-                FROM doctors d
-                JOIN users u ON d.user_id = u.user_id
-                LEFT JOIN departments dep ON d.department_id = dep.department_id
-                WHERE d.doctor_id = %s
-            """, (doctor_id,))
-            doc = cursor.fetchone()
-            if not doc:
-                return jsonify({'error': 'not found'}), 404
-
-            cursor.execute("SELECT day_of_week, start_time, end_time FROM doctor_schedules WHERE doctor_id = %s ORDER BY FIELD(day_of_week,'Monday','Tuesday','Wednesday','Thursday','Friday','Saturday','Sunday'), start_time", (doctor_id,))
-            scheds = cursor.fetchall()
-            doc['schedules'] = scheds or []
-
-            # Convert any non-serializable types if present (mysql returns time as time objects)
-            availability_lines = []
-            for s in doc['schedules']:
-                # stringify time objects if needed (MySQL returns datetime.time)
-                st = s.get('start_time')
-                et = s.get('end_time')
-                if hasattr(st, 'strftime'):
-                    s['start_time'] = st.strftime('%H:%M')
-                else:
-                    s['start_time'] = str(st) if st is not None else ''
-                if hasattr(et, 'strftime'):
-                    s['end_time'] = et.strftime('%H:%M')
-                else:
-                    s['end_time'] = str(et) if et is not None else ''
-
-                # build a readable availability line like 'Monday → 09:00–13:00'
-                dow = s.get('day_of_week') or ''
-                if dow and s.get('start_time') and s.get('end_time'):
-                    availability_lines.append(f"{dow} → {s['start_time']}–{s['end_time']}")
-
-            # attach a friendly availability representation
-            doc['availability_lines'] = availability_lines
+    The serialized document is cached per doctor and served with a strong ETag
+    (a hash of the body), so an unchanged profile costs the client a 304.
+    """
+    def load():
+        conn = get_db_connection()
+        if not conn:
+            raise Error('database connection error')
+        doc = build_doctor_profile(conn, doctor_id)
+        return None if doc is None else doctor_profile_entry(doc)
 
-            return jsonify(doc)
+    try:
+        cached = ref_cache.get(doctor_profile_key(doctor_id), load, ttl=DOCTOR_PROFILE_TTL)
     except Exception:
         logging.exception('Failed to load doctor profile')
         return jsonify({'error': 'server error'}), 500
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+    if cached is None:
+        return jsonify({'error': 'not found'}), 404
+
+    response = Response(cached['body'], mimetype='application/json')
+    response.set_etag(cached['etag'])
+    response.cache_control.private = True
+    response.cache_control.max_age = DOCTOR_PROFILE_MAX_AGE
+    return response.make_conditional(request)
 
 @app.route('/book_appointment', methods=['POST'])
 @login_required
@@ -637,36 +775,15 @@ def book_appointment():
         return redirect(url_for('user_dashboard'))
 
     try:
-        with conn.cursor(dictionary=True) as cur:
-            # FIRST: Get doctor name (to save it!)
-            cur.execute("""
-                SELECT COALESCE(u.full_name, u.username, 'Dr. Unknown') AS doctor_name
-                FROM doctors d
-                JOIN users u ON d.user_id = u.user_id
-                WHERE d.doctor_id = %s
-            """, (doctor_id,))
-            doc = cur.fetchone()
-            doctor_name = doc['doctor_name'] if doc else 'Dr. Unknown'
-
-            # SECOND: Check if slot is free
-            cur.execute("""
-                SELECT appointment_id FROM appointments
-                WHERE doctor_id = %s AND appointment_date = %s AND start_time = %s
-                AND status IN ('Pending', 'Confirmed')
-            """, (doctor_id, appointment_date, start_time))
-            if cur.fetchone():
-                flash('This time slot is no longer available', 'danger')
-                return redirect(url_for('user_dashboard') + f'?doctor_id={doctor_id}&appointment_date={appointment_date}')
-
-            # THIRD: BOOK + SAVE DOCTOR NAME
-            cur.execute("""
-                INSERT INTO appointments 
-                (user_id, doctor_id, appointment_date, start_time, reason, status, doctor_name)
-                VALUES (%s, %s, %s, %s, %s, 'Pending', %s)
-            """, (session['user_id'], doctor_id, appointment_date, start_time, reason, doctor_name))
-            
+        appointment_id = reserve_slot(conn, session['user_id'], doctor_id, appointment_date, start_time, reason)
+        if not appointment_id:
+            flash('Doctor not found', 'danger')
+            return redirect(url_for('user_dashboard'))
         conn.commit()
         flash('Appointment booked successfully!', 'success')
+    except SlotTaken:
+        flash('This time slot is no longer available', 'danger')
+        return redirect(url_for('user_dashboard') + f'?doctor_id={doctor_id}&appointment_date={appointment_date}')
     except Exception as e:
         logging.exception("Booking failed")
         flash('Failed to book appointment', 'danger')
@@ -709,22 +826,14 @@ def cancel_appointment(appointment_id):
                 return redirect(url_for('user_dashboard' if not session.get('is_admin') and not session.get('is_doctor') else 'admin_dashboard' if session.get('is_admin') else 'doctor_dashboard'))
             
             # Cancel appointment
-            cursor.execute("""
-                UPDATE appointments 
-                SET status = 'Cancelled'
-                WHERE appointment_id = %s
-            """, (appointment_id,))
+            before = change_status(connection, appointment_id, 'Cancelled')
             
             # Create notification
-            cursor.execute("""
-                INSERT INTO notifications (user_id, title, message)
-                VALUES (%s, 'Appointment Cancelled', 
-                CONCAT('Your appointment on ', 
-                (SELECT appointment_date FROM appointments WHERE appointment_id = %s), 
-                ' has been cancelled.'))
-            """, (appointment['user_id'], appointment_id))
+            notification_hub.create(cursor, appointment['user_id'], 'Appointment Cancelled',
+                                    f"Your appointment on {before['appointment_date']} has been cancelled.")
             
             connection.commit()
+            notification_hub.publish(appointment['user_id'])
             flash('Appointment cancelled', 'info')
     except Exception as e:
         print(f"Cancellation error: {e}")
@@ -762,11 +871,7 @@ def complete_appointment(appointment_id):
                 return redirect(url_for('doctor_dashboard'))
             
             # Mark as completed
-            cursor.execute("""
-                UPDATE appointments 
-                SET status = 'Completed'
-                WHERE appointment_id = %s
-            """, (appointment_id,))
+            change_status(connection, appointment_id, 'Completed')
             
             connection.commit()
             flash('Appointment marked as completed', 'success')
@@ -779,6 +884,34 @@ def complete_appointment(appointment_id):
     
     return redirect(url_for('doctor_dashboard'))
 
+APPOINTMENT_STATUSES = ('Pending', 'Confirmed', 'Completed', 'Cancelled')
+
+def list_filters(date_column, doctor_column, status_column=None):
+    """WHERE conditions, params and the cleaned filter args for the list pages.
+
+    Supports ?status=, ?doctor_id= (admins only), ?date_from= and ?date_to=.
+    """
+    where, params, filters = [], [], {}
+    status = request.args.get('status')
+    if status_column and status in APPOINTMENT_STATUSES:
+        where.append(f'{status_column} = %s')
+        params.append(status)
+        filters['status'] = status
+    doctor_id = request.args.get('doctor_id', type=int)
+    if doctor_id and session.get('is_admin'):
+        where.append(f'{doctor_column} = %s')
+        params.append(doctor_id)
+        filters['doctor_id'] = doctor_id
+    for arg, op in (('date_from', '>='), ('date_to', '<=')):
+        try:
+            value = datetime.strptime(request.args.get(arg, ''), '%Y-%m-%d').date()
+        except ValueError:
+            continue
+        where.append(f'{date_column} {op} %s')
+        params.append(value)
+        filters[arg] = value.strftime('%Y-%m-%d')
+    return where, params, filters
+
 @app.route('/appointments')
 @login_required
 def view_appointment():
@@ -788,6 +921,11 @@ def view_appointment():
         return redirect(url_for('user_dashboard'))
     
     try:
+        key_columns = ('a.appointment_date', 'a.start_time', 'a.appointment_id')
+        limit = pagination.page_size(request.args.get('limit'))
+        after = pagination.decode_cursor(request.args.get('after'), len(key_columns))
+        where, params, filters = list_filters('a.appointment_date', 'a.doctor_id', 'a.status')
+
         with connection.cursor(dictionary=True) as cursor:
             # For doctors, show their appointments
             if session.get('is_doctor'):
@@ -799,40 +937,55 @@ def view_appointment():
                     flash('Doctor profile not found', 'danger')
                     return redirect(url_for('login'))
                 
-                cursor.execute("""
+                sql = """
                     SELECT a.*, u.full_name AS patient_name
                     FROM appointments a
                     JOIN users u ON a.user_id = u.user_id
-                    WHERE a.doctor_id = %s
-                    ORDER BY a.appointment_date DESC, a.start_time DESC
-                """, (doctor['doctor_id'],))
+                """
+                where.insert(0, 'a.doctor_id = %s')
+                params.insert(0, doctor['doctor_id'])
             
             # For admins, show all appointments
             elif session.get('is_admin'):
-                cursor.execute("""
+                sql = """
                     SELECT a.*, u.full_name AS patient_name, 
                     CONCAT(du.first_name, ' ', du.last_name) AS doctor_name
                     FROM appointments a
                     JOIN users u ON a.user_id = u.user_id
                     JOIN doctors d ON a.doctor_id = d.doctor_id
                     JOIN users du ON d.user_id = du.user_id
-                    ORDER BY a.appointment_date DESC, a.start_time DESC
-                """)
+                """
             
             # For regular users, show their own appointments
             else:
-                cursor.execute("""
+                sql = """
                     SELECT a.*, d.specialization, 
                     CONCAT(u.first_name, ' ', u.last_name) AS doctor_name
                     FROM appointments a
                     JOIN doctors d ON a.doctor_id = d.doctor_id
                     JOIN users u ON d.user_id = u.user_id
-                    WHERE a.user_id = %s
-                    ORDER BY a.appointment_date DESC, a.start_time DESC
-                """, (session['user_id'],))
-            
-            appointments = cursor.fetchall()
-            return render_template('appointments.html', appointments=appointments)
+                """
+                where.insert(0, 'a.user_id = %s')
+                params.insert(0, session['user_id'])
+
+            if after:
+                seek_sql, seek_params = pagination.seek_condition(key_columns, after)
+                where.append(seek_sql)
+                params.extend(seek_params)
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += " ORDER BY a.appointment_date DESC, a.start_time DESC, a.appointment_id DESC LIMIT %s"
+            cursor.execute(sql, (*params, limit + 1))
+
+            appointments, next_cursor = pagination.paginate(
+                cursor.fetchall(), limit,
+                key=lambda r: (r['appointment_date'], r['start_time'], r['appointment_id']))
+            return render_template('appointments.html', appointments=appointments,
+                                   next_cursor=next_cursor, filters=filters,
+                                   statuses=APPOINTMENT_STATUSES, limit=limit)
+    except ValueError:
+        flash('Invalid page link', 'danger')
+        return redirect(url_for('view_appointment'))
     except Exception as e:
         print(f"Appointments error: {e}")
         flash('Error loading appointments', 'danger')
@@ -851,45 +1004,84 @@ def medical_records():
         return redirect(url_for('user_dashboard'))
     
     try:
+        # ?q= searches diagnosis, treatment, prescription and notes, best matches first
+        search = request.args.get('q', '').strip()
+        match = record_search.boolean_query(search) if search else None
+        key_columns = ('score', 'record_id') if match else ('mr.visit_date', 'mr.record_id')
+        limit = pagination.page_size(request.args.get('limit'))
+        after = pagination.decode_cursor(request.args.get('after'), len(key_columns))
+        where, params, filters = list_filters('mr.visit_date', 'mr.doctor_id')
+        columns, column_params = 'mr.*', []
+        if search:
+            filters['q'] = search
+            if not match:
+                flash('Search words must be at least 3 letters long', 'warning')
+        if match:
+            columns += f', {record_search.MATCH_SQL} AS score'
+            column_params.append(match)
+            where.append(record_search.MATCH_SQL)
+            params.append(match)
+
         with connection.cursor(dictionary=True) as cursor:
             # For doctors, show records they've created
             if session.get('is_doctor'):
-                cursor.execute("""
-                    SELECT mr.*, u.full_name AS patient_name
+                cursor.execute("SELECT doctor_id FROM doctors WHERE user_id = %s", (session['user_id'],))
+                doctor = cursor.fetchone()
+                sql = f"""
+                    SELECT {columns}, u.full_name AS patient_name
                     FROM medical_records mr
                     JOIN users u ON mr.user_id = u.user_id
-                    WHERE mr.doctor_id = (
-                        SELECT doctor_id FROM doctors WHERE user_id = %s
-                    )
-                    ORDER BY mr.visit_date DESC
-                """, (session['user_id'],))
+                """
+                where.insert(0, 'mr.doctor_id = %s')
+                params.insert(0, doctor['doctor_id'] if doctor else None)
             
             # For admins, show all records
             elif session.get('is_admin'):
-                cursor.execute("""
-                    SELECT mr.*, u.full_name AS patient_name, 
+                sql = f"""
+                    SELECT {columns}, u.full_name AS patient_name, 
                     CONCAT(du.first_name, ' ', du.last_name) AS doctor_name
                     FROM medical_records mr
                     JOIN users u ON mr.user_id = u.user_id
                     JOIN doctors d ON mr.doctor_id = d.doctor_id
                     JOIN users du ON d.user_id = du.user_id
-                    ORDER BY mr.visit_date DESC
-                """)
+                """
             
             # For regular users, show their own records
             else:
-                cursor.execute("""
-                    SELECT mr.*, d.specialization, 
+                sql = f"""
+                    SELECT {columns}, d.specialization, 
                     CONCAT(u.first_name, ' ', u.last_name) AS doctor_name
                     FROM medical_records mr
                     JOIN doctors d ON mr.doctor_id = d.doctor_id
                     JOIN users u ON d.user_id = u.user_id
-                    WHERE mr.user_id = %s
-                    ORDER BY mr.visit_date DESC
-                """, (session['user_id'],))
-            
-            records = cursor.fetchall()
-            return render_template('medical_records.html', records=records)
+                """
+                where.insert(0, 'mr.user_id = %s')
+                params.insert(0, session['user_id'])
+
+            having, having_params = [], []
+            if after:
+                seek_sql, seek_params = pagination.seek_condition(key_columns, after)
+                # the score is a select alias, so its seek condition goes in HAVING
+                (having if match else where).append(seek_sql)
+                (having_params if match else params).extend(seek_params)
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            if having:
+                sql += " HAVING " + " AND ".join(having)
+            if match:
+                sql += " ORDER BY score DESC, mr.record_id DESC LIMIT %s"
+                sort_key = lambda r: (r['score'], r['record_id'])
+            else:
+                sql += " ORDER BY mr.visit_date DESC, mr.record_id DESC LIMIT %s"
+                sort_key = lambda r: (r['visit_date'], r['record_id'])
+            cursor.execute(sql, (*column_params, *params, *having_params, limit + 1))
+
+            records, next_cursor = pagination.paginate(cursor.fetchall(), limit, key=sort_key)
+            return render_template('medical_records.html', records=records,
+                                   next_cursor=next_cursor, filters=filters, limit=limit)
+    except ValueError:
+        flash('Invalid page link', 'danger')
+        return redirect(url_for('medical_records'))
     except Exception as e:
         print(f"Medical records error: {e}")
         flash('Error loading medical records', 'danger')
@@ -962,14 +1154,22 @@ def add_medical_record():
         flash('Database connection error', 'danger')
         return redirect(url_for('doctor_dashboard'))
     
+    # patients are looked up as the doctor types (/api/patients/search); only a preselected one is loaded
     try:
-        with connection.cursor(dictionary=True) as cursor:
-            cursor.execute("SELECT user_id, full_name FROM users WHERE is_doctor = FALSE AND is_admin = FALSE")
-            patients = cursor.fetchall()
-            return render_template('add_medical_record.html', patients=patients)
+        patient = None
+        patient_id = request.args.get('patient_id', type=int)
+        if patient_id:
+            with connection.cursor(dictionary=True) as cursor:
+                cursor.execute("""
+                    SELECT user_id, COALESCE(full_name, username) AS full_name, email, phone
+                    FROM users
+                    WHERE user_id = %s AND user_type = 'patient'
+                """, (patient_id,))
+                patient = cursor.fetchone()
+        return render_template('add_medical_record.html', patient=patient, today=datetime.now().date())
     except Exception as e:
-        print(f"Patient list error: {e}")
-        flash('Error loading patient list', 'danger')
+        print(f"Patient lookup error: {e}")
+        flash('Error loading patient', 'danger')
     finally:
         if connection.is_connected():
             connection.close()
@@ -1011,6 +1211,11 @@ def user_profile():
                     blood_type if blood_type else None, session['user_id']
                 ))
                 connection.commit()
+                if session.get('is_doctor'):
+                    ref_cache.invalidate(DOCTOR_DIRECTORY)
+                    invalidate_doctor_search()
+                    cursor.execute("SELECT doctor_id FROM doctors WHERE user_id = %s", (session['user_id'],))
+                    invalidate_doctor_profiles(*(r[0] for r in cursor.fetchall()))
                 
                 # Update session
                 session['full_name'] = full_name
@@ -1090,24 +1295,26 @@ def change_password():
         with connection.cursor(dictionary=True) as cursor:
             # Verify current password
             cursor.execute("""
-                SELECT password_hash FROM Users 
+                SELECT password_hash FROM users 
                 WHERE user_id = %s
             """, (session['user_id'],))
             user = cursor.fetchone()
 
-            if not user or not check_password_hash(user.get('password_hash', ''), current_password):
+            if not user or not password_hasher.check(user.get('password_hash', ''), current_password):
                 flash('Current password is incorrect', 'danger')
                 return redirect(url_for('user_profile'))
 
             # Update password_hash
             cursor.execute("""
-                UPDATE Users 
+                UPDATE users 
                 SET password_hash = %s
                 WHERE user_id = %s
-            """, (generate_password_hash(new_password), session['user_id']))
+            """, (password_hasher.hash(new_password), session['user_id']))
             connection.commit()
             
             flash('Password changed successfully', 'success')
+    except Overloaded:
+        flash('The server is busy. Please try again in a moment.', 'warning')
     except Exception as e:
         print(f"Password change error: {e}")
         flash('Error changing password', 'danger')
@@ -1133,46 +1340,14 @@ def doctor_availability(doctor_id):
         return jsonify({'error': 'Database connection failed'}), 500
     
     try:
-        with connection.cursor(dictionary=True) as cursor:
-            # Get doctor's working hours
-            cursor.execute("""
-                SELECT available_days, available_time 
-                FROM doctors 
-                WHERE doctor_id = %s
-            """, (doctor_id,))
-            doctor = cursor.fetchone()
-            
-            if not doctor:
-                return jsonify({'error': 'Doctor not found'}), 404
-            
-            # Parse available time (format: "HH:MM-HH:MM")
-            start_time_str, end_time_str = doctor['available_time'].split('-')
-            start_time = datetime.strptime(start_time_str, '%H:%M').time()
-            end_time = datetime.strptime(end_time_str, '%H:%M').time()
-            
-            # Generate 30-minute slots
-            slots = []
-            current_time = datetime.combine(date, start_time)
-            end_datetime = datetime.combine(date, end_time)
-            
-            while current_time + timedelta(minutes=30) <= end_datetime:
-                slots.append(current_time.time().strftime('%H:%M'))
-                current_time += timedelta(minutes=30)
-            
-            # Remove booked slots
-            cursor.execute("""
-                SELECT start_time FROM appointments
-                WHERE doctor_id = %s AND appointment_date = %s
-                AND status IN ('Pending', 'Confirmed')
-            """, (doctor_id, date))
-            booked_slots = [row['start_time'].strftime('%H:%M') for row in cursor.fetchall()]
-            
-            available_slots = [slot for slot in slots if slot not in booked_slots]
-            
-            return jsonify({
-                'date': date.strftime('%Y-%m-%d'),
-                'available_slots': available_slots
-            })
+        available_slots = availability.free_slots(connection, doctor_id, date)
+        if available_slots is None:
+            return jsonify({'error': 'Doctor not found'}), 404
+
+        return jsonify({
+            'date': date.strftime('%Y-%m-%d'),
+            'available_slots': available_slots
+        })
     except Exception as e:
         print(f"Availability error: {e}")
         return jsonify({'error': str(e)}), 500
@@ -1180,6 +1355,107 @@ def doctor_availability(doctor_id):
         if connection.is_connected():
             connection.close()
 
+MAX_AVAILABILITY_DAYS = 31
+MAX_AVAILABILITY_DOCTORS = 200
+
+@app.route('/api/doctors/search')
+@login_required
+def search_doctors():
+    """Typeahead: ?q=words&limit=N (default 10), best matches first."""
+    query = request.args.get('q', '').strip()
+    try:
+        limit = min(int(request.args.get('limit', 10)), MAX_DOCTOR_SEARCH_RESULTS)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not query or limit < 1:
+        return jsonify({'query': query, 'doctors': []})
+    try:
+        doctors = doctor_search.search(connect_or_raise, query, limit)
+    except Exception as e:
+        logging.error(f"Doctor search error: {e}")
+        return jsonify({'error': 'search unavailable'}), 503
+    return jsonify({'query': query, 'doctors': doctors})
+
+@app.route('/api/patients/search')
+@login_required
+def search_patients_api():
+    """Patient picker: ?q=name, phone or email prefix&limit=N (default 10), doctors and admins only."""
+    if not (session.get('is_doctor') or session.get('is_admin')):
+        return jsonify({'error': 'doctor or admin access required'}), 403
+    query = request.args.get('q', '').strip()
+    try:
+        limit = min(int(request.args.get('limit', 10)), MAX_PATIENT_SEARCH_RESULTS)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit < 1:
+        return jsonify({'query': query, 'patients': []})
+    try:
+        patients = search_patients(connect_or_raise(), query, limit)
+    except Exception as e:
+        logging.error(f"Patient search error: {e}")
+        return jsonify({'error': 'search unavailable'}), 503
+    return jsonify({'query': query, 'patients': patients})
+
+@app.route('/api/availability')
+def batch_availability():
+    """Free slots for many doctors over a date range in one response.
+
+    Query args: doctor_ids=1,2,3 and/or department_id=N, start=YYYY-MM-DD,
+    end=YYYY-MM-DD (defaults to start), first=N to return only the N earliest slots.
+    """
+    try:
+        start = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end = datetime.strptime(request.args.get('end') or request.args['start'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start (and optional end) must be YYYY-MM-DD'}), 400
+    if end < start or (end - start).days >= MAX_AVAILABILITY_DAYS:
+        return jsonify({'error': f'Date range must be 1-{MAX_AVAILABILITY_DAYS} days'}), 400
+
+    try:
+        doctor_ids = [int(d) for d in request.args.get('doctor_ids', '').split(',') if d.strip()]
+        department_id = request.args.get('department_id', type=int)
+        first = request.args.get('first', type=int)
+    except ValueError:
+        return jsonify({'error': 'doctor_ids must be a comma separated list of integers'}), 400
+    if not doctor_ids and not department_id:
+        return jsonify({'error': 'doctor_ids or department_id is required'}), 400
+    if first is not None and first < 1:
+        return jsonify({'error': 'first must be a positive integer'}), 400
+
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    try:
+        if department_id:
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    SELECT d.doctor_id
+                    FROM doctors d
+                    JOIN users u ON d.user_id = u.user_id
+                    WHERE d.department_id = %s AND u.is_active = TRUE
+                """, (department_id,))
+                doctor_ids.extend(r[0] for r in cursor.fetchall())
+        doctor_ids = sorted(set(doctor_ids))
+        if len(doctor_ids) > MAX_AVAILABILITY_DOCTORS:
+            return jsonify({'error': f'At most {MAX_AVAILABILITY_DOCTORS} doctors per request'}), 400
+
+        results = availability.free_slots_range(connection, doctor_ids, start, end, first=first)
+        return jsonify({
+            'start': start.strftime('%Y-%m-%d'),
+            'end': end.strftime('%Y-%m-%d'),
+            'availability': [
+                {'doctor_id': doctor_id, 'date': day.strftime('%Y-%m-%d'), 'available_slots': slots}
+                for day, doctor_id, slots in results
+            ]
+        })
+    except Exception as e:
+        logging.exception("Batch availability error")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if connection.is_connected():
+            connection.close()
+
 @app.route('/notifications')
 @login_required
 def notifications():
@@ -1199,11 +1475,7 @@ def notifications():
             notifications = cursor.fetchall()
             
             # Mark all as read
-            cursor.execute("""
-                UPDATE notifications
-                SET is_read = TRUE
-                WHERE user_id = %s AND is_read = FALSE
-            """, (session['user_id'],))
+            notification_hub.mark_all_read(cursor, session['user_id'])
             connection.commit()
             
             return render_template('notifications.html', notifications=notifications)
@@ -1216,6 +1488,102 @@ def notifications():
     
     return redirect(url_for('user_dashboard'))
 
+@app.route('/api/notifications')
+@login_required
+def notifications_since():
+    """Notifications newer than ?since_id=N (oldest first) plus the unread count."""
+    since_id = request.args.get('since_id', 0, type=int)
+    limit = min(request.args.get('limit', 50, type=int), 200)
+
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    try:
+        rows = notification_hub.fetch_since(connection, session['user_id'], since_id, limit)
+        return jsonify({
+            'notifications': [dict(r, created_at=str(r['created_at'])) for r in rows],
+            'last_id': rows[-1]['notification_id'] if rows else since_id,
+            'unread_count': notification_hub.unread_count(connection, session['user_id']),
+        })
+    except Exception as e:
+        logging.exception("Notification fetch error")
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if connection.is_connected():
+            connection.close()
+
+@app.route('/notifications/stream')
+@login_required
+def notifications_stream():
+    """Server-Sent Events stream of new notifications for the logged-in user.
+
+    Holds no database connection while idle; resumes after ?since_id= or the
+    browser's Last-Event-ID header. Ends after NOTIFICATION_STREAM_SECONDS, and
+    when the worker already serves NOTIFICATION_STREAMS streams it only tells
+    the browser to retry later.
+    """
+    user_id = session['user_id']
+    last_id = request.headers.get('Last-Event-ID', type=int) or request.args.get('since_id', type=int)
+
+    def stream():
+        nonlocal last_id
+        if not notification_stream_slots.acquire(blocking=False):
+            yield f'retry: {NOTIFICATION_BUSY_RETRY_MS}\n\n'
+            return
+        try:
+            deadline = time.monotonic() + NOTIFICATION_STREAM_SECONDS
+            seq = notification_hub.seq(user_id)
+            conn = db_pool.acquire()
+            try:
+                if last_id is None:
+                    last_id = notification_hub.latest_id(conn, user_id)
+                pending = notification_hub.fetch_since(conn, user_id, last_id)
+            finally:
+                conn.close()
+            # the id sets the browser's Last-Event-ID even if nothing arrives before the stream ends
+            yield f'retry: 5000\nid: {last_id}\n\n'
+            while True:
+                for row in pending:
+                    last_id = row['notification_id']
+                    payload = json.dumps(dict(row, created_at=str(row['created_at'])))
+                    yield f'id: {last_id}\nevent: notification\ndata: {payload}\n\n'
+                if time.monotonic() >= deadline:
+                    return
+                new_seq = notification_hub.wait(user_id, seq, timeout=NOTIFICATION_HEARTBEAT)
+                if new_seq is None:
+                    pending = []
+                    yield ': keepalive\n\n'
+                    continue
+                seq = new_seq
+                conn = db_pool.acquire()
+                try:
+                    pending = notification_hub.fetch_since(conn, user_id, last_id)
+                finally:
+                    conn.close()
+        finally:
+            notification_stream_slots.release()
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/admin/export/<dataset>.<fmt>')
+@admin_required
+def export_data(dataset, fmt):
+    """Stream appointments or medical records as CSV or NDJSON.
+
+    Same filters as the list pages: ?date_from=, ?date_to=, ?doctor_id= and
+    (appointments) ?status=.
+    """
+    if dataset not in export.EXPORTS or fmt not in export.FORMATS:
+        abort(404)
+    spec = export.EXPORTS[dataset]
+    where, params, filters = list_filters(spec['date_column'], spec['doctor_column'], spec['status_column'])
+    filename = '_'.join([dataset, *(str(v) for v in filters.values())]) + '.' + fmt
+    return Response(export.stream(db_pool.acquire, dataset, fmt, where, params), mimetype=export.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'X-Accel-Buffering': 'no'})
+
 @app.route('/admin/users')
 @admin_required
 def manage_users():
@@ -1227,8 +1595,8 @@ def manage_users():
     try:
         with connection.cursor(dictionary=True) as cursor:
             cursor.execute("""
-                SELECT user_id, username, full_name, email, phone, 
-                is_active, is_admin, is_doctor, last_login
+                SELECT user_id, username, full_name, email, phone, is_active,
+                       user_type = 'admin' AS is_admin, user_type = 'doctor' AS is_doctor, last_login
                 FROM users
                 ORDER BY is_admin DESC, is_doctor DESC, full_name
             """)
@@ -1242,13 +1610,137 @@ def manage_users():
             connection.close()
     
     return redirect(url_for('admin_dashboard'))
+@app.route('/admin/db-pool')
+@admin_required
+def db_pool_stats():
+    return jsonify(db_pool.stats())
+
+@app.route('/admin/perf')
+@admin_required
+def admin_perf():
+    # debug-only: statement text and plans are not for production dashboards
+    if not app.debug or not sql_profiler:
+        abort(404)
+    if request.args.get('reset'):
+        sql_profiler.reset()
+        return redirect(url_for('admin_perf'))
+    report = sql_profiler.report(top=int(request.args.get('top', 25)))
+    if request.args.get('format') == 'json':
+        return jsonify(report)
+    return render_template('admin_perf.html', report=report)
+
+def utilization_totals(row):
+    """Adds utilization (booked / offered, %) to a row of summed rollup columns."""
+    row = {k: int(v) if k in rollups.COLUMNS else v for k, v in row.items()}
+    row['utilization'] = round(100.0 * row['booked'] / row['offered'], 1) if row['offered'] else None
+    return row
+
+@app.route('/admin/utilization')
+@admin_required
+def admin_utilization():
+    conn = get_db_connection()
+    if not conn:
+        flash('Database connection failed', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    # Reads only the rollup tables (plus cached department names), never appointments, doctors or users
+    yesterday = datetime.now().date() - timedelta(days=1)
+    try:
+        date_to = datetime.strptime(request.args.get('date_to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        date_to = yesterday
+    try:
+        date_from = datetime.strptime(request.args.get('date_from', ''), '%Y-%m-%d').date()
+    except ValueError:
+        date_from = date_to - timedelta(days=UTILIZATION_DAYS - 1)
+    date_from = max(min(date_from, date_to), date_to - timedelta(days=MAX_UTILIZATION_DAYS - 1))
+    department_id = request.args.get('department_id', type=int)
+
+    sums = ', '.join(f'SUM({c}) AS {c}' for c in rollups.COLUMNS)
+    where, params = 'day BETWEEN %s AND %s', [date_from, date_to]
+    if department_id is not None:
+        where += ' AND department_id = %s'
+        params.append(department_id)
+
+    try:
+        departments = {d['department_id']: d['name'] for d in department_list(conn)}
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(f"""
+                SELECT department_id, {sums}
+                FROM utilization_department_daily
+                WHERE {where}
+                GROUP BY department_id
+            """, params)
+            by_department = [dict(utilization_totals(r), name=departments.get(r['department_id'], 'No department'))
+                             for r in cur.fetchall()]
+            by_department.sort(key=lambda r: r['name'])
+            totals = utilization_totals({c: sum(r[c] for r in by_department) for c in rollups.COLUMNS})
+
+            cur.execute(f"""
+                SELECT day, {sums}
+                FROM utilization_department_daily
+                WHERE {where}
+                GROUP BY day
+                ORDER BY day
+            """, params)
+            by_day = [utilization_totals(r) for r in cur.fetchall()]
+
+            cur.execute(f"""
+                SELECT WEEKDAY(day) AS weekday, hour, SUM(offered) AS offered, SUM(booked) AS booked
+                FROM utilization_department_daily
+                WHERE {where}
+                GROUP BY WEEKDAY(day), hour
+            """, params)
+            cells = {(r['weekday'], r['hour']): utilization_totals(r) for r in cur.fetchall()}
+            hours = sorted({hour for _, hour in cells})
+
+            # labelled with the name on each doctor's latest rollup row in the range
+            cur.execute(f"""
+                SELECT t.*,
+                       (SELECT n.doctor_name FROM utilization_daily n
+                        WHERE n.doctor_id = t.doctor_id AND n.day BETWEEN %s AND %s
+                        ORDER BY n.day DESC LIMIT 1) AS doctor_name
+                FROM (
+                    SELECT doctor_id, {sums}
+                    FROM utilization_daily
+                    WHERE {where}
+                    GROUP BY doctor_id
+                    ORDER BY booked DESC, doctor_id
+                    LIMIT 25
+                ) t
+                ORDER BY t.booked DESC, t.doctor_id
+            """, [date_from, date_to] + params)
+            top_doctors = [utilization_totals(r) for r in cur.fetchall()]
+
+        last_day, rebuilt_at = rollups.last_run(conn)
+    except Error:
+        logging.exception("Utilization report error")
+        flash('Error loading utilization report', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    return render_template('admin_utilization.html',
+                           totals=totals, by_department=by_department, by_day=by_day,
+                           cells=cells, hours=hours, day_names=DAY_NAMES, top_doctors=top_doctors,
+                           departments=department_list(conn), department_id=department_id,
+                           date_from=date_from.strftime('%Y-%m-%d'), date_to=date_to.strftime('%Y-%m-%d'),
+                           last_day=last_day, rebuilt_at=rebuilt_at)
+
+@app.route('/admin/ref-cache')
+@admin_required
+def ref_cache_stats():
+    return jsonify(dict(ref_cache.stats(), doctor_search=doctor_search.stats()))
+
+@app.route('/admin/auth-metrics')
+@admin_required
+def auth_metrics():
+    return jsonify({'password_hashing': password_hasher.stats(), 'login_throttle': login_throttle.stats()})
+
 # ADMIN: APPROVE
 @app.route('/admin/approve/<int:id>')
 @admin_required
 def admin_approve(id):
     conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute("UPDATE appointments SET status='Confirmed' WHERE appointment_id=%s", (id,))
+    change_status(conn, id, 'Confirmed')
     conn.commit()
     flash('Appointment APPROVED', 'success')
     return redirect(url_for('admin_dashboard'))
@@ -1258,8 +1750,7 @@ def admin_approve(id):
 @admin_required
 def admin_cancel(id):
     conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute("UPDATE appointments SET status='Cancelled' WHERE appointment_id=%s", (id,))
+    change_status(conn, id, 'Cancelled')
     conn.commit()
     flash('Appointment CANCELLED', 'warning')
     return redirect(url_for('admin_dashboard'))
@@ -1272,13 +1763,12 @@ def admin_reschedule(id):
     new_time = request.form['new_time']
     new_reason = request.form['new_reason']
     conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute("""
-            UPDATE appointments 
-            SET appointment_date=%s, start_time=%s, reason=%s, status='Confirmed'
-            WHERE appointment_id=%s
-        """, (new_date, new_time, new_reason, id))
-    conn.commit()
+    try:
+        change_status(conn, id, 'Confirmed', appointment_date=new_date, start_time=new_time, reason=new_reason)
+        conn.commit()
+    except SlotTaken:
+        flash('That slot is already booked for this doctor', 'danger')
+        return redirect(url_for('admin_dashboard'))
     flash('Appointment RESCHEDULED', 'info')
     return redirect(url_for('admin_dashboard'))
 
@@ -1287,8 +1777,7 @@ def admin_reschedule(id):
 @admin_required
 def admin_delete(id):
     conn = get_db_connection()
-    with conn.cursor() as cur:
-        cur.execute("DELETE FROM appointments WHERE appointment_id=%s", (id,))
+    delete_appointment(conn, id)
     conn.commit()
     flash('Appointment DELETED FOREVER', 'danger')
     return redirect(url_for('admin_dashboard'))
@@ -1305,11 +1794,13 @@ def toggle_user_status(user_id):
         with connection.cursor() as cursor:
             # Toggle user status
             cursor.execute("""
-                UPDATE Users 
+                UPDATE users 
                 SET is_active = NOT is_active 
                 WHERE user_id = %s
             """, (user_id,))
             connection.commit()
+            ref_cache.invalidate(DOCTOR_DIRECTORY)
+            invalidate_doctor_search()
             flash('User  status updated successfully', 'success')
     except Exception as e:
         print(f"Toggle user status error: {e}")
@@ -1330,12 +1821,53 @@ def delete_user(user_id):
     
     try:
         with connection.cursor() as cursor:
+            cursor.execute("SELECT user_type FROM users WHERE user_id = %s FOR UPDATE", (user_id,))
+            row = cursor.fetchone()
+            doctor_ids = []
+            if row and row[0] == 'doctor':
+                cursor.execute("SELECT doctor_id FROM doctors WHERE user_id = %s", (user_id,))
+                doctor_ids = [r[0] for r in cursor.fetchall()]
+
+            # The delete cascades to the user's appointments (as patient or doctor) without going
+            # through booking's listeners, so take them out of the counters and rollups here
+            where, params = 'user_id = %s', [user_id]
+            if doctor_ids:
+                where += f" OR doctor_id IN ({', '.join(['%s'] * len(doctor_ids))})"
+                params += doctor_ids
+            cursor.execute(f"""
+                SELECT doctor_id, status, COUNT(*) FROM appointments
+                WHERE {where}
+                GROUP BY doctor_id, status
+                FOR UPDATE
+            """, params)
+            removed = cursor.fetchall()
+            if removed:
+                rollups.subtract_appointments(cursor, where, params)
+
             # Delete user
             cursor.execute("""
                DELETE FROM users 
                 WHERE user_id = %s
             """, (user_id,))
+            if row and cursor.rowcount:
+                if row[0] == 'patient':
+                    dashboard_stats.bump(cursor, 'patients', -1)
+                if doctor_ids:
+                    dashboard_stats.bump(cursor, 'doctors', -len(doctor_ids))
+                by_status = {}
+                for _, status, count in removed:
+                    by_status[status] = by_status.get(status, 0) + count
+                if by_status:
+                    dashboard_stats.bump(cursor, 'appointments', -sum(by_status.values()))
+                for status, count in by_status.items():
+                    dashboard_stats.bump(cursor, f'appointments:{status}', -count)
             connection.commit()
+            for doctor_id in {r[0] for r in removed}:
+                doctor_agendas.invalidate(doctor_id)
+            if row and row[0] == 'doctor':
+                ref_cache.invalidate(DOCTOR_DIRECTORY)
+                invalidate_doctor_search()
+                invalidate_doctor_profiles(*doctor_ids)
             flash('User  deleted successfully', 'success')
     except Exception as e:
         print(f"Delete user error: {e}")
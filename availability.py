@@ -0,0 +1,298 @@
+"""
+Doctor availability engine shared by the dashboard and the JSON API.
+
+Each doctor's weekly template is materialized once as seven 48-bit integers,
+one per weekday (Monday = 0), where bit i means the half-hour slot starting at
+i * 30 minutes after midnight is offered. The template combines
+`doctors.available_time` ("09:00-17:00" for every day, or
+"Mon 09:00-13:00; Wed 10:00-14:00") with the `doctor_schedules` rows, whose
+`weekday` column uses the same numbering. Doctors with no usable hours at all
+get the 09:00-17:00 default.
+
+Templates are cached per doctor for `ttl` seconds. `invalidate()` drops them
+in this process; writers in other processes (seed_doctors.py) bump the shared
+`generation` instead, and every process drops its templates within a second of
+seeing the new token. Answering "free slots for doctor X on date D" then costs
+one booked-slots query plus a few bit operations.
+"""
+
+import threading
+import time
+from datetime import timedelta, time as dtime
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+_DAY_PREFIX = {name[:3].lower(): i for i, name in enumerate(DAY_NAMES)}
+
+
+def to_minutes(value):
+    """Minutes after midnight for a TIME column value (time, timedelta or 'HH:MM[:SS]')."""
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        return int(value.total_seconds()) // 60
+    if isinstance(value, dtime):
+        return value.hour * 60 + value.minute
+    try:
+        h, m = str(value).strip()[:5].split(':')
+        return int(h) * 60 + int(m)
+    except ValueError:
+        return None
+
+
+def range_mask(start_min, end_min):
+    """Bitmask of the slots whose start falls in [start_min, end_min).
+
+    An off-grid start is rounded up to the next slot (09:15-12:00 offers 09:30 onwards), so
+    schedule writers reject such ranges with `check_range()` before saving them.
+    """
+    if start_min is None or end_min is None or end_min <= start_min:
+        return 0
+    first = -(-start_min // SLOT_MINUTES)
+    last = min(-(-end_min // SLOT_MINUTES), SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def check_range(start_min, end_min):
+    """None if [start_min, end_min) can be offered as slots, otherwise what is wrong with it."""
+    if start_min is None or end_min is None:
+        return 'invalid time'
+    label = '%02d:%02d-%02d:%02d' % (start_min // 60, start_min % 60, end_min // 60, end_min % 60)
+    if end_min <= start_min:
+        return f'{label} ends before it starts'
+    if start_min % SLOT_MINUTES:
+        return f'{label} does not start on a {SLOT_MINUTES}-minute slot boundary'
+    return None
+
+
+def weekday_index(day_name):
+    """0-6 for 'Monday'/'mon'/'MONDAY', or None."""
+    return _DAY_PREFIX.get(str(day_name or '').strip()[:3].lower())
+
+
+def parse_available_time(text):
+    """Parse `doctors.available_time` into [(weekday or None, start_min, end_min)].
+
+    A weekday of None means the range applies to every day.
+    """
+    ranges = []
+    for part in (text or '').split(';'):
+        part = part.strip()
+        if '-' not in part:
+            continue
+        day = None
+        bits = part.split(None, 1)
+        if len(bits) == 2 and weekday_index(bits[0]) is not None:
+            day = weekday_index(bits[0])
+            part = bits[1]
+        start_str, end_str = part.split('-', 1)
+        start, end = to_minutes(start_str), to_minutes(end_str)
+        if start is not None and end is not None:
+            ranges.append((day, start, end))
+    return ranges
+
+
+def slot_label(index):
+    minutes = index * SLOT_MINUTES
+    return '%02d:%02d' % (minutes // 60, minutes % 60)
+
+
+def mask_to_slots(mask):
+    return [slot_label(i) for i in range(SLOTS_PER_DAY) if mask >> i & 1]
+
+
+def slots_mask(start_times):
+    """Bitmask of the slots starting at the given TIME values (off-grid times are ignored)."""
+    mask = 0
+    for start in start_times:
+        minutes = to_minutes(start)
+        if minutes is not None and minutes % SLOT_MINUTES == 0:
+            mask |= 1 << (minutes // SLOT_MINUTES)
+    return mask
+
+
+DEFAULT_DAY_MASK = range_mask(9 * 60, 17 * 60)
+
+# Queries shared with api_async.py; {} takes the doctor_id placeholders.
+HOURS_SQL = "SELECT doctor_id, available_time FROM doctors WHERE doctor_id IN ({})"
+SCHEDULES_SQL = """
+    SELECT doctor_id, weekday, start_time, end_time
+    FROM doctor_schedules
+    WHERE doctor_id IN ({})
+"""
+# booked (Pending / Confirmed) start times of one doctor on one day
+BOOKED_SQL = """
+    SELECT start_time FROM appointments
+    WHERE doctor_id = %s AND appointment_date = %s
+    AND status IN ('Pending', 'Confirmed')
+"""
+BOOKED_RANGE_SQL = """
+    SELECT doctor_id, appointment_date, start_time FROM appointments
+    WHERE doctor_id IN ({})
+    AND appointment_date BETWEEN %s AND %s
+    AND status IN ('Pending', 'Confirmed')
+"""
+
+
+def booked_range_masks(rows):
+    """{(doctor_id, date): mask} from (doctor_id, appointment_date, start_time) rows."""
+    masks = {}
+    for doctor_id, day, start_time in rows:
+        mask = slots_mask((start_time,))
+        if mask:
+            masks[(doctor_id, day)] = masks.get((doctor_id, day), 0) | mask
+    return masks
+
+
+def collect_free(weeks, booked, start, end, first=None):
+    """[(date, doctor_id, [slots])] over [start, end] from templates and booked masks (see free_slots_range)."""
+    doctor_ids = sorted(weeks)
+    result = []
+    remaining = first
+    day = start
+    while day <= end and (remaining is None or remaining > 0):
+        free = {}
+        for doctor_id in doctor_ids:
+            mask = weeks[doctor_id][day.weekday()] & ~booked.get((doctor_id, day), 0)
+            if mask:
+                free[doctor_id] = mask
+        if remaining is not None and free:
+            # walk slot by slot so the earliest times win across doctors
+            kept = {}
+            for i in range(SLOTS_PER_DAY):
+                for doctor_id, mask in free.items():
+                    if mask >> i & 1 and remaining:
+                        kept[doctor_id] = kept.get(doctor_id, 0) | 1 << i
+                        remaining -= 1
+                if not remaining:
+                    break
+            free = kept
+        for doctor_id in doctor_ids:
+            if free.get(doctor_id):
+                result.append((day, doctor_id, mask_to_slots(free[doctor_id])))
+        day += timedelta(days=1)
+    return result
+
+
+def build_week(available_time, schedule_rows):
+    """Build the 7-day template from `available_time` and (weekday, start, end) rows."""
+    week = [0] * 7
+    for day, start, end in parse_available_time(available_time):
+        mask = range_mask(start, end)
+        for d in (range(7) if day is None else (day,)):
+            week[d] |= mask
+    for weekday, start, end in schedule_rows:
+        if weekday is not None and 0 <= weekday < 7:
+            week[weekday] |= range_mask(to_minutes(start), to_minutes(end))
+    if not any(week):
+        week = [DEFAULT_DAY_MASK] * 7
+    return tuple(week)
+
+
+class AvailabilityIndex:
+    def __init__(self, ttl=300, generation=None):
+        self.ttl = ttl
+        self.generation = generation    # ref_cache.Generation bumped by schedule writers in any process
+        self._weeks = {}    # doctor_id -> (loaded_at, week)
+        self._lock = threading.Lock()
+
+    def invalidate(self, doctor_id=None):
+        """Drop one doctor's template, or all of them."""
+        with self._lock:
+            if doctor_id is None:
+                self._weeks.clear()
+            else:
+                self._weeks.pop(int(doctor_id), None)
+
+    def week(self, conn, doctor_id):
+        """Weekly template for a doctor, loading it if missing or stale. None if no such doctor."""
+        return self.weeks(conn, [doctor_id]).get(int(doctor_id))
+
+    def refresh(self):
+        """Drop every template if a schedule writer bumped the shared generation."""
+        if self.generation is not None and self.generation.changed():
+            self.invalidate()
+
+    def cached(self, doctor_ids):
+        """({doctor_id: week} still fresh, [doctor_ids to load])."""
+        self.refresh()
+        now = time.monotonic()
+        found, missing = {}, []
+        for doctor_id in {int(d) for d in doctor_ids}:
+            cached = self._weeks.get(doctor_id)
+            if cached and now - cached[0] < self.ttl:
+                found[doctor_id] = cached[1]
+            else:
+                missing.append(doctor_id)
+        return found, missing
+
+    def store(self, available_time, schedules):
+        """Build and cache templates from {doctor_id: available_time} and {doctor_id: [(weekday, start, end)]}."""
+        now = time.monotonic()
+        loaded = {d: build_week(available_time[d], schedules.get(d, ())) for d in available_time}
+        with self._lock:
+            for doctor_id, week in loaded.items():
+                self._weeks[doctor_id] = (now, week)
+        return loaded
+
+    def weeks(self, conn, doctor_ids):
+        """{doctor_id: week} for the given doctors; stale or missing ones are loaded in two queries."""
+        found, missing = self.cached(doctor_ids)
+        if not missing:
+            return found
+
+        placeholders = ', '.join(['%s'] * len(missing))
+        with conn.cursor() as cur:
+            cur.execute(HOURS_SQL.format(placeholders), tuple(missing))
+            available_time = dict(cur.fetchall())
+            schedules = {doctor_id: [] for doctor_id in available_time}
+            if available_time:
+                cur.execute(SCHEDULES_SQL.format(placeholders), tuple(missing))
+                for doctor_id, weekday, start, end in cur.fetchall():
+                    if doctor_id in schedules:
+                        schedules[doctor_id].append((weekday, start, end))
+
+        found.update(self.store(available_time, schedules))
+        return found
+
+    @staticmethod
+    def booked_mask(conn, doctor_id, day):
+        with conn.cursor() as cur:
+            cur.execute(BOOKED_SQL, (doctor_id, day))
+            return slots_mask(start for (start,) in cur.fetchall())
+
+    def free_mask(self, conn, doctor_id, day):
+        week = self.week(conn, doctor_id)
+        if week is None:
+            return None
+        offered = week[day.weekday()]
+        if not offered:
+            return 0
+        return offered & ~self.booked_mask(conn, doctor_id, day)
+
+    def free_slots(self, conn, doctor_id, day):
+        """Sorted 'HH:MM' free slots for `doctor_id` on `day`, or None if the doctor doesn't exist."""
+        mask = self.free_mask(conn, doctor_id, day)
+        return None if mask is None else mask_to_slots(mask)
+
+    @staticmethod
+    def booked_masks(conn, doctor_ids, start, end):
+        """{(doctor_id, date): mask} of booked slots for several doctors over [start, end], in one query."""
+        if not doctor_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(doctor_ids))
+        with conn.cursor() as cur:
+            cur.execute(BOOKED_RANGE_SQL.format(placeholders), (*doctor_ids, start, end))
+            return booked_range_masks(cur.fetchall())
+
+    def free_slots_range(self, conn, doctor_ids, start, end, first=None):
+        """Free slots for several doctors over the dates [start, end].
+
+        Returns [(date, doctor_id, [slots])] in date order. With `first`, stops once that
+        many slots have been collected, taking the earliest times across all doctors.
+        """
+        weeks = self.weeks(conn, doctor_ids)
+        return collect_free(weeks, self.booked_masks(conn, sorted(weeks), start, end), start, end, first)
@@ -0,0 +1,252 @@
+"""
+Concurrent-request capacity of the JSON API: threaded WSGI vs asyncio (ASGI).
+
+Runs the same request mix against both servers at rising concurrency and
+reports throughput, latency percentiles, error rate and the servers' memory
+(RSS of the given pid and all its children, sampled during each step). A
+server's capacity is the highest concurrency whose p95 stays under `--slo-ms`
+with under 1% errors.
+
+The mix is what the booking page does: single-doctor availability, batch
+availability for five doctors over a week, and the doctor profile (logged in,
+no If-None-Match, so every request returns a body). Doctors and the login come
+from benchmarks/generate_dataset.py.
+
+Compare at equal memory: size the WSGI deployment (workers x threads) and the
+ASGI one (workers, ASYNC_DB_POOL_SIZE) so their RSS is about the same under
+load; the report warns when the two differ by more than 15%. For example:
+
+    gunicorn -w 4 --threads 8 -b 127.0.0.1:5000 app:app &       # WSGI, 32 threads
+    uvicorn api_async:app --port 8001 --workers 1 &             # ASGI
+    python benchmarks/async_capacity.py --wsgi-pid <gunicorn master pid> \\
+        --asgi-pid <uvicorn pid> --levels 8,32,64,128,256
+
+Both servers must share the SQLite session store (SESSION_BACKEND=sqlite, the
+default) so the WSGI login cookie is accepted by the ASGI server. The client
+is asyncio with keep-alive connections, so it isn't the bottleneck at a few
+hundred concurrent requests. RSS is read from /proc (Linux).
+
+Usage:
+    python benchmarks/async_capacity.py [--wsgi http://127.0.0.1:5000] [--asgi http://127.0.0.1:8001]
+        [--wsgi-pid N] [--asgi-pid N] [--levels 8,32,64,128,256] [--duration 20] [--slo-ms 500]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import load_fixtures, percentile  # noqa: E402
+
+
+# ---------- memory ----------
+def children(pid):
+    """All descendant pids of `pid`."""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            parents.setdefault(ppid, []).append(int(entry))
+    found, todo = [], [pid]
+    while todo:
+        for child in parents.get(todo.pop(), ()):
+            found.append(child)
+            todo.append(child)
+    return found
+
+
+def rss_mb(pid):
+    """Resident memory of `pid` and its children in MB, or None without a pid."""
+    if not pid:
+        return None
+    total = 0
+    for p in [pid] + children(pid):
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total / 1024
+
+
+# ---------- HTTP ----------
+class Connection:
+    """Minimal HTTP/1.1 GET client with keep-alive, reconnecting when the server closes."""
+
+    def __init__(self, base, cookie):
+        parts = urlsplit(base)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.cookie = cookie
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        for attempt in (1, 2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self.writer.write((f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\nCookie: {self.cookie}\r\n'
+                                   f'Connection: keep-alive\r\n\r\n').encode())
+                await self.writer.drain()
+                status_line = await self.reader.readline()
+                if not status_line:
+                    raise ConnectionError('closed')
+                length, close = 0, False
+                while True:
+                    line = (await self.reader.readline()).decode('latin-1').strip().lower()
+                    if not line:
+                        break
+                    name, _, value = line.partition(':')
+                    if name == 'content-length':
+                        length = int(value)
+                    elif name == 'connection' and 'close' in value:
+                        close = True
+                await self.reader.readexactly(length)
+                if close:
+                    self.close()
+                return int(status_line.split()[1])
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def login(base, username, password):
+    """Session cookie ('name=value') from the WSGI app's login form."""
+    parts = urlsplit(base)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    body = urlencode({'username': username, 'password': password})
+    writer.write((f'POST /login HTTP/1.1\r\nHost: {parts.hostname}\r\nConnection: close\r\n'
+                  f'Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n\r\n'
+                  f'{body}').encode())
+    await writer.drain()
+    response = (await reader.read()).decode('latin-1')
+    writer.close()
+    for line in response.split('\r\n'):
+        if line.lower().startswith('set-cookie:'):
+            return line.split(':', 1)[1].split(';', 1)[0].strip()
+    sys.exit(f'Login as {username} failed:\n{response.splitlines()[0] if response else "no response"}')
+
+
+def request_mix(rng, doctors):
+    day = date.today() + timedelta(days=rng.randint(1, 14))
+    doctor = rng.choice(doctors)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f'/api/doctor-availability/{doctor}?date={day.isoformat()}'
+    if kind == 1:
+        ids = ','.join(str(d) for d in rng.sample(doctors, min(5, len(doctors))))
+        return '/api/availability?' + urlencode({'doctor_ids': ids, 'start': day.isoformat(),
+                                                 'end': (day + timedelta(days=6)).isoformat()})
+    return f'/doctor/{doctor}/profile'
+
+
+# ---------- one step ----------
+async def step(base, cookie, doctors, concurrency, duration, pid, seed):
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    peak_rss = rss_mb(pid)
+
+    async def user(i):
+        nonlocal errors
+        rng = random.Random(seed + i)
+        conn = Connection(base, cookie)
+        try:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    status = await conn.get(request_mix(rng, doctors))
+                except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                    status = None
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    errors += 1
+        finally:
+            conn.close()
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while time.monotonic() < deadline:
+            await asyncio.sleep(1)
+            current = rss_mb(pid)
+            if current is not None:
+                peak_rss = max(peak_rss or 0, current)
+
+    started = time.perf_counter()
+    await asyncio.gather(sample_memory(), *(user(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ms = sorted(v * 1000 for v in latencies)
+    return {
+        'concurrency': concurrency, 'requests': len(ms), 'rps': len(ms) / elapsed,
+        'p50': percentile(ms, 50), 'p95': percentile(ms, 95), 'p99': percentile(ms, 99),
+        'error_rate': errors / len(ms) if ms else 1.0, 'rss_mb': peak_rss,
+    }
+
+
+async def run(args):
+    patients, doctors = load_fixtures()
+    if not patients or not doctors:
+        sys.exit('No generated data found; run benchmarks/generate_dataset.py first')
+    cookie = await login(args.wsgi, patients[0], args.password)
+    levels = [int(n) for n in args.levels.split(',')]
+
+    capacity = {}
+    for name, base, pid in (('wsgi', args.wsgi, args.wsgi_pid), ('asgi', args.asgi, args.asgi_pid)):
+        print(f'\n{name} ({base})')
+        print(f'{"conc":>6} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7} {"RSS MB":>8}')
+        best = None
+        for level in levels:
+            result = await step(base, cookie, doctors, level, args.duration, pid, args.seed)
+            rss = f'{result["rss_mb"]:.0f}' if result['rss_mb'] is not None else '-'
+            print(f'{level:>6} {result["rps"]:>9.1f} {result["p50"]:>8.1f} {result["p95"]:>8.1f} '
+                  f'{result["p99"]:>8.1f} {result["error_rate"]:>7.1%} {rss:>8}')
+            if result['p95'] <= args.slo_ms and result['error_rate'] < 0.01:
+                best = result
+        capacity[name] = best
+
+    print(f'\nCapacity (p95 <= {args.slo_ms:.0f} ms, < 1% errors):')
+    for name, best in capacity.items():
+        if best is None:
+            print(f'  {name}: below the lowest level tested')
+        else:
+            rss = f', {best["rss_mb"]:.0f} MB' if best['rss_mb'] is not None else ''
+            print(f'  {name}: {best["concurrency"]} concurrent requests, {best["rps"]:.1f} req/s{rss}')
+    wsgi, asgi = capacity.get('wsgi'), capacity.get('asgi')
+    if wsgi and asgi and wsgi['rss_mb'] and asgi['rss_mb']:
+        ratio = asgi['rss_mb'] / wsgi['rss_mb']
+        if not 0.85 <= ratio <= 1.15:
+            print(f'  note: RSS differs by {abs(ratio - 1):.0%}; resize one deployment for an equal-memory comparison')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--wsgi', default='http://127.0.0.1:5000', help='threaded WSGI server (also used to log in)')
+    parser.add_argument('--asgi', default='http://127.0.0.1:8001', help='api_async server')
+    parser.add_argument('--wsgi-pid', type=int, help='WSGI server (master) pid, for RSS')
+    parser.add_argument('--asgi-pid', type=int, help='ASGI server (master) pid, for RSS')
+    parser.add_argument('--levels', default='8,32,64,128,256', help='concurrency steps')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per step')
+    parser.add_argument('--slo-ms', type=float, default=500, help='p95 latency limit for capacity')
+    parser.add_argument('--password', default='loadtest', help='password given to generate_dataset.py')
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
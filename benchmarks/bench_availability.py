@@ -0,0 +1,129 @@
+"""
+Per-request cost of computing a doctor's free slots.
+
+Compares the old per-request slot generation from `user_dashboard()` (parse
+`available_time`, query `doctor_schedules`, walk datetimes in 30-minute steps,
+query bookings) with `AvailabilityIndex.free_slots()` using a warm template.
+
+Usage:
+    python benchmarks/bench_availability.py            # in-memory, no database needed
+    python benchmarks/bench_availability.py --live 3   # against the real DB, doctor_id=3
+
+The in-memory mode answers queries from canned rows so the numbers are the
+Python-side cost per request plus the number of round trips it would make.
+"""
+
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import AvailabilityIndex  # noqa: E402
+
+ITERATIONS = 20000
+DAY = date(2025, 1, 6)  # a Monday
+
+
+class FakeCursor:
+    def __init__(self, conn, dictionary=False):
+        self.conn = conn
+        self.dictionary = dictionary
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        self.conn.queries += 1
+        if 'FROM doctors' in sql:
+            self.rows = [{'doctor_id': 1, 'available_time': '09:00-13:00'}]
+        elif 'FROM doctor_schedules' in sql:
+            self.rows = [{'doctor_id': 1, 'weekday': 0, 'start_time': timedelta(hours=14), 'end_time': timedelta(hours=17)}]
+        else:
+            self.rows = [{'start_time': timedelta(hours=h)} for h in (9, 10, 14)]
+
+    def _convert(self, row):
+        return row if self.dictionary else tuple(row.values())
+
+    def fetchone(self):
+        return self._convert(self.rows[0]) if self.rows else None
+
+    def fetchall(self):
+        return [self._convert(r) for r in self.rows]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = 0
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self, dictionary)
+
+
+def legacy_slots(conn, doctor_id, date_obj):
+    """The slot generation that used to live inline in user_dashboard()."""
+    with conn.cursor(dictionary=True) as cur:
+        cur.execute("SELECT d.* FROM doctors d WHERE d.doctor_id = %s", (doctor_id,))
+        doctor = cur.fetchone()
+        slots = set()
+        avail = doctor.get('available_time', '').strip()
+        start_str, end_str = avail.split('-', 1)
+        current = datetime.combine(date_obj, datetime.strptime(start_str.strip(), '%H:%M').time())
+        end_dt = datetime.combine(date_obj, datetime.strptime(end_str.strip(), '%H:%M').time())
+        while current < end_dt:
+            slots.add(current.strftime('%H:%M'))
+            current += timedelta(minutes=30)
+        cur.execute("SELECT start_time, end_time FROM doctor_schedules WHERE doctor_id = %s AND weekday = %s",
+                    (doctor_id, date_obj.weekday()))
+        for row in cur.fetchall():
+            current = datetime.combine(date_obj, (datetime.min + row['start_time']).time())
+            end_dt = datetime.combine(date_obj, (datetime.min + row['end_time']).time())
+            while current < end_dt:
+                slots.add(current.strftime('%H:%M'))
+                current += timedelta(minutes=30)
+        cur.execute("SELECT start_time FROM appointments WHERE doctor_id = %s AND appointment_date = %s", (doctor_id, date_obj))
+        booked = {(datetime.min + r['start_time']).strftime('%H:%M') for r in cur.fetchall()}
+        return sorted(s for s in slots if s not in booked)
+
+
+def measure(label, fn, conn, iterations):
+    conn.queries = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    elapsed = time.perf_counter() - started
+    print(f'{label:<28} {elapsed / iterations * 1e6:8.1f} us/request  '
+          f'{conn.queries / iterations:4.1f} queries/request  ({len(result)} slots)')
+    return result
+
+
+def main():
+    if '--live' in sys.argv:
+        from app import get_db_connection
+        doctor_id = int(sys.argv[sys.argv.index('--live') + 1])
+        conn = get_db_connection()
+        index = AvailabilityIndex()
+        for label, fn in (('cold template', lambda: (index.invalidate(), index.free_slots(conn, doctor_id, DAY))[1]),
+                          ('warm template', lambda: index.free_slots(conn, doctor_id, DAY))):
+            started = time.perf_counter()
+            for _ in range(200):
+                fn()
+            print(f'{label:<28} {(time.perf_counter() - started) / 200 * 1000:8.2f} ms/request')
+        conn.close()
+        return
+
+    conn = FakeConnection()
+    index = AvailabilityIndex()
+    legacy = measure('legacy per-request build', lambda: legacy_slots(conn, 1, DAY), conn, ITERATIONS)
+    index.free_slots(conn, 1, DAY)
+    engine = measure('availability index (warm)', lambda: index.free_slots(conn, 1, DAY), conn, ITERATIONS)
+    assert legacy == engine, (legacy, engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Requests/second with the SQLite+LRU session store versus Flask-Session's filesystem mode.
+
+Runs a minimal app (no database) through the Flask test client so only the
+session layer differs. Each backend is measured for read-only requests (the
+common case: a logged-in page view) and for requests that modify the session.
+
+Usage:
+    python benchmarks/bench_sessions.py [--requests 5000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session  # noqa: E402
+from flask_session import Session  # noqa: E402
+
+from session_store import SQLiteSessionInterface  # noqa: E402
+
+
+def make_app(backend, workdir):
+    app = Flask(__name__)
+    app.secret_key = 'bench'
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=1)
+    if backend == 'filesystem':
+        app.config['SESSION_TYPE'] = 'filesystem'
+        app.config['SESSION_FILE_DIR'] = os.path.join(workdir, 'fs')
+        Session(app)
+    else:
+        app.session_interface = SQLiteSessionInterface(os.path.join(workdir, 'sessions.sqlite3'))
+
+    @app.route('/login')
+    def login():
+        session['user_id'] = 42
+        session['username'] = 'bench'
+        session['user_type'] = 'patient'
+        return 'ok'
+
+    @app.route('/read')
+    def read():
+        return str(session.get('user_id'))
+
+    @app.route('/write')
+    def write():
+        session['hits'] = session.get('hits', 0) + 1
+        return 'ok'
+
+    return app
+
+
+def run(app, path, count):
+    client = app.test_client()
+    client.get('/login')
+    for _ in range(50):
+        client.get(path)
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.get(path)
+        assert response.status_code == 200
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    results = {}
+    for backend in ('filesystem', 'sqlite'):
+        with tempfile.TemporaryDirectory() as workdir:
+            app = make_app(backend, workdir)
+            for path in ('/read', '/write'):
+                results[(backend, path)] = run(app, path, args.requests)
+
+    print(f'{"backend":<12} {"read req/s":>12} {"write req/s":>12}')
+    for backend in ('filesystem', 'sqlite'):
+        print(f'{backend:<12} {results[(backend, "/read")]:12.0f} {results[(backend, "/write")]:12.0f}')
+    for path in ('/read', '/write'):
+        print(f'speedup {path}: {results[("sqlite", path)] / results[("filesystem", path)]:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Concurrency load test for slot booking.
+
+Fires many parallel `reserve_slot()` calls, first all for the same slot and then
+each for a different slot, against the real database. Reports throughput,
+successes, conflicts and the number of double-booked slots, which must be zero.
+
+Usage:
+    python benchmarks/booking_load.py --user 5 --doctor 3 [--threads 32] [--bookings 500]
+
+Requires migrations/0001_appointments_active_slot.sql. Bookings are made on a
+date far in the future and deleted again at the end.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import db_config  # noqa: E402
+from booking import reserve_slot, SlotTaken  # noqa: E402
+import dashboard_stats  # noqa: E402
+from db_pool import ConnectionPool  # noqa: E402
+
+MARKER = 'booking_load test'
+TEST_DAY = date(2099, 1, 5)
+
+
+def run(pool, user_id, doctor_id, slots, threads):
+    """Book every (day, time) in `slots` using `threads` workers; returns (ok, conflicts, errors, seconds)."""
+    counts = {'ok': 0, 'conflict': 0, 'error': 0}
+    lock = threading.Lock()
+    queue = list(slots)
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        conn = pool.acquire()
+        barrier.wait()
+        while True:
+            with lock:
+                if not queue:
+                    break
+                day, start = queue.pop()
+            try:
+                reserve_slot(conn, user_id, doctor_id, day, start, MARKER)
+                conn.commit()
+                outcome = 'ok'
+            except SlotTaken:
+                outcome = 'conflict'
+            except Exception as e:
+                conn.rollback()
+                print('booking error:', e)
+                outcome = 'error'
+            with lock:
+                counts[outcome] += 1
+        conn.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return counts['ok'], counts['conflict'], counts['error'], time.perf_counter() - started
+
+
+def double_bookings(conn, doctor_id):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT appointment_date, start_time
+                FROM appointments
+                WHERE doctor_id = %s AND reason = %s AND status IN ('Pending', 'Confirmed')
+                GROUP BY appointment_date, start_time
+                HAVING COUNT(*) > 1
+            ) dup
+        """, (doctor_id, MARKER))
+        return cur.fetchone()[0]
+
+
+def cleanup(conn, doctor_id):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM appointments WHERE doctor_id = %s AND reason = %s", (doctor_id, MARKER))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--user', type=int, required=True, help='patient user_id to book as')
+    parser.add_argument('--doctor', type=int, required=True, help='doctor_id to book')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--bookings', type=int, default=500)
+    args = parser.parse_args()
+
+    pool = ConnectionPool(db_config, size=args.threads + 1, max_overflow=0, leak_timeout=0)
+    admin = pool.acquire()
+    cleanup(admin, args.doctor)
+
+    same = [(TEST_DAY, '10:00')] * args.bookings
+    # 48 half-hour slots per day, spread over as many days as needed
+    different = [(TEST_DAY + timedelta(days=1 + i // 48), '%02d:%02d' % (i % 48 // 2, i % 2 * 30))
+                 for i in range(args.bookings)]
+
+    failed = False
+    for label, slots in (('same slot', same), ('different slots', different)):
+        ok, conflicts, errors, seconds = run(pool, args.user, args.doctor, slots, args.threads)
+        dups = double_bookings(admin, args.doctor)
+        print(f'{label:<16} {len(slots) / seconds:8.0f} bookings/s  ok={ok} conflicts={conflicts} '
+              f'errors={errors} double_booked={dups}')
+        expected_ok = 1 if label == 'same slot' else len(slots)
+        failed |= dups != 0 or ok != expected_ok
+        cleanup(admin, args.doctor)
+
+    # the raw cleanup DELETEs bypass the counter listeners
+    dashboard_stats.reconcile(admin)
+    admin.close()
+    pool.dispose()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
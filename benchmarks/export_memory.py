@@ -0,0 +1,133 @@
+"""
+Checks that the streaming exports run in constant memory.
+
+Streams /admin/export/<dataset>.<fmt> through Flask's test client in this
+process against the configured MySQL database and samples the process RSS and
+the Python heap (tracemalloc) as chunks arrive. After a warm-up of
+`--warmup-rows` rows, neither may grow by more than `--max-growth-mb` for the
+rest of the export. Buffering the whole result (a buffered cursor, or a list
+of rows) grows both linearly with the row count, so millions of rows show it
+clearly.
+
+The export needs enough rows to be meaningful; generate them first, e.g.:
+
+    python benchmarks/generate_dataset.py --doctors 1000 --patients 50000 --appointments 3000000
+
+Exits with status 1 if memory grew or fewer than `--min-rows` rows came out.
+
+Usage:
+    python benchmarks/export_memory.py [--dataset appointments|medical-records] [--format csv|ndjson]
+        [--min-rows 1000000] [--warmup-rows 50000] [--max-growth-mb 20]
+"""
+
+import argparse
+import codecs
+import csv
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SQL_PROFILE', '0')
+
+import app as hospital  # noqa: E402
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def admin_client():
+    conn = hospital.db_pool.acquire()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT user_id FROM users WHERE user_type = 'admin' ORDER BY user_id LIMIT 1")
+            row = cur.fetchone()
+    finally:
+        conn.close()
+    client = hospital.app.test_client()
+    with client.session_transaction() as s:
+        s.update(user_id=row[0] if row else 0, username='export-check', user_type='admin',
+                 is_admin=True, is_doctor=False)
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dataset', default='appointments', choices=sorted(hospital.export.EXPORTS))
+    parser.add_argument('--format', default='csv', choices=sorted(hospital.export.FORMATS))
+    parser.add_argument('--min-rows', type=int, default=1000000)
+    parser.add_argument('--warmup-rows', type=int, default=50000)
+    parser.add_argument('--max-growth-mb', type=float, default=20)
+    args = parser.parse_args()
+
+    client = admin_client()
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(f'/admin/export/{args.dataset}.{args.format}', buffered=False)
+    if response.status_code != 200:
+        sys.exit(f'HTTP {response.status_code}')
+
+    size = 0
+
+    def lines():
+        """Decoded response text split on \\n, with the \\n kept, as the chunks arrive."""
+        nonlocal size
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        pending = ''
+        for chunk in response.response:
+            size += len(chunk)
+            *complete, pending = (pending + decoder.decode(chunk)).split('\n')
+            for line in complete:
+                yield line + '\n'
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+
+    # csv fields may hold quoted newlines, so let csv.reader find the record boundaries;
+    # ndjson escapes newlines inside strings, so each line is one record
+    records = csv.reader(lines()) if args.format == 'csv' else lines()
+    rows = -1 if args.format == 'csv' else 0                # not counting the csv header
+    baseline = None
+    peak_rss = peak_heap = 0.0
+    samples = []
+    for _ in records:
+        rows += 1
+        if rows % 1000:
+            continue
+        if baseline is None and rows >= args.warmup_rows:
+            baseline = (rss_mb(), tracemalloc.get_traced_memory()[0] / 2 ** 20)
+        if baseline is not None:
+            rss, heap = rss_mb(), tracemalloc.get_traced_memory()[0] / 2 ** 20
+            peak_rss, peak_heap = max(peak_rss, rss), max(peak_heap, heap)
+            if not samples or rows - samples[-1][0] >= 250000:
+                samples.append((rows, rss, heap))
+    response.close()
+    elapsed = time.perf_counter() - started
+
+    print(f'{args.dataset}.{args.format}: {rows} rows, {size / 2 ** 20:.0f} MB in {elapsed:.1f}s '
+          f'({rows / elapsed:.0f} rows/s)')
+    print(f'{"rows":>10} {"RSS MB":>8} {"heap MB":>8}')
+    for sample_rows, rss, heap in samples:
+        print(f'{sample_rows:>10} {rss:>8.1f} {heap:>8.1f}')
+
+    failed = False
+    if rows < args.min_rows:
+        print(f'FAIL: only {rows} rows; generate at least {args.min_rows} (see --help)')
+        failed = True
+    if baseline is not None:
+        rss_growth, heap_growth = peak_rss - baseline[0], peak_heap - baseline[1]
+        print(f'growth after {args.warmup_rows} rows: RSS {rss_growth:+.1f} MB, heap {heap_growth:+.1f} MB')
+        if max(rss_growth, heap_growth) > args.max_growth_mb:
+            print(f'FAIL: memory grew by more than {args.max_growth_mb:.0f} MB while streaming')
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
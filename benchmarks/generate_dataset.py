@@ -0,0 +1,311 @@
+"""
+Synthetic hospital dataset for load testing.
+
+Generates patients, doctors (with departments and weekly schedules),
+appointments, medical records and notifications in the schema app.py expects,
+and writes them with batched inserts. Doctors go through the bulk loader in
+seed_doctors.py.
+
+- appointments fall on the doctor's schedule, spread from `--past-days` ago to
+  `--future-days` ahead. Past ones are mostly Completed, future ones mostly
+  Pending/Confirmed, with some Cancelled either way. Active slots are never
+  double-booked.
+- medical records are written for a share of the completed appointments
+- notifications per patient, most of them already read
+
+Every generated account has an email ending in @synthetic.test and the password
+given by --password, so benchmarks/load_test.py can log in as any of them.
+`--purge` removes everything the generator (and the load test) created.
+
+Usage:
+    python benchmarks/generate_dataset.py [--patients 5000] [--doctors 200] \\
+        [--appointments 100000] [--records 0.6] [--notifications 5] [--seed 1]
+    python benchmarks/generate_dataset.py --purge
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import db_pool, ref_cache, DOCTOR_DIRECTORY, DEPARTMENTS  # noqa: E402
+from app import invalidate_availability, invalidate_doctor_search  # noqa: E402
+import dashboard_stats  # noqa: E402
+import seed_doctors  # noqa: E402
+
+DOMAIN = 'synthetic.test'
+FIRST_NAMES = ['Aarav', 'Diya', 'Kabir', 'Meera', 'Rohan', 'Anaya', 'Vihaan', 'Ira', 'Arjun', 'Saanvi',
+               'Liam', 'Emma', 'Noah', 'Olivia', 'Mateo', 'Sofia', 'Yusuf', 'Amara', 'Chen', 'Hana']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Reddy', 'Khan', 'Das', 'Nair', 'Gupta', 'Singh', 'Mehta',
+              'Smith', 'Garcia', 'Kim', 'Okafor', 'Rossi', 'Novak', 'Haddad', 'Silva', 'Tanaka', 'Muller']
+SPECIALTIES = [name for _, name in seed_doctors.DEPARTMENTS] + [
+    'Radiology', 'Oncology', 'Nephrology', 'Urology', 'Endocrinology', 'Pulmonology']
+DIAGNOSES = ['Hypertension', 'Type 2 diabetes', 'Migraine', 'Seasonal allergy', 'Lower back pain',
+             'Upper respiratory infection', 'Gastritis', 'Anxiety', 'Sprained ankle', 'Dermatitis']
+TREATMENTS = ['Medication', 'Physiotherapy', 'Rest and fluids', 'Lifestyle changes', 'Referral', 'Observation']
+REASONS = ['Routine check-up', 'Follow-up visit', 'Chest pain', 'Headache', 'Skin rash', 'Fever',
+           'Joint pain', 'Prescription renewal', 'Test results', 'Consultation']
+NOTIFICATION_TITLES = ['Appointment Confirmed', 'Appointment Reminder', 'Appointment Cancelled',
+                       'Lab Results Ready', 'Prescription Updated']
+SHIFTS = [('08:00', '12:00'), ('09:00', '13:00'), ('10:00', '14:00'), ('13:00', '17:00'), ('14:00', '18:00')]
+DAYS = seed_doctors.SCHEDULE_DAYS[:6]
+
+
+def person(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def make_doctors(rng, count):
+    doctors = []
+    for i in range(count):
+        first, last = person(rng)
+        dept = SPECIALTIES[i % len(SPECIALTIES)]
+        schedules = [(day, *rng.choice(SHIFTS)) for day in sorted(rng.sample(DAYS, rng.randint(2, 4)),
+                                                                   key=DAYS.index)]
+        doctors.append(dict(
+            name=f'Dr. {first} {last}', email=f'gen_doc{i}@{DOMAIN}', dept=dept, specialization=dept,
+            gender=rng.choice(['male', 'female']), years=rng.randint(1, 30),
+            available_days=', '.join(day for day, _, _ in schedules),
+            available_time='; '.join(f'{day[:3]} {start}-{end}' for day, start, end in schedules),
+            short_profile=f'{dept} specialist.', schedules=schedules,
+        ))
+    return doctors
+
+
+def insert_patients(conn, rng, count, password, batch):
+    password_hash = generate_password_hash(password)
+    with conn.cursor() as cur:
+        columns = seed_doctors.table_columns(cur, 'users')
+        names = ['username', 'password_hash', 'email', 'user_type']
+        optional = [c for c in ('full_name', 'phone', 'gender', 'date_of_birth', 'is_active') if c in columns]
+        rows = []
+        for i in range(count):
+            first, last = person(rng)
+            values = {'full_name': f'{first} {last}', 'phone': f'555{rng.randint(1000000, 9999999)}',
+                      'gender': rng.choice(['Male', 'Female']), 'is_active': True,
+                      'date_of_birth': date(1940, 1, 1) + timedelta(days=rng.randint(0, 80 * 365))}
+            rows.append((f'gen_pat{i}', password_hash, f'gen_pat{i}@{DOMAIN}', 'patient')
+                        + tuple(values[c] for c in optional))
+        sql = (f"INSERT INTO users ({', '.join(names + optional)}) "
+               f"VALUES ({', '.join(['%s'] * (len(names) + len(optional)))})")
+        for part in seed_doctors.chunks(rows, batch):
+            cur.executemany(sql, part)
+        conn.commit()
+        cur.execute("SELECT user_id FROM users WHERE email LIKE %s AND user_type = 'patient' ORDER BY user_id",
+                    (f'%@{DOMAIN}',))
+        return [r[0] for r in cur.fetchall()]
+
+
+def minutes(value):
+    """Minutes past midnight for a TIME column value (timedelta or time)."""
+    if isinstance(value, timedelta):
+        return int(value.total_seconds()) // 60
+    return value.hour * 60 + value.minute
+
+
+def slots_for(start, end):
+    """Half-hour start times ('HH:MM:SS') between two TIME values."""
+    t, stop, out = minutes(start), minutes(end), []
+    while t + 30 <= stop:
+        out.append(f'{t // 60:02d}:{t % 60:02d}:00')
+        t += 30
+    return out
+
+
+def pick_status(rng, day, today):
+    roll = rng.random()
+    if day < today:
+        return 'Completed' if roll < 0.75 else 'Cancelled' if roll < 0.95 else 'Pending'
+    return 'Pending' if roll < 0.45 else 'Confirmed' if roll < 0.9 else 'Cancelled'
+
+
+def insert_appointments(conn, rng, patients, doctors, count, past_days, future_days, batch):
+    """doctors: [(doctor_id, name, [(weekday_index, [slot, ...]), ...])]; returns completed rows for records."""
+    today = date.today()
+    first_day = today - timedelta(days=past_days)
+    span = past_days + future_days
+    taken = set()
+    rows, completed = [], []
+    attempts = 0
+    while len(rows) < count and attempts < count * 20:
+        attempts += 1
+        doctor_id, doctor_name, week = rng.choice(doctors)
+        weekday, slots = rng.choice(week)
+        day = first_day + timedelta(days=rng.randrange(span))
+        day += timedelta(days=(weekday - day.weekday()) % 7)
+        start = rng.choice(slots)
+        status = pick_status(rng, day, today)
+        if status in ('Pending', 'Confirmed'):
+            if (doctor_id, day, start) in taken:
+                continue
+            taken.add((doctor_id, day, start))
+        patient = rng.choice(patients)
+        rows.append((patient, doctor_id, day, start, rng.choice(REASONS), status, doctor_name))
+        if status == 'Completed':
+            completed.append((patient, doctor_id, day))
+    with conn.cursor() as cur:
+        for part in seed_doctors.chunks(rows, batch):
+            cur.executemany("""
+                INSERT INTO appointments
+                (user_id, doctor_id, appointment_date, start_time, reason, status, doctor_name)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, part)
+            conn.commit()
+    return len(rows), completed
+
+
+def insert_records(conn, rng, completed, ratio, batch):
+    rows = []
+    for patient, doctor_id, day in completed:
+        if rng.random() >= ratio:
+            continue
+        follow_up = day + timedelta(days=rng.choice([14, 30, 90])) if rng.random() < 0.3 else None
+        rows.append((patient, doctor_id, day, rng.choice(DIAGNOSES), rng.choice(TREATMENTS),
+                     f'{rng.choice(["Tab", "Syrup", "Cream"])} x {rng.randint(5, 30)} days',
+                     'Generated record', follow_up))
+    with conn.cursor() as cur:
+        for part in seed_doctors.chunks(rows, batch):
+            cur.executemany("""
+                INSERT INTO medical_records
+                (user_id, doctor_id, visit_date, diagnosis, treatment, prescription, notes, follow_up_date)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, part)
+            conn.commit()
+    return len(rows)
+
+
+def insert_notifications(conn, rng, patients, per_patient, batch):
+    rows = []
+    for patient in patients:
+        for _ in range(rng.randint(0, per_patient * 2)):
+            title = rng.choice(NOTIFICATION_TITLES)
+            rows.append((patient, title, f'{title} (generated)', rng.random() < 0.8))
+    with conn.cursor() as cur:
+        for part in seed_doctors.chunks(rows, batch):
+            cur.executemany("INSERT INTO notifications (user_id, title, message, is_read) VALUES (%s, %s, %s, %s)",
+                            part)
+            conn.commit()
+    return len(rows)
+
+
+def doctor_weeks(conn, emails):
+    """[(doctor_id, display name, [(weekday, slots)])] for the generated doctors."""
+    with conn.cursor() as cur:
+        rows = seed_doctors.select_in(cur, """
+            SELECT d.doctor_id, COALESCE(u.full_name, u.username), ds.weekday, ds.start_time, ds.end_time
+            FROM doctors d
+            JOIN users u ON d.user_id = u.user_id
+            JOIN doctor_schedules ds ON ds.doctor_id = d.doctor_id
+            WHERE u.email IN ({})
+        """, emails, 1000)
+    weeks = {}
+    for doctor_id, name, weekday, start, end in rows:
+        slots = slots_for(start, end)
+        if slots:
+            weeks.setdefault((doctor_id, name), []).append((weekday, slots))
+    return [(doctor_id, name, week) for (doctor_id, name), week in weeks.items()]
+
+
+def purge(conn):
+    like = f'%@{DOMAIN}'
+    with conn.cursor() as cur:
+        for sql in (
+            "DELETE n FROM notifications n JOIN users u ON n.user_id = u.user_id WHERE u.email LIKE %s",
+            "DELETE mr FROM medical_records mr JOIN users u ON mr.user_id = u.user_id WHERE u.email LIKE %s",
+            "DELETE a FROM appointments a JOIN users u ON a.user_id = u.user_id WHERE u.email LIKE %s",
+            "DELETE a FROM appointments a JOIN doctors d ON a.doctor_id = d.doctor_id "
+            "JOIN users u ON d.user_id = u.user_id WHERE u.email LIKE %s",
+            "DELETE mr FROM medical_records mr JOIN doctors d ON mr.doctor_id = d.doctor_id "
+            "JOIN users u ON d.user_id = u.user_id WHERE u.email LIKE %s",
+            "DELETE ds FROM doctor_schedules ds JOIN doctors d ON ds.doctor_id = d.doctor_id "
+            "JOIN users u ON d.user_id = u.user_id WHERE u.email LIKE %s",
+            "DELETE d FROM doctors d JOIN users u ON d.user_id = u.user_id WHERE u.email LIKE %s",
+            "DELETE FROM users WHERE email LIKE %s",
+        ):
+            cur.execute(sql, (like,))
+            print(f'{cur.rowcount:>8} rows  {sql.split(" FROM ")[1].split()[0]}')
+        conn.commit()
+
+
+def finish(conn):
+    """Bring the dashboard counters and reference caches in line with the new data."""
+    try:
+        dashboard_stats.reconcile(conn)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print('dashboard counters not reconciled:', e)
+    ref_cache.invalidate(DOCTOR_DIRECTORY, DEPARTMENTS)
+    invalidate_availability()
+    invalidate_doctor_search()
+
+
+def generate(conn, rng, patients=5000, doctors=200, appointments=100000, records=0.6, notifications=5,
+             past_days=365, future_days=60, password='loadtest', batch=2000):
+    """Write one synthetic dataset; refuses to run twice without a purge in between."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM users WHERE email LIKE %s", (f'%@{DOMAIN}',))
+        if cur.fetchone()[0]:
+            sys.exit('Generated data already present; run with --purge first')
+    started = time.perf_counter()
+    doctor_rows = make_doctors(rng, doctors)
+    seed_doctors.seed(conn, doctor_rows, password=password, batch=batch)
+    print(f'doctors       {len(doctor_rows):>9}  ({time.perf_counter() - started:.1f}s)')
+
+    step = time.perf_counter()
+    patient_ids = insert_patients(conn, rng, patients, password, batch)
+    print(f'patients      {len(patient_ids):>9}  ({time.perf_counter() - step:.1f}s)')
+
+    step = time.perf_counter()
+    weeks = doctor_weeks(conn, [d['email'] for d in doctor_rows])
+    booked, completed = insert_appointments(conn, rng, patient_ids, weeks, appointments,
+                                            past_days, future_days, batch)
+    print(f'appointments  {booked:>9}  ({time.perf_counter() - step:.1f}s)')
+
+    step = time.perf_counter()
+    written = insert_records(conn, rng, completed, records, batch)
+    print(f'records       {written:>9}  ({time.perf_counter() - step:.1f}s)')
+
+    step = time.perf_counter()
+    notes = insert_notifications(conn, rng, patient_ids, notifications, batch)
+    print(f'notifications {notes:>9}  ({time.perf_counter() - step:.1f}s)')
+    print(f'total {time.perf_counter() - started:.1f}s')
+    finish(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--appointments', type=int, default=100000)
+    parser.add_argument('--records', type=float, default=0.6, help='share of completed appointments with a record')
+    parser.add_argument('--notifications', type=int, default=5, help='average notifications per patient')
+    parser.add_argument('--past-days', type=int, default=365)
+    parser.add_argument('--future-days', type=int, default=60)
+    parser.add_argument('--password', default='loadtest')
+    parser.add_argument('--batch', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--purge', action='store_true', help='delete all generated data and exit')
+    args = parser.parse_args()
+
+    conn = db_pool.acquire()
+    try:
+        if args.purge:
+            purge(conn)
+            finish(conn)
+        else:
+            generate(conn, random.Random(args.seed), args.patients, args.doctors, args.appointments,
+                     args.records, args.notifications, args.past_days, args.future_days,
+                     args.password, args.batch)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
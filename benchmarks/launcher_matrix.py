@@ -0,0 +1,154 @@
+"""
+Throughput of the production launcher (serve.py) per worker configuration.
+
+Starts serve.py once per configuration, waits until it answers, runs
+benchmarks/load_test.py against it, samples the server's RSS, stops it with
+SIGTERM (the graceful path) and records one row per configuration:
+
+    configuration | workers | threads | class | req/s | p95 ms (worst route) | errors | RSS MB
+
+The table is printed and written to benchmarks/launcher_results.md together
+with the machine (CPU count) and the pool settings, so results from different
+hosts aren't mixed up. Keep that file next to the deployment notes when you
+change DB_POOL_SIZE or the worker counts.
+
+Configurations (override with --configs name=workers:threads:class,...):
+    auto          serve.py's own choice
+    sync-2n+1     2 x CPU + 1 sync workers, one request each
+    gthread-n-4   CPU workers x 4 threads
+    gthread-1-pool  one worker with DB_POOL_SIZE threads
+
+Usage:
+    python benchmarks/generate_dataset.py      # once
+    python benchmarks/launcher_matrix.py [--users 50] [--duration 60] [--port 8100] [--configs ...]
+"""
+
+import argparse
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+from datetime import datetime
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from async_capacity import rss_mb  # noqa: E402
+
+RESULTS = os.path.join(HERE, 'launcher_results.md')
+SUMMARY = re.compile(r'(\d+) users, ([\d.]+)s, (\d+) requests, ([\d.]+) req/s')
+
+
+def default_configs():
+    cpus = os.cpu_count() or 1
+    pool = os.environ.get('DB_POOL_SIZE', '10')
+    return f'auto=::,sync-2n+1={2 * cpus + 1}:1:sync,gthread-n-4={cpus}:4:gthread,gthread-1-pool=1:{pool}:gthread'
+
+
+def parse_configs(text):
+    configs = []
+    for item in text.split(','):
+        name, _, spec = item.partition('=')
+        workers, threads, worker_class = (spec.split(':') + ['', '', ''])[:3]
+        configs.append((name.strip(), workers, threads, worker_class))
+    return configs
+
+
+def wait_until_up(base, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with urlopen(base + '/login', timeout=2):
+                return True
+        except HTTPError:
+            return True
+        except (URLError, OSError):
+            time.sleep(0.5)
+    return False
+
+
+def launch(name, workers, threads, worker_class, port):
+    command = [sys.executable, os.path.join(ROOT, 'serve.py'), '--bind', f'127.0.0.1:{port}']
+    if workers:
+        command += ['--workers', workers]
+    if threads:
+        command += ['--threads', threads]
+    if worker_class:
+        command += ['--worker-class', worker_class]
+    settings = subprocess.run(command + ['--print-config'], cwd=ROOT, capture_output=True, text=True).stdout
+    values = dict(line.split(None, 1) for line in settings.splitlines() if line.strip())
+    log = open(os.path.join(HERE, f'launcher_{name}.log'), 'w')
+    return subprocess.Popen(command, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT), values, log
+
+
+def load(base, users, duration, password):
+    output = subprocess.run(
+        [sys.executable, os.path.join(HERE, 'load_test.py'), '--base', base, '--users', str(users),
+         '--duration', str(duration), '--password', password],
+        capture_output=True, text=True).stdout
+    summary = SUMMARY.search(output)
+    worst_p95, errors = 0.0, 0
+    for line in output.splitlines():
+        numbers = line.split()[-7:]
+        if line.startswith(('GET ', 'POST ')) and len(numbers) == 7:
+            errors += int(numbers[1])
+            worst_p95 = max(worst_p95, float(numbers[4]))
+    return (float(summary.group(4)) if summary else 0.0), worst_p95, errors, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--password', default='loadtest', help='password given to generate_dataset.py')
+    parser.add_argument('--configs', default=default_configs())
+    args = parser.parse_args()
+
+    base = f'http://127.0.0.1:{args.port}'
+    rows = []
+    for name, workers, threads, worker_class in parse_configs(args.configs):
+        print(f'{name}: starting serve.py ...', flush=True)
+        process, settings, log = launch(name, workers, threads, worker_class, args.port)
+        try:
+            if not wait_until_up(base, process):
+                print(f'{name}: server did not come up, see benchmarks/launcher_{name}.log')
+                continue
+            rps, p95, errors, output = load(base, args.users, args.duration, args.password)
+            rss = rss_mb(process.pid)
+            if not rps:
+                print(output)
+            rows.append((name, settings.get('workers', '?'), settings.get('threads', '?'),
+                         settings.get('worker_class', '?'), rps, p95, errors, rss))
+            print(f'{name}: {rps:.1f} req/s, worst p95 {p95:.1f} ms, {errors} errors', flush=True)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+
+    header = ('| configuration | workers | threads | class | req/s | p95 ms (worst route) | errors | RSS MB |\n'
+              '|---|---|---|---|---|---|---|---|\n')
+    table = ''.join(f'| {n} | {w} | {t} | {c} | {rps:.1f} | {p95:.1f} | {e} | '
+                    f'{f"{rss:.0f}" if rss is not None else "-"} |\n'
+                    for n, w, t, c, rps, p95, e, rss in rows)
+    context = (f'{datetime.now():%Y-%m-%d %H:%M}, {os.cpu_count()} CPUs, DB_POOL_SIZE='
+               f'{os.environ.get("DB_POOL_SIZE", 10)}, DB_POOL_MAX_OVERFLOW={os.environ.get("DB_POOL_MAX_OVERFLOW", 5)}, '
+               f'load_test.py --users {args.users} --duration {args.duration:g}\n\n')
+    print('\n' + header + table)
+    with open(RESULTS, 'a', encoding='utf-8') as f:
+        f.write(f'## {context}{header}{table}\n')
+    print(f'Appended to {RESULTS}')
+
+
+if __name__ == '__main__':
+    main()
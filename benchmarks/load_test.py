@@ -0,0 +1,191 @@
+"""
+Scripted load test against a running instance of app.py.
+
+Each virtual user logs in as one of the patients created by
+benchmarks/generate_dataset.py and loops over a patient session: dashboard,
+batch availability, booking (for `--book` of the iterations), appointment list
+and notifications. `--admins` of the virtual users log in with the admin
+credentials instead and loop over the admin dashboard and the appointment and
+medical-record lists.
+
+At the end it prints count, errors and latency percentiles per route, plus
+overall requests/second.
+
+Usage:
+    python benchmarks/generate_dataset.py          # once
+    python app.py                                  # or the production launcher
+    python benchmarks/load_test.py [--base http://127.0.0.1:5000] [--users 50] \\
+        [--duration 60] [--admins 2 --admin-user admin --admin-password ...] [--book 0.2]
+
+Bookings are made by generated patients, so `generate_dataset.py --purge`
+removes them.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, build_opener, HTTPRedirectHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_dataset import DOMAIN  # noqa: E402
+
+
+class NoRedirect(HTTPRedirectHandler):
+    """Report redirects as responses, so a login redirect is timed on its own."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}          # route -> [seconds]
+        self.errors = {}           # route -> count
+
+    def add(self, route, seconds, ok):
+        with self.lock:
+            self.samples.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+
+class Client:
+    def __init__(self, base, recorder):
+        self.base = base.rstrip('/')
+        self.recorder = recorder
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), NoRedirect())
+
+    def request(self, route, path, data=None, ok=(200,)):
+        body = urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        status, payload = None, b''
+        try:
+            with self.opener.open(self.base + path, data=body, timeout=30) as response:
+                status, payload = response.status, response.read()
+        except HTTPError as e:
+            status, payload = e.code, e.read()
+        except (URLError, OSError):
+            status = None
+        self.recorder.add(route, time.perf_counter() - started, status in ok)
+        return status, payload
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else float('nan')
+
+
+def patient_session(client, username, password, doctors, rng, book_share, deadline):
+    status, _ = client.request('POST /login', '/login', {'username': username, 'password': password}, ok=(302,))
+    if status != 302:
+        return
+    while time.monotonic() < deadline:
+        client.request('GET /user/dashboard', '/user/dashboard')
+
+        start = date.today() + timedelta(days=rng.randint(1, 14))
+        ids = ','.join(str(d) for d in rng.sample(doctors, min(5, len(doctors))))
+        query = urlencode({'doctor_ids': ids, 'start': start.isoformat(),
+                           'end': (start + timedelta(days=6)).isoformat(), 'first': 5})
+        status, payload = client.request('GET /api/availability', '/api/availability?' + query)
+
+        if status == 200 and rng.random() < book_share:
+            offers = json.loads(payload).get('availability') or []
+            if offers:
+                offer = rng.choice(offers)
+                client.request('POST /book_appointment', '/book_appointment', {
+                    'doctor_id': offer['doctor_id'], 'appointment_date': offer['date'],
+                    'start_time': rng.choice(offer['available_slots']), 'reason': 'load_test',
+                }, ok=(302,))
+
+        client.request('GET /appointments', '/appointments')
+        client.request('GET /api/notifications', '/api/notifications')
+
+
+def admin_session(client, username, password, deadline):
+    status, _ = client.request('POST /login (admin)', '/login', {'username': username, 'password': password}, ok=(302,))
+    if status != 302:
+        return
+    while time.monotonic() < deadline:
+        client.request('GET /admin/dashboard', '/admin/dashboard')
+        client.request('GET /appointments (admin)', '/appointments')
+        client.request('GET /medical-records (admin)', '/medical-records')
+
+
+def load_fixtures():
+    """(patient usernames, doctor ids) created by generate_dataset.py."""
+    from app import db_pool
+    conn = db_pool.acquire()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT username FROM users WHERE email LIKE %s AND user_type = 'patient'", (f'%@{DOMAIN}',))
+            patients = [r[0] for r in cur.fetchall()]
+            cur.execute("""
+                SELECT d.doctor_id FROM doctors d JOIN users u ON d.user_id = u.user_id
+                WHERE u.email LIKE %s
+            """, (f'%@{DOMAIN}',))
+            doctors = [r[0] for r in cur.fetchall()]
+    finally:
+        conn.close()
+    return patients, doctors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=50, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='seconds')
+    parser.add_argument('--password', default='loadtest', help='password given to generate_dataset.py')
+    parser.add_argument('--book', type=float, default=0.2, help='share of iterations that book a slot')
+    parser.add_argument('--admins', type=int, default=0, help='how many of the virtual users are admins')
+    parser.add_argument('--admin-user', default='admin')
+    parser.add_argument('--admin-password')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    patients, doctors = load_fixtures()
+    if not patients or not doctors:
+        sys.exit('No generated data found; run benchmarks/generate_dataset.py first')
+    if args.admins and not args.admin_password:
+        sys.exit('--admins needs --admin-password')
+
+    recorder = Recorder()
+    deadline = time.monotonic() + args.duration
+    threads = []
+    for i in range(args.users):
+        client = Client(args.base, recorder)
+        rng = random.Random(args.seed + i)
+        if i < args.admins:
+            target, params = admin_session, (client, args.admin_user, args.admin_password, deadline)
+        else:
+            params = (client, patients[i % len(patients)], args.password, doctors, rng, args.book, deadline)
+            target = patient_session
+        threads.append(threading.Thread(target=target, args=params, daemon=True))
+
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in recorder.samples.values())
+    print(f'{args.users} users, {elapsed:.1f}s, {total} requests, {total / elapsed:.1f} req/s\n')
+    print(f'{"route":<32} {"count":>7} {"errors":>7} {"p50 ms":>8} {"p90 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+    for route in sorted(recorder.samples):
+        ms = sorted(v * 1000 for v in recorder.samples[route])
+        print(f'{route:<32} {len(ms):>7} {recorder.errors.get(route, 0):>7} '
+              f'{percentile(ms, 50):>8.1f} {percentile(ms, 90):>8.1f} {percentile(ms, 95):>8.1f} '
+              f'{percentile(ms, 99):>8.1f} {ms[-1]:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Load test for /notifications/stream with many idle SSE clients.
+
+Opens --clients concurrent streams for one logged-in user, keeps them idle,
+then creates a notification for that user and measures how long each stream
+takes to receive it. Also reports the pool's open connections while the
+streams are idle, which should stay near zero.
+
+Usage:
+    python benchmarks/sse_idle_clients.py --cookie 'session=...' --user 5 \\
+        [--base http://127.0.0.1:5000] [--clients 500] [--idle 20]
+
+The server needs enough threads for --clients concurrent responses (the
+threaded dev server starts one per connection). Under serve.py each worker
+serves at most NOTIFICATION_STREAMS streams and tells the rest to retry, so
+start it with NOTIFICATION_STREAMS >= clients / workers to measure delivery,
+or leave the default to see how many streams are turned away.
+"""
+
+import argparse
+import os
+import select
+import socket
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def open_stream(host, port, cookie):
+    sock = socket.create_connection((host, port))
+    sock.sendall((f'GET /notifications/stream HTTP/1.1\r\nHost: {host}\r\n'
+                  f'Accept: text/event-stream\r\nCookie: {cookie}\r\n\r\n').encode())
+    sock.setblocking(False)
+    return sock
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base', default='http://127.0.0.1:5000')
+    parser.add_argument('--cookie', required=True, help="session cookie of a logged-in user, e.g. 'session=abc'")
+    parser.add_argument('--user', type=int, required=True, help='user_id the cookie belongs to')
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--idle', type=float, default=20, help='seconds to stay idle before notifying')
+    args = parser.parse_args()
+
+    from app import db_pool, notification_hub
+
+    url = urlparse(args.base)
+    started = time.perf_counter()
+    socks = [open_stream(url.hostname, url.port or 80, args.cookie) for _ in range(args.clients)]
+    print(f'opened {len(socks)} streams in {time.perf_counter() - started:.2f}s')
+
+    buffers = {s: b'' for s in socks}
+    deadline = time.monotonic() + args.idle
+    while time.monotonic() < deadline:
+        readable, _, _ = select.select(socks, [], [], 1.0)
+        for s in readable:
+            buffers[s] += s.recv(65536)
+    connected = sum(1 for b in buffers.values() if b.startswith(b'HTTP/1.1 200') or b'200 OK' in b[:40])
+    print(f'{connected}/{len(socks)} streams answered 200 after {args.idle:.0f}s idle')
+    print('local pool while idle:', db_pool.stats())
+
+    conn = db_pool.acquire()
+    with conn.cursor() as cur:
+        notification_hub.create(cur, args.user, 'Load test', 'sse_idle_clients')
+    conn.commit()
+    conn.close()
+    sent = time.perf_counter()
+
+    latencies = {}
+    pending = set(socks)
+    deadline = time.monotonic() + 30
+    while pending and time.monotonic() < deadline:
+        readable, _, _ = select.select(list(pending), [], [], 1.0)
+        for s in readable:
+            chunk = s.recv(65536)
+            buffers[s] += chunk
+            if b'event: notification' in chunk or b'sse_idle_clients' in chunk:
+                latencies[s] = time.perf_counter() - sent
+                pending.discard(s)
+
+    ms = [v * 1000 for v in latencies.values()]
+    print(f'delivered to {len(ms)}/{len(socks)} streams; latency ms '
+          f'p50={percentile(ms, 50):.0f} p95={percentile(ms, 95):.0f} max={max(ms or [float("nan")]):.0f}')
+    for s in socks:
+        s.close()
+    sys.exit(0 if len(ms) == len(socks) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Benchmark suite for the hot paths of app.py, with a stored baseline.
+
+Cases (median milliseconds per call):
+- safe_time           the Jinja time filter over a mix of input types
+- free_slots          AvailabilityIndex.free_slots() with a warm weekly template
+- dashboard_slots     GET /user/dashboard with doctor_id and appointment_date (server-side slots)
+- doctor_availability GET /api/doctor-availability/<id>
+- profile_build       GET /doctor/<id>/profile with the cached document dropped first
+- profile_cached      GET /doctor/<id>/profile served from the cache
+- profile_304         the same with a matching If-None-Match
+- doctor_search       GET /api/doctors/search?q=<specialization prefix> from the warm in-memory index
+- record_search       GET /medical-records?q=migraine as an admin (FULLTEXT, ranked, first page)
+- admin_dashboard     GET /admin/dashboard
+
+Requests go through Flask's test client in this process, against the
+configured MySQL database. With `--sizes`, the generated dataset is
+purged and regenerated at each size (see generate_dataset.py) before its cases
+run. Without it the suite runs once against whatever data is there, labelled
+"current".
+
+Results are compared with benchmarks/baseline.json (same machine, same sizes);
+the run exits with status 1 if any case is more than `--threshold` slower than
+its baseline. `--save` writes the current results as the new baseline.
+
+Usage:
+    python benchmarks/suite.py --sizes small,medium --save     # record a baseline
+    python benchmarks/suite.py --sizes small,medium            # compare with it
+    python benchmarks/suite.py --only profile_cached,admin_dashboard
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# measure the app, not the profiler
+os.environ.setdefault('SQL_PROFILE', '0')
+
+import app as hospital  # noqa: E402
+import generate_dataset  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SIZES = {
+    'small': dict(patients=500, doctors=30, appointments=5000),
+    'medium': dict(patients=5000, doctors=200, appointments=100000),
+    'large': dict(patients=20000, doctors=500, appointments=500000),
+}
+
+
+def measure(fn, number, repeat=5, warmup=3):
+    """Median milliseconds per call over `repeat` rounds of `number` calls."""
+    for _ in range(warmup):
+        fn()
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) * 1000 / number)
+    return statistics.median(rounds)
+
+
+def fixtures():
+    """A generated patient, a scheduled doctor, the next date they work, and an admin id."""
+    conn = hospital.db_pool.acquire()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT user_id FROM users WHERE user_type = 'patient' ORDER BY user_id LIMIT 1")
+            patient = cur.fetchone()
+            cur.execute("SELECT user_id FROM users WHERE user_type = 'admin' ORDER BY user_id LIMIT 1")
+            admin = cur.fetchone()
+            cur.execute("SELECT doctor_id FROM doctor_schedules ORDER BY doctor_id LIMIT 1")
+            doctor = cur.fetchone()
+        if not (patient and doctor):
+            sys.exit('Need at least one patient and one scheduled doctor; run generate_dataset.py')
+        doctor_id = doctor[0]
+        day = date.today() + timedelta(days=1)
+        for _ in range(7):
+            if hospital.availability.free_slots(conn, doctor_id, day):
+                break
+            day += timedelta(days=1)
+        return patient[0], admin[0] if admin else patient[0], doctor_id, day
+    finally:
+        conn.close()
+
+
+def client_as(user_id, user_type):
+    client = hospital.app.test_client()
+    with client.session_transaction() as s:
+        s.update(user_id=user_id, username='bench', user_type=user_type,
+                 is_admin=user_type == 'admin', is_doctor=False)
+    return client
+
+
+def get(client, path, status=200, **kwargs):
+    def call():
+        response = client.get(path, **kwargs)
+        if response.status_code != status:
+            raise RuntimeError(f'{path}: HTTP {response.status_code}')
+    return call
+
+
+def cases():
+    patient, admin, doctor_id, day = fixtures()
+    patient_client = client_as(patient, 'patient')
+    admin_client = client_as(admin, 'admin')
+    profile = f'/doctor/{doctor_id}/profile'
+    etag = patient_client.get(profile).headers.get('ETag')
+    conn = hospital.db_pool.acquire()
+    try:
+        index = hospital.doctor_search.build(conn)
+    finally:
+        conn.close()
+    term = next((d['specialization'][:4] for d in index.doctors if d['specialization']), 'dr')
+    times = ['09:30:00', dtime(14, 0), timedelta(hours=16, minutes=30), None, date.today()]
+
+    def safe_time():
+        for value in times:
+            hospital.safe_time(value)
+
+    def free_slots():
+        conn = hospital.db_pool.acquire()
+        try:
+            hospital.availability.free_slots(conn, doctor_id, day)
+        finally:
+            conn.close()
+
+    build = get(patient_client, profile)
+
+    def profile_build():
+        hospital.invalidate_doctor_profiles(doctor_id)
+        build()
+
+    return {
+        'safe_time': (safe_time, 20000),
+        'free_slots': (free_slots, 200),
+        'dashboard_slots': (get(patient_client, f'/user/dashboard?doctor_id={doctor_id}&appointment_date={day}'), 50),
+        'doctor_availability': (get(patient_client, f'/api/doctor-availability/{doctor_id}?date={day}'), 200),
+        'profile_build': (profile_build, 100),
+        'profile_cached': (get(patient_client, profile), 500),
+        'profile_304': (get(patient_client, profile, status=304, headers={'If-None-Match': etag}), 500),
+        'doctor_search': (get(patient_client, f'/api/doctors/search?q={term}'), 500),
+        'record_search': (get(admin_client, '/medical-records?q=migraine'), 50),
+        'admin_dashboard': (get(admin_client, '/admin/dashboard'), 50),
+    }
+
+
+def run_cases(only):
+    results = {}
+    for name, (fn, number) in cases().items():
+        if only and name not in only:
+            continue
+        results[name] = round(measure(fn, number), 4)
+        print(f'  {name:<22} {results[name]:>10.3f} ms')
+    return results
+
+
+def reseed(size):
+    conn = hospital.db_pool.acquire()
+    try:
+        generate_dataset.purge(conn)
+        generate_dataset.generate(conn, random.Random(1), **SIZES[size])
+    finally:
+        conn.close()
+
+
+def compare(results, baseline, threshold):
+    """Print current vs baseline; returns the list of regressions."""
+    regressions = []
+    print(f'\n{"size":<8} {"case":<22} {"baseline":>10} {"current":>10} {"change":>8}')
+    for size, cases_ in results.items():
+        for name, current in cases_.items():
+            before = baseline.get(size, {}).get(name)
+            if not before:
+                print(f'{size:<8} {name:<22} {"-":>10} {current:>10.3f} {"new":>8}')
+                continue
+            change = current / before - 1
+            flag = '  REGRESSION' if change > threshold else ''
+            print(f'{size:<8} {name:<22} {before:>10.3f} {current:>10.3f} {change:>+8.1%}{flag}')
+            if flag:
+                regressions.append((size, name, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', help=f'comma separated, from {", ".join(SIZES)}; regenerates data per size')
+    parser.add_argument('--only', help='comma separated case names')
+    parser.add_argument('--threshold', type=float, default=0.20, help='allowed slowdown before failing (0.20 = 20%%)')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='write these results as the new baseline')
+    args = parser.parse_args()
+
+    only = set(args.only.split(',')) if args.only else None
+    sizes = args.sizes.split(',') if args.sizes else ['current']
+    for size in sizes:
+        if size != 'current' and size not in SIZES:
+            parser.error(f'unknown size {size!r}')
+
+    results = {}
+    for size in sizes:
+        if size != 'current':
+            print(f'seeding {size} ...')
+            reseed(size)
+        print(f'{size}:')
+        results[size] = run_cases(only)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.save:
+        for size, cases_ in results.items():
+            baseline.setdefault(size, {}).update(cases_)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f'\nbaseline written to {args.baseline}')
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Appointment write paths: slot reservation, status changes and deletes.
+
+Double booking is prevented by the database, not by a SELECT-then-INSERT check:
+`uq_appointments_active_slot` (see migrations/0001_appointments_active_slot.sql)
+allows only one Pending/Confirmed appointment per doctor, date and start time.
+Concurrent bookings for the same slot race on that index; exactly one INSERT
+wins and the others fail immediately with a duplicate-key error, so no retries
+or application-level locks are needed.
+
+Every write to an appointment goes through this module (`reserve_slot`,
+`change_status`, `delete_appointment`). Code that keeps derived data in step
+with appointments (counters, caches) registers a listener with
+`on_appointment_change(fn)`; `fn(cur, before, after)` is called inside the same
+transaction with row snapshots, `before` being None for a new booking and
+`after` None for a delete.
+"""
+
+from datetime import date
+
+from mysql.connector import IntegrityError, errorcode
+
+SNAPSHOT_COLUMNS = ('appointment_id', 'user_id', 'doctor_id', 'appointment_date', 'start_time', 'status')
+UPDATABLE_COLUMNS = ('appointment_date', 'start_time', 'reason')
+
+_listeners = []
+
+
+class SlotTaken(Exception):
+    """The requested slot already has an active booking."""
+
+
+def on_appointment_change(fn):
+    _listeners.append(fn)
+    return fn
+
+
+def _notify(cur, before, after):
+    for fn in _listeners:
+        fn(cur, before, after)
+
+
+def is_duplicate_key(error):
+    return getattr(error, 'errno', None) == errorcode.ER_DUP_ENTRY
+
+
+def reserve_slot(conn, user_id, doctor_id, appointment_date, start_time, reason):
+    """Insert a Pending appointment in one statement and return its id.
+
+    Returns None if the doctor doesn't exist and raises SlotTaken if the slot is
+    already booked. The caller commits.
+    """
+    with conn.cursor() as cur:
+        try:
+            cur.execute("""
+                INSERT INTO appointments
+                (user_id, doctor_id, appointment_date, start_time, reason, status, doctor_name)
+                SELECT %s, d.doctor_id, %s, %s, %s, 'Pending',
+                       COALESCE(u.full_name, u.username, 'Dr. Unknown')
+                FROM doctors d
+                JOIN users u ON d.user_id = u.user_id
+                WHERE d.doctor_id = %s
+            """, (user_id, appointment_date, start_time, reason, doctor_id))
+        except IntegrityError as e:
+            if is_duplicate_key(e):
+                conn.rollback()
+                raise SlotTaken(f'doctor {doctor_id} is already booked at {appointment_date} {start_time}')
+            raise
+        if cur.rowcount == 0:
+            return None
+        appointment_id = cur.lastrowid
+        if isinstance(appointment_date, str):
+            appointment_date = date.fromisoformat(appointment_date)
+        _notify(cur, None, {
+            'appointment_id': appointment_id, 'user_id': user_id, 'doctor_id': int(doctor_id),
+            'appointment_date': appointment_date, 'start_time': start_time, 'status': 'Pending',
+        })
+        return appointment_id
+
+
+def _lock_appointment(cur, appointment_id, doctor_user_id=None):
+    columns = ', '.join(f'a.{c}' for c in SNAPSHOT_COLUMNS)
+    if doctor_user_id is None:
+        cur.execute(f"SELECT {columns} FROM appointments a WHERE a.appointment_id = %s FOR UPDATE",
+                    (appointment_id,))
+    else:
+        cur.execute(f"""
+            SELECT {columns} FROM appointments a
+            JOIN doctors d ON a.doctor_id = d.doctor_id
+            WHERE a.appointment_id = %s AND d.user_id = %s
+            FOR UPDATE
+        """, (appointment_id, doctor_user_id))
+    row = cur.fetchone()
+    return dict(zip(SNAPSHOT_COLUMNS, row)) if row else None
+
+
+def change_status(conn, appointment_id, status, doctor_user_id=None, **fields):
+    """Set an appointment's status (and optionally appointment_date/start_time/reason).
+
+    With `doctor_user_id`, only touches appointments of that doctor. Returns the
+    row as it was before the change, or None if there was no such appointment.
+    Raises SlotTaken if the new date/time collides with an active booking.
+    The caller commits.
+    """
+    with conn.cursor() as cur:
+        before = _lock_appointment(cur, appointment_id, doctor_user_id)
+        if before is None:
+            return None
+        changes = {'status': status}
+        changes.update((k, v) for k, v in fields.items() if k in UPDATABLE_COLUMNS)
+        try:
+            cur.execute(
+                "UPDATE appointments SET " + ', '.join(f'{c} = %s' for c in changes) + " WHERE appointment_id = %s",
+                (*changes.values(), appointment_id))
+        except IntegrityError as e:
+            if is_duplicate_key(e):
+                conn.rollback()
+                raise SlotTaken(f'slot already booked for doctor {before["doctor_id"]}')
+            raise
+        after = dict(before, **{k: v for k, v in changes.items() if k in SNAPSHOT_COLUMNS})
+        if isinstance(after['appointment_date'], str):
+            after['appointment_date'] = date.fromisoformat(after['appointment_date'])
+        _notify(cur, before, after)
+    return before
+
+
+def delete_appointment(conn, appointment_id):
+    """Delete an appointment; returns its last state or None. The caller commits."""
+    with conn.cursor() as cur:
+        before = _lock_appointment(cur, appointment_id)
+        if before is None:
+            return None
+        cur.execute("DELETE FROM appointments WHERE appointment_id = %s", (appointment_id,))
+        _notify(cur, before, None)
+    return before
@@ -1,5 +1,7 @@
 import mysql.connector
 
+from availability import DAY_NAMES
+
 def main():
     cfg = {
         'host': 'localhost',
@@ -15,14 +17,14 @@ def main():
     cur = conn.cursor()
     names = ['Rakesh','Pooja','Dev','Sanjay','Kirti','Nitin','Tanvi','Mohit','Kavita','Swati','Manish','Ruchi','Shreya','Abhay','Nikita']
     placeholder = ','.join(['%s']*len(names))
-    sql = f"SELECT u.full_name, d.doctor_id, ds.day_of_week, ds.start_time, ds.end_time FROM users u JOIN doctors d ON u.user_id=d.user_id LEFT JOIN doctor_schedules ds ON d.doctor_id=ds.doctor_id WHERE u.full_name IN ({placeholder}) ORDER BY u.full_name, ds.day_of_week"
+    sql = f"SELECT u.full_name, d.doctor_id, ds.weekday, ds.start_time, ds.end_time FROM users u JOIN doctors d ON u.user_id=d.user_id LEFT JOIN doctor_schedules ds ON d.doctor_id=ds.doctor_id WHERE u.full_name IN ({placeholder}) ORDER BY u.full_name, ds.weekday, ds.start_time"
     cur.execute(sql, tuple(names))
     rows = cur.fetchall()
     if not rows:
         print('No schedule rows found for provided doctors.')
     else:
-        for r in rows:
-            print(r)
+        for name, doctor_id, weekday, start, end in rows:
+            print((name, doctor_id, DAY_NAMES[weekday] if weekday is not None else None, start, end))
     cur.close()
     conn.close()
 
@@ -0,0 +1,127 @@
+"""
+Incrementally maintained counters for the admin dashboard.
+
+Counters live in the `dashboard_counters` table (migrations/0002_dashboard_counters.sql)
+and are updated in the same transaction as the change they describe, so they
+commit or roll back together with it. Each counter is split over `SHARDS` rows
+and writers pick one at random, so concurrent bookings don't queue on a single
+hot row; readers sum the shards.
+
+Counter names:
+    patients, doctors, appointments, appointments:<status>
+
+`reconcile()` recomputes everything from the real tables and reports drift. The
+app runs it every STATS_RECONCILE_SECONDS; it can also be run by hand:
+
+    python dashboard_stats.py
+"""
+
+import logging
+import random
+import threading
+import time
+
+SHARDS = 8
+STATUSES = ('Pending', 'Confirmed', 'Completed', 'Cancelled')
+
+
+def bump(cur, name, delta=1):
+    cur.execute("""
+        INSERT INTO dashboard_counters (name, shard, value) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+    """, (name, random.randrange(SHARDS), delta))
+
+
+def record_change(cur, before, after):
+    """Appointment change listener: `before`/`after` are row snapshots, None for insert/delete."""
+    old = before['status'] if before else None
+    new = after['status'] if after else None
+    if old == new:
+        return
+    if old is None:
+        bump(cur, 'appointments', 1)
+    if new is None:
+        bump(cur, 'appointments', -1)
+    if old is not None:
+        bump(cur, f'appointments:{old}', -1)
+    if new is not None:
+        bump(cur, f'appointments:{new}', 1)
+
+
+def read(conn):
+    """{name: value} for every counter."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT name, SUM(value) FROM dashboard_counters GROUP BY name")
+        return {name: int(value or 0) for name, value in cur.fetchall()}
+
+
+def scan(conn):
+    """Compute the same counters with full table scans."""
+    counts = {}
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM users WHERE user_type = 'patient'")
+        counts['patients'] = cur.fetchone()[0] or 0
+        cur.execute("SELECT COUNT(*) FROM doctors")
+        counts['doctors'] = cur.fetchone()[0] or 0
+        cur.execute("SELECT status, COUNT(*) FROM appointments GROUP BY status")
+        by_status = dict(cur.fetchall())
+    counts['appointments'] = sum(by_status.values())
+    for status in set(STATUSES) | set(by_status):
+        counts[f'appointments:{status}'] = by_status.get(status, 0)
+    return counts
+
+
+def drift(counters, actual):
+    """{name: (counter, actual)} for every counter that disagrees with the tables."""
+    return {name: (counters.get(name, 0), value)
+            for name, value in actual.items() if counters.get(name, 0) != value}
+
+
+def reconcile(conn):
+    """Reset the counters to the real table counts; returns the drift that was fixed."""
+    with conn.cursor() as cur:
+        # lock the counter rows first so concurrent bumps wait for the reset
+        cur.execute("SELECT name FROM dashboard_counters FOR UPDATE")
+        cur.fetchall()
+        actual = scan(conn)
+        cur.execute("SELECT name, SUM(value) FROM dashboard_counters GROUP BY name")
+        fixed = drift({name: int(value or 0) for name, value in cur.fetchall()}, actual)
+        cur.execute("DELETE FROM dashboard_counters")
+        cur.executemany("INSERT INTO dashboard_counters (name, shard, value) VALUES (%s, 0, %s)",
+                        list(actual.items()))
+    conn.commit()
+    if fixed:
+        logging.warning('Dashboard counters drifted and were reset: %s', fixed)
+    return fixed
+
+
+class Reconciler:
+    """Runs `reconcile()` at most once per `interval` seconds per process."""
+
+    def __init__(self, interval=900):
+        self.interval = interval
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def maybe_run(self, conn):
+        if not self.interval or time.monotonic() - self._last < self.interval:
+            return None
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self._last = time.monotonic()
+            return reconcile(conn)
+        except Exception:
+            logging.exception('Dashboard counter reconciliation failed')
+            return None
+        finally:
+            self._lock.release()
+
+
+if __name__ == '__main__':
+    from app import get_db_connection
+
+    logging.basicConfig(level=logging.INFO)
+    conn = get_db_connection()
+    print(reconcile(conn) or 'counters already match')
+    conn.close()
@@ -0,0 +1,243 @@
+"""
+Connection pool for the hospital app.
+
+Opening a MySQL connection costs a TCP + auth handshake, which is more than most
+of our queries take. `ConnectionPool` keeps a set of open connections and hands
+them out as `PooledConnection` proxies; calling `close()` on a proxy returns the
+connection to the pool instead of closing the socket, so existing route code
+(`conn.close()` in `finally`) keeps working unchanged.
+
+Features:
+- fixed `size` of kept-open connections plus `max_overflow` temporary ones
+- `ping` health check on checkout (broken connections are replaced)
+- `recycle`: connections older than this many seconds are reopened
+- leak detection: connections borrowed for longer than `leak_timeout` seconds are
+  logged once together with the stack that borrowed them
+- `stats()` for metrics
+- `warm()` opens connections ahead of traffic; `dispose()` drops idle ones
+  (call it in a forked child so it never shares the parent's sockets)
+- `conn.discard()` closes a borrowed connection instead of returning it, for
+  callers that abandon a large unbuffered result halfway
+"""
+
+import logging
+import threading
+import time
+import traceback
+from collections import deque
+
+import mysql.connector
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection became free within the checkout timeout."""
+
+
+class PooledConnection:
+    """Proxy around a raw connection; `close()` gives it back to the pool."""
+
+    def __init__(self, pool, raw, created_at, stack=None):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._borrowed_at = time.monotonic()
+        self._stack = stack
+        self._leak_reported = False
+        self.released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def is_connected(self):
+        if self.released:
+            return False
+        try:
+            return self._raw.is_connected()
+        except Exception:
+            return False
+
+    def close(self):
+        if not self.released:
+            self._pool._release(self)
+
+    def discard(self):
+        """Close the connection instead of returning it (e.g. with a large result left unread)."""
+        if not self.released:
+            self._pool._release(self, reuse=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, config, size=10, max_overflow=5, timeout=5.0,
+                 recycle=3600, leak_timeout=60.0, ping=True):
+        self.config = dict(config)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.leak_timeout = leak_timeout
+        self.ping = ping
+
+        self._cond = threading.Condition()
+        self._idle = deque()          # (raw, created_at)
+        self._checked_out = {}        # id(proxy) -> proxy
+        self._open = 0
+        self._last_leak_check = 0.0
+        self._counters = {
+            'checkouts': 0,
+            'connects': 0,
+            'timeouts': 0,
+            'recycled': 0,
+            'ping_failures': 0,
+            'leaks': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def _count(self, name):
+        with self._cond:
+            self._counters[name] += 1
+
+    # ---------- checkout / return ----------
+    def acquire(self, timeout=None):
+        """Borrow a connection, waiting up to `timeout` seconds (default: the pool's); 0 never waits."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        raw = created_at = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if timeout:
+                        self._counters['timeouts'] += 1
+                    raise PoolExhausted(
+                        f'no connection available within {timeout}s '
+                        f'({self._open} open, {len(self._checked_out)} in use)')
+                self._cond.wait(remaining)
+
+        if raw is not None:
+            raw = self._validate(raw, created_at)
+        if raw is None:
+            try:
+                raw = mysql.connector.connect(**self.config)
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            created_at = time.monotonic()
+            self._count('connects')
+
+        stack = ''.join(traceback.format_stack(limit=12)[:-1]) if self.leak_timeout else None
+        conn = PooledConnection(self, raw, created_at, stack)
+        with self._cond:
+            self._checked_out[id(conn)] = conn
+            self._counters['checkouts'] += 1
+            self._counters['wait_seconds'] += time.monotonic() - started
+        self._check_leaks()
+        return conn
+
+    def _validate(self, raw, created_at):
+        """Return `raw` if it is still usable, otherwise close it and return None."""
+        if self.recycle and time.monotonic() - created_at > self.recycle:
+            self._count('recycled')
+            self._close_raw(raw)
+            return None
+        if self.ping:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._count('ping_failures')
+                self._close_raw(raw)
+                return None
+        return raw
+
+    def _release(self, conn, reuse=True):
+        conn.released = True
+        raw = conn._raw
+        keep = reuse
+        try:
+            if keep:
+                if raw.unread_result:
+                    raw.consume_results()
+                raw.rollback()
+        except Exception:
+            keep = False
+
+        with self._cond:
+            self._checked_out.pop(id(conn), None)
+            expired = self.recycle and time.monotonic() - conn._created_at > self.recycle
+            if keep and not expired and len(self._idle) < self.size:
+                self._idle.append((raw, conn._created_at))
+                raw = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if raw is not None:
+            self._close_raw(raw)
+
+    @staticmethod
+    def _close_raw(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    # ---------- housekeeping ----------
+    def _check_leaks(self):
+        now = time.monotonic()
+        if not self.leak_timeout or now - self._last_leak_check < 1.0:
+            return
+        self._last_leak_check = now
+        with self._cond:
+            borrowed = list(self._checked_out.values())
+        for conn in borrowed:
+            if not conn._leak_reported and now - conn._borrowed_at > self.leak_timeout:
+                conn._leak_reported = True
+                self._count('leaks')
+                logging.warning('DB connection held for %.0fs without being returned; borrowed at:\n%s',
+                                now - conn._borrowed_at, conn._stack)
+
+    def warm(self, count=None):
+        """Open up to `count` (default `size`) connections now, so early requests skip the handshake."""
+        borrowed = []
+        try:
+            for _ in range(min(count or self.size, self.size)):
+                borrowed.append(self.acquire())
+        finally:
+            for conn in borrowed:
+                conn.close()
+        return len(borrowed)
+
+    def dispose(self):
+        """Close all idle connections (e.g. on shutdown or after fork)."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw, _ in idle:
+            self._close_raw(raw)
+
+    def stats(self):
+        with self._cond:
+            in_use = len(self._checked_out)
+            data = dict(self._counters)
+            data.update(size=self.size,
+                        max_overflow=self.max_overflow,
+                        open=self._open,
+                        idle=len(self._idle),
+                        in_use=in_use)
+        data['avg_wait_ms'] = round(1000 * data.pop('wait_seconds') / data['checkouts'], 3) if data['checkouts'] else 0.0
+        return data
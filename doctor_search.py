@@ -0,0 +1,234 @@
+"""
+Doctor search for the booking page's typeahead.
+
+`DoctorSearch.search(connect, query)` matches every word of the query against
+doctor names, specializations and department names and returns the best
+matches first. Words match as prefixes ("car" finds "Cardiology"); a word with
+no prefix match falls back to trigram similarity, so small typos still find
+the doctor ("cardiolgy").
+
+The index is built in memory from all active doctors (one query) and swapped
+in whole, so searches never wait on a rebuild:
+
+- cold (first use, or after `invalidate()`): the search runs against MySQL's
+  FULLTEXT indexes (migrations/0006_doctor_search.sql) while the index is built
+  in a background thread;
+- older than `ttl`: the current index keeps answering while a fresh one is
+  built, which picks up changes made by other workers and scripts.
+
+Writers that change doctors, their users or departments call `invalidate()`
+after committing. The index is per process, like the other in-memory caches;
+writers in other processes (seed_doctors.py) bump the shared `generation`
+(ref_cache.Generation) instead, and every worker drops its index within a
+second of seeing the new token.
+
+Ranking: an exact word match scores twice a prefix match, a trigram match
+scores its similarity; matches in the name count 3x, specialization 2x,
+department 1x. Ties are broken by name.
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+DOCTORS_SQL = """
+    SELECT d.doctor_id,
+           COALESCE(u.full_name, u.username, 'Dr. Unknown') AS display_name,
+           d.specialization,
+           dep.name AS department_name
+    FROM doctors d
+    JOIN users u ON d.user_id = u.user_id
+    LEFT JOIN departments dep ON d.department_id = dep.department_id
+    WHERE u.is_active = TRUE
+"""
+
+FIELDS = (('display_name', 3), ('specialization', 2), ('department_name', 1))
+SIMILARITY = 0.5          # minimum Dice coefficient for a trigram match
+MIN_FULLTEXT_WORD = 3     # innodb_ft_min_token_size; shorter words use LIKE
+WORD = re.compile(r'[a-z0-9]+')
+
+
+def words(text):
+    """Lowercase ASCII words with accents removed ("José" -> ["jose"])."""
+    if not text:
+        return []
+    folded = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower()
+    return WORD.findall(folded)
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Immutable prefix + trigram index over a list of doctor rows."""
+
+    def __init__(self, doctors):
+        self.doctors = [{'doctor_id': d['doctor_id'], 'display_name': d['display_name'],
+                         'specialization': d['specialization'], 'department_name': d['department_name']}
+                        for d in doctors]
+        postings = defaultdict(dict)               # word -> {doctor index: field weight}
+        for i, doctor in enumerate(self.doctors):
+            for field, weight in FIELDS:
+                for word in words(doctor[field]):
+                    postings[word][i] = max(postings[word].get(i, 0), weight)
+        self.words = sorted(postings)
+        self.postings = [postings[w] for w in self.words]
+        self.grams = defaultdict(list)             # trigram -> word positions
+        for position, word in enumerate(self.words):
+            for gram in trigrams(word):
+                self.grams[gram].append(position)
+
+    def __len__(self):
+        return len(self.doctors)
+
+    def _prefix(self, term):
+        scores = {}
+        position = bisect_left(self.words, term)
+        while position < len(self.words) and self.words[position].startswith(term):
+            factor = 2 if self.words[position] == term else 1
+            for i, weight in self.postings[position].items():
+                scores[i] = max(scores.get(i, 0), weight * factor)
+            position += 1
+        return scores
+
+    def _similar(self, term):
+        grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for position in self.grams.get(gram, ()):
+                shared[position] += 1
+        scores = {}
+        for position, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(trigrams(self.words[position])))
+            if similarity >= SIMILARITY:
+                for i, weight in self.postings[position].items():
+                    scores[i] = max(scores.get(i, 0), weight * similarity)
+        return scores
+
+    def search(self, query, limit=10):
+        scores = None
+        for term in words(query):
+            found = self._prefix(term) or (self._similar(term) if len(term) >= 3 else {})
+            scores = found if scores is None else {i: s + found[i] for i, s in scores.items() if i in found}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.doctors[item[0]]['display_name']))
+        return [dict(self.doctors[i], score=round(score, 2)) for i, score in ranked[:limit]]
+
+
+class DoctorSearch:
+    def __init__(self, connect, ttl=300, generation=None):
+        self.connect = connect            # returns a pooled connection for background builds
+        self.ttl = ttl
+        self.generation = generation      # ref_cache.Generation bumped by writers in any process
+        self._index = None
+        self._built_at = 0.0
+        self._generation = 0              # bumped by invalidate(); a build started before it is discarded
+        self._building = False
+        self._lock = threading.Lock()
+        self._counters = {'memory': 0, 'fulltext': 0, 'builds': 0}
+
+    def search(self, connect, query, limit=10):
+        """Ranked matches: [{'doctor_id', 'display_name', 'specialization', 'department_name', 'score'}].
+
+        `connect` is only called while the index is cold, so a warm search uses no connection.
+        """
+        if self.generation is not None and self.generation.changed():
+            self.invalidate()
+        with self._lock:
+            index = self._index
+            if index is None or time.monotonic() - self._built_at >= self.ttl:
+                self._start_build()
+            self._counters['memory' if index is not None else 'fulltext'] += 1
+        if index is not None:
+            return index.search(query, limit)
+        return fulltext_search(connect(), query, limit)
+
+    def invalidate(self):
+        """Drop the index after a doctor, user or department change; the next search rebuilds it."""
+        with self._lock:
+            self._index = None
+            self._generation += 1
+
+    def after_fork(self):
+        """Call in a forked child: the parent's build thread doesn't exist here."""
+        self._lock = threading.Lock()
+        self._building = False
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, doctors=len(self._index) if self._index is not None else None,
+                        age=round(time.monotonic() - self._built_at) if self._index is not None else None)
+
+    def build(self, conn):
+        """Build and install the index now (e.g. before forking workers)."""
+        with self._lock:
+            generation = self._generation
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(DOCTORS_SQL)
+            index = SearchIndex(cur.fetchall())
+        with self._lock:
+            self._counters['builds'] += 1
+            if generation == self._generation:
+                self._index = index
+                self._built_at = time.monotonic()
+        return index
+
+    def _start_build(self):
+        # caller holds self._lock
+        if self._building:
+            return
+        self._building = True
+        threading.Thread(target=self._build_in_background, name='doctor-search-build', daemon=True).start()
+
+    def _build_in_background(self):
+        conn = None
+        try:
+            conn = self.connect()
+            self.build(conn)
+        except Exception as e:
+            logging.warning('Doctor search index build failed: %s', e)
+        finally:
+            if conn is not None:
+                conn.close()
+            with self._lock:
+                self._building = False
+
+
+def fulltext_search(conn, query, limit=10):
+    """Ranked matches from MySQL while the in-memory index is cold."""
+    terms = words(query)
+    if not terms:
+        return []
+    long_terms = [t for t in terms if len(t) >= MIN_FULLTEXT_WORD]
+    with conn.cursor(dictionary=True) as cur:
+        if long_terms:
+            # every word as a prefix; rows matching more words rank higher
+            expression = ' '.join(f'{t}*' for t in long_terms)
+            cur.execute(DOCTORS_SQL + """
+                  AND (MATCH(u.full_name, u.username) AGAINST (%s IN BOOLEAN MODE)
+                       OR MATCH(d.specialization) AGAINST (%s IN BOOLEAN MODE)
+                       OR MATCH(dep.name) AGAINST (%s IN BOOLEAN MODE))
+                ORDER BY MATCH(u.full_name, u.username) AGAINST (%s IN BOOLEAN MODE) * 3
+                       + MATCH(d.specialization) AGAINST (%s IN BOOLEAN MODE) * 2
+                       + COALESCE(MATCH(dep.name) AGAINST (%s IN BOOLEAN MODE), 0) DESC,
+                         display_name
+                LIMIT %s
+            """, (expression,) * 6 + (limit,))
+        else:
+            # words shorter than the FULLTEXT token size: prefix match on the name or specialization
+            prefix = terms[0] + '%'
+            cur.execute(DOCTORS_SQL + """
+                  AND (u.full_name LIKE %s OR u.username LIKE %s OR d.specialization LIKE %s)
+                ORDER BY display_name
+                LIMIT %s
+            """, (prefix, prefix, prefix, limit))
+        return [dict(row, score=None) for row in cur.fetchall()]
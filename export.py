@@ -0,0 +1,144 @@
+"""
+Streaming CSV / NDJSON exports of appointments and medical records.
+
+`stream(connect, name, fmt, where, params)` is a generator for a Flask
+Response. It reads the result with an unbuffered cursor in `fetchmany`
+batches and encodes each batch as it goes, so memory stays at about one batch
+however many rows are exported. Rows come out in date order, which is the
+order of the date indexes from migration 0003, so MySQL can send the first
+rows without sorting the whole result first.
+
+The export holds its own pooled connection (not the request's) for as long as
+the client keeps reading. The session's net_write_timeout is raised so a slow
+download doesn't make MySQL drop the connection while it waits. If the client
+goes away mid-export, the connection is discarded rather than returned to the
+pool, since draining the rest of a large result would cost as much as
+sending it.
+"""
+
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+BATCH_SIZE = 1000
+NET_WRITE_TIMEOUT = 600       # seconds MySQL waits for us to read the next packet
+
+EXPORTS = {
+    'appointments': {
+        'sql': """
+            SELECT a.appointment_id, a.appointment_date, a.start_time, a.end_time, a.status, a.reason,
+                   a.user_id AS patient_id, COALESCE(pu.full_name, pu.username) AS patient_name,
+                   a.doctor_id, COALESCE(du.full_name, du.username) AS doctor_name, a.created_at
+            FROM appointments a
+            JOIN users pu ON a.user_id = pu.user_id
+            JOIN doctors d ON a.doctor_id = d.doctor_id
+            JOIN users du ON d.user_id = du.user_id
+        """,
+        'date_column': 'a.appointment_date',
+        'doctor_column': 'a.doctor_id',
+        'status_column': 'a.status',
+        'order_by': 'a.appointment_date, a.start_time, a.appointment_id',
+    },
+    'medical-records': {
+        'sql': """
+            SELECT mr.record_id, mr.visit_date, mr.user_id AS patient_id,
+                   COALESCE(pu.full_name, pu.username) AS patient_name,
+                   mr.doctor_id, COALESCE(du.full_name, du.username) AS doctor_name,
+                   mr.diagnosis, mr.treatment, mr.prescription, mr.notes, mr.follow_up_date, mr.created_at
+            FROM medical_records mr
+            JOIN users pu ON mr.user_id = pu.user_id
+            JOIN doctors d ON mr.doctor_id = d.doctor_id
+            JOIN users du ON d.user_id = du.user_id
+        """,
+        'date_column': 'mr.visit_date',
+        'doctor_column': 'mr.doctor_id',
+        'status_column': None,
+        'order_by': 'mr.visit_date, mr.record_id',
+    },
+}
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def text(value):
+    """JSON/CSV form of a column value (dates ISO, TIME as HH:MM:SS)."""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return '%02d:%02d:%02d' % (seconds // 3600, seconds % 3600 // 60, seconds % 60)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+def batches(conn, sql, params, size=BATCH_SIZE):
+    """(column names, generator of row batches) from an unbuffered cursor."""
+    cur = conn.cursor(buffered=False)
+    cur.execute(f"SET SESSION net_write_timeout = {NET_WRITE_TIMEOUT}")
+    cur.execute(sql, params)
+    columns = [d[0] for d in cur.description]
+
+    def rows():
+        while True:
+            batch = cur.fetchmany(size)
+            if not batch:
+                # only a fully read cursor can be closed; an abandoned one goes with its connection
+                cur.close()
+                return
+            yield batch
+    return columns, rows()
+
+
+def encode_csv(columns, row_batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in row_batches:
+        writer.writerows([text(v) for v in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_ndjson(columns, row_batches):
+    for batch in row_batches:
+        yield ''.join(json.dumps(dict(zip(columns, map(text, row))), ensure_ascii=False) + '\n'
+                      for row in batch)
+
+
+def query(name, where):
+    spec = EXPORTS[name]
+    sql = spec['sql']
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    return sql + f" ORDER BY {spec['order_by']}"
+
+
+def stream(connect, name, fmt, where, params, batch_size=BATCH_SIZE):
+    """Generator of encoded chunks for one export; `where`/`params` are the filter conditions."""
+    encode = encode_csv if fmt == 'csv' else encode_ndjson
+    conn = connect()
+    finished = False
+    try:
+        columns, row_batches = batches(conn, query(name, where), params, batch_size)
+        yield from encode(columns, row_batches)
+        finished = True
+    except Exception:
+        logging.exception('Export of %s failed', name)
+        raise
+    finally:
+        if finished:
+            conn.close()
+        else:
+            # client disconnected or the query failed with rows still unread
+            conn.discard()
@@ -0,0 +1,162 @@
+"""
+Index advisor: EXPLAIN every query the app issues and report bad plans.
+
+Drives the app's read-only pages through Flask's test client as a patient, a
+doctor and an admin (taken from the current database), collects every distinct
+statement with the SQL profiler, then runs EXPLAIN on each one with the
+parameters it was first called with. It reports:
+
+- full table scans (type ALL) and full index scans (type index)
+- "Using filesort" and "Using temporary"
+- joins that fall back to a join buffer (no usable index)
+
+sorted by the number of rows MySQL expects to examine. Statements that only
+run on POST (booking, status changes) aren't driven; pass --sql-file with
+extra statements to check those.
+
+Usage:
+    python index_advisor.py [--min-rows 100] [--sql-file extra.sql] [--all]
+"""
+
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+os.environ['SQL_PROFILE'] = '1'
+
+import app as hospital  # noqa: E402
+from migrate import statements  # noqa: E402
+
+
+def fixtures(conn):
+    """Ids to fill route parameters with: patient, doctor (user and doctor id), admin, department."""
+    ids = {}
+    with conn.cursor() as cur:
+        for key, sql in (
+            ('patient', "SELECT user_id FROM users WHERE user_type = 'patient' ORDER BY user_id LIMIT 1"),
+            ('admin', "SELECT user_id FROM users WHERE user_type = 'admin' ORDER BY user_id LIMIT 1"),
+            ('doctor', "SELECT doctor_id, user_id FROM doctors ORDER BY doctor_id LIMIT 1"),
+            ('department', "SELECT department_id FROM departments ORDER BY department_id LIMIT 1"),
+        ):
+            cur.execute(sql)
+            ids[key] = cur.fetchone()
+    return ids
+
+
+def pages(ids):
+    """(session user type, user id, [paths]) for each role that exists in the database."""
+    day = (date.today() + timedelta(days=1)).isoformat()
+    week = (date.today() + timedelta(days=7)).isoformat()
+    visits = []
+    if ids['patient']:
+        paths = ['/user/dashboard', '/appointments', '/appointments?status=Pending', '/medical-records',
+                 '/api/notifications', '/profile']
+        if ids['doctor']:
+            doctor_id = ids['doctor'][0]
+            paths += [f'/user/dashboard?doctor_id={doctor_id}&appointment_date={day}',
+                      f'/doctor/{doctor_id}/profile',
+                      f'/api/doctor-availability/{doctor_id}?date={day}',
+                      f'/api/availability?doctor_ids={doctor_id}&start={day}&end={week}']
+        if ids['department']:
+            paths.append(f'/api/availability?department_id={ids["department"][0]}&start={day}&end={week}&first=5')
+        visits.append(('patient', ids['patient'][0], paths))
+    if ids['doctor']:
+        visits.append(('doctor', ids['doctor'][1], ['/doctor/dashboard', '/appointments', '/medical-records']))
+    if ids['admin']:
+        visits.append(('admin', ids['admin'][0], ['/admin/dashboard', '/admin/dashboard?verify=1', '/admin/users',
+                                                   '/appointments', '/appointments?status=Completed',
+                                                   '/medical-records']))
+    return visits
+
+
+def drive(visits):
+    # cold caches, so cached reference data and profiles are queried too
+    hospital.ref_cache.invalidate(hospital.DOCTOR_DIRECTORY, hospital.DEPARTMENTS)
+    for user_type, user_id, paths in visits:
+        client = hospital.app.test_client()
+        with client.session_transaction() as s:
+            s.update(user_id=user_id, username='advisor', user_type=user_type,
+                     is_admin=user_type == 'admin', is_doctor=user_type == 'doctor')
+        for path in paths:
+            if path.startswith('/doctor/') and path.endswith('/profile'):
+                hospital.invalidate_doctor_profiles(int(path.split('/')[2]))
+            response = client.get(path)
+            if response.status_code >= 400:
+                print(f'  ! {user_type} {path}: HTTP {response.status_code}')
+
+
+def explain(conn, sql, params):
+    with conn.cursor(dictionary=True) as cur:
+        cur.execute('EXPLAIN ' + sql, params or ())
+        return cur.fetchall()
+
+
+def problems(plan, min_rows):
+    found = []
+    for step in plan:
+        rows = int(step.get('rows') or 0)
+        extra = step.get('Extra') or ''
+        table = step.get('table')
+        if step.get('type') == 'ALL' and rows >= min_rows:
+            found.append(f'full table scan of {table} (~{rows} rows)')
+        elif step.get('type') == 'index' and rows >= min_rows:
+            found.append(f'full index scan of {table} via {step.get("key")} (~{rows} rows)')
+        if 'Using filesort' in extra:
+            found.append(f'filesort on {table}')
+        if 'Using temporary' in extra:
+            found.append(f'temporary table for {table}')
+        if 'Using join buffer' in extra:
+            found.append(f'join to {table} without a usable index')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--min-rows', type=int, default=100, help='ignore scans expected to read fewer rows')
+    parser.add_argument('--sql-file', help='extra statements to EXPLAIN (no parameters), separated by ;')
+    parser.add_argument('--all', action='store_true', help='also print statements without problems')
+    args = parser.parse_args()
+
+    conn = hospital.db_pool.acquire()
+    try:
+        ids = fixtures(conn)
+        hospital.sql_profiler.reset()
+        drive(pages(ids))
+        samples = hospital.sql_profiler.samples()
+        if args.sql_file:
+            with open(args.sql_file, encoding='utf-8') as f:
+                for sql in statements(f.read()):
+                    samples.setdefault(sql, (sql, None, ['--sql-file']))
+
+        report = []
+        for normalized, (sql, params, endpoints) in samples.items():
+            if isinstance(sql, (bytes, bytearray)):
+                sql = sql.decode()
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+                continue
+            try:
+                plan = explain(conn, sql, params)
+            except Exception as e:
+                report.append((0, normalized, endpoints, [f'EXPLAIN failed: {e}']))
+                continue
+            issues = problems(plan, args.min_rows)
+            if issues or args.all:
+                worst = max((int(step.get('rows') or 0) for step in plan), default=0)
+                report.append((worst, normalized, endpoints, issues))
+    finally:
+        conn.close()
+
+    report.sort(key=lambda r: r[0], reverse=True)
+    print(f'\nChecked {len(samples)} distinct statements; {sum(1 for r in report if r[3])} with problems.\n')
+    for rows, normalized, endpoints, issues in report:
+        print(f'[{rows:>8} rows] {", ".join(endpoints)}')
+        print(f'  {normalized[:300]}')
+        for issue in issues or ['ok']:
+            print(f'  - {issue}')
+        print()
+    sys.exit(1 if any(r[3] for r in report) else 0)
+
+
+if __name__ == '__main__':
+    main()
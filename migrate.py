@@ -0,0 +1,141 @@
+"""
+Schema migrations for the hospital database.
+
+The schema is owned by the numbered files in migrations/ (0000_base_schema.sql
+creates the tables, later files alter them). Applied versions are recorded in
+`schema_migrations` together with a checksum of the file, so each file runs
+once per database and later edits to an applied file are reported.
+
+Usage:
+    python migrate.py              # apply pending migrations (same as `up`)
+    python migrate.py status       # list applied / pending / changed files
+    python migrate.py up --to 0002 # apply pending migrations up to a version
+    python migrate.py mark 0003    # record everything up to 0003 as applied without
+                                   # running it (databases migrated by hand)
+
+MySQL commits DDL immediately, so a file that fails halfway is not rolled
+back: fix the cause, undo or finish the statements it already ran, and run
+`up` again. The failing statement is printed.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+from app import db_pool
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+FILENAME = re.compile(r'^(\d{4})_[\w-]+\.sql$')
+
+
+def discover():
+    """[(version, filename, sql, checksum)] sorted by version."""
+    found = []
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = FILENAME.match(name)
+        if not match:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, name), encoding='utf-8') as f:
+            sql = f.read()
+        found.append((match.group(1), name, sql, hashlib.sha256(sql.encode()).hexdigest()))
+    versions = [v for v, *_ in found]
+    if len(versions) != len(set(versions)):
+        sys.exit('Two migration files share a version number')
+    return found
+
+
+def statements(sql):
+    """Split a migration file into statements (no procedures or DELIMITER blocks)."""
+    lines = [line for line in sql.splitlines() if not line.lstrip().startswith('--')]
+    return [s.strip() for s in '\n'.join(lines).split(';') if s.strip()]
+
+
+def applied(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(16) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                checksum CHAR(64) NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        return dict(cur.fetchall())
+
+
+def record(conn, version, name, checksum):
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, name, checksum))
+    conn.commit()
+
+
+def status(conn):
+    done = applied(conn)
+    for version, name, _, checksum in discover():
+        if version not in done:
+            state = 'pending'
+        elif done[version] != checksum:
+            state = 'CHANGED since applied'
+        else:
+            state = 'applied'
+        print(f'{name:<45} {state}')
+
+
+def up(conn, target=None):
+    done = applied(conn)
+    pending = [m for m in discover() if m[0] not in done and (target is None or m[0] <= target)]
+    if not pending:
+        print('Nothing to apply')
+        return
+    for version, name, sql, checksum in pending:
+        print(f'Applying {name} ...')
+        with conn.cursor() as cur:
+            for statement in statements(sql):
+                try:
+                    cur.execute(statement)
+                    if cur.with_rows:
+                        cur.fetchall()
+                except Exception as e:
+                    conn.rollback()
+                    print(f'Failed in {name}:\n{statement}\n{e}')
+                    sys.exit(1)
+        conn.commit()
+        record(conn, version, name, checksum)
+    print(f'Applied {len(pending)} migration(s)')
+
+
+def mark(conn, target):
+    done = applied(conn)
+    for version, name, _, checksum in discover():
+        if version <= target and version not in done:
+            record(conn, version, name, checksum)
+            print(f'Marked {name} as applied')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply the SQL files in migrations/ in order.')
+    parser.add_argument('command', nargs='?', default='up', choices=['up', 'status', 'mark'])
+    parser.add_argument('version', nargs='?', help='for mark: last version to record as applied')
+    parser.add_argument('--to', help='for up: stop after this version')
+    args = parser.parse_args()
+
+    conn = db_pool.acquire()
+    try:
+        if args.command == 'status':
+            status(conn)
+        elif args.command == 'mark':
+            if not args.version:
+                parser.error('mark needs a version, e.g. `mark 0003`')
+            mark(conn, args.version)
+        else:
+            up(conn, args.to)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+-- Base schema for the hospital app (the tables app.py, booking.py and the
+-- helper modules read and write).
+--
+-- Every statement is CREATE TABLE IF NOT EXISTS, so running this against an
+-- existing database leaves its tables alone. If your database already has the
+-- later migrations applied by hand, record them instead of re-running them:
+--   python migrate.py mark 0003
+--
+-- Table names are lowercase and app.py uses them exactly as written here, so
+-- the schema works with MySQL's default lower_case_table_names=0 on Linux.
+-- Admin/doctor roles come from users.user_type; there are no is_admin /
+-- is_doctor columns.
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(100) NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    user_type ENUM('patient', 'doctor', 'admin') NOT NULL DEFAULT 'patient',
+    full_name VARCHAR(150) NULL,
+    first_name VARCHAR(75) NULL,
+    last_name VARCHAR(75) NULL,
+    phone VARCHAR(30) NULL,
+    address VARCHAR(255) NULL,
+    date_of_birth DATE NULL,
+    gender VARCHAR(20) NULL,
+    blood_type VARCHAR(5) NULL,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    last_login DATETIME NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_users_username (username),
+    UNIQUE KEY uq_users_email (email),
+    KEY idx_users_type (user_type)
+);
+
+CREATE TABLE IF NOT EXISTS departments (
+    department_id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT NULL,
+    UNIQUE KEY uq_departments_name (name)
+);
+
+CREATE TABLE IF NOT EXISTS doctors (
+    doctor_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    specialization VARCHAR(100) NULL,
+    department_id INT NULL,
+    years_of_experience INT NULL,
+    available_days VARCHAR(100) NULL,
+    available_time VARCHAR(255) NULL,
+    short_profile TEXT NULL,
+    photo_url VARCHAR(255) NULL,
+    KEY idx_doctors_user (user_id),
+    KEY idx_doctors_department (department_id),
+    CONSTRAINT fk_doctors_user FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
+    CONSTRAINT fk_doctors_department FOREIGN KEY (department_id) REFERENCES departments (department_id) ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS doctor_schedules (
+    schedule_id INT AUTO_INCREMENT PRIMARY KEY,
+    doctor_id INT NOT NULL,
+    day_of_week VARCHAR(9) NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    KEY idx_doctor_schedules_doctor (doctor_id),
+    CONSTRAINT fk_doctor_schedules_doctor FOREIGN KEY (doctor_id) REFERENCES doctors (doctor_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS appointments (
+    appointment_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    doctor_id INT NOT NULL,
+    appointment_date DATE NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NULL,
+    reason TEXT NULL,
+    status ENUM('Pending', 'Confirmed', 'Completed', 'Cancelled') NOT NULL DEFAULT 'Pending',
+    doctor_name VARCHAR(150) NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_appointments_user (user_id),
+    KEY idx_appointments_doctor (doctor_id),
+    CONSTRAINT fk_appointments_user FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
+    CONSTRAINT fk_appointments_doctor FOREIGN KEY (doctor_id) REFERENCES doctors (doctor_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS medical_records (
+    record_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    doctor_id INT NOT NULL,
+    visit_date DATE NOT NULL,
+    diagnosis TEXT NULL,
+    treatment TEXT NULL,
+    prescription TEXT NULL,
+    notes TEXT NULL,
+    follow_up_date DATE NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_medical_records_user (user_id),
+    KEY idx_medical_records_doctor (doctor_id),
+    CONSTRAINT fk_medical_records_user FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
+    CONSTRAINT fk_medical_records_doctor FOREIGN KEY (doctor_id) REFERENCES doctors (doctor_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    notification_id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    message TEXT NULL,
+    is_read BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_notifications_user (user_id),
+    CONSTRAINT fk_notifications_user FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+);
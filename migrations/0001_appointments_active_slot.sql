@@ -0,0 +1,15 @@
+-- One active (Pending/Confirmed) booking per doctor, date and start time.
+--
+-- MySQL has no partial indexes, so `active_slot` is 1 for active rows and NULL
+-- otherwise. NULLs never collide in a UNIQUE index, which means cancelled and
+-- completed appointments don't block rebooking the same slot.
+--
+-- Existing double bookings must be resolved first; list them with:
+--   SELECT doctor_id, appointment_date, start_time, COUNT(*)
+--   FROM appointments WHERE status IN ('Pending', 'Confirmed')
+--   GROUP BY doctor_id, appointment_date, start_time HAVING COUNT(*) > 1;
+
+ALTER TABLE appointments
+    ADD COLUMN active_slot TINYINT
+        GENERATED ALWAYS AS (IF(status IN ('Pending', 'Confirmed'), 1, NULL)) STORED,
+    ADD UNIQUE KEY uq_appointments_active_slot (doctor_id, appointment_date, start_time, active_slot);
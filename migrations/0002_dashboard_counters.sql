@@ -0,0 +1,21 @@
+-- Counters read by the admin dashboard instead of COUNT(*) scans.
+-- Each counter is spread over several `shard` rows to avoid a single hot row;
+-- the value is SUM(value) over the shards. See dashboard_stats.py.
+
+CREATE TABLE IF NOT EXISTS dashboard_counters (
+    name VARCHAR(64) NOT NULL,
+    shard TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, shard)
+);
+
+DELETE FROM dashboard_counters;
+
+INSERT INTO dashboard_counters (name, value)
+SELECT 'patients', COUNT(*) FROM users WHERE user_type = 'patient'
+UNION ALL
+SELECT 'doctors', COUNT(*) FROM doctors
+UNION ALL
+SELECT 'appointments', COUNT(*) FROM appointments
+UNION ALL
+SELECT CONCAT('appointments:', status), COUNT(*) FROM appointments GROUP BY status;
@@ -0,0 +1,13 @@
+-- Indexes for the keyset-paginated /appointments and /medical-records pages.
+-- InnoDB appends the primary key to every secondary index, so these also cover
+-- the appointment_id / record_id tie-breaker of the sort key.
+-- Doctor-scoped appointment lists use uq_appointments_active_slot (0001).
+
+ALTER TABLE appointments
+    ADD INDEX idx_appointments_date (appointment_date, start_time),
+    ADD INDEX idx_appointments_user_date (user_id, appointment_date, start_time);
+
+ALTER TABLE medical_records
+    ADD INDEX idx_medical_records_visit (visit_date),
+    ADD INDEX idx_medical_records_doctor_visit (doctor_id, visit_date),
+    ADD INDEX idx_medical_records_user_visit (user_id, visit_date);
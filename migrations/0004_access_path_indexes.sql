@@ -0,0 +1,23 @@
+-- Composite indexes for the remaining hot access paths in app.py.
+--
+-- appointments(doctor_id, appointment_date, status, start_time): booked-slot
+--   lookups (availability.py) filter on doctor, date and status and read only
+--   start_time, so this index covers them. uq_appointments_active_slot (0001)
+--   starts with the same columns but can't filter on status.
+-- appointments(user_id, appointment_date) is idx_appointments_user_date (0003).
+-- notifications(user_id, created_at): the dashboard's latest five and the
+--   notifications page.
+-- notifications(user_id, is_read): unread counts and mark-all-read.
+-- medical_records(user_id|doctor_id, visit_date) are in 0003.
+-- doctor_schedules(doctor_id, day_of_week, start_time): weekly templates and the
+--   profile modal's ordered schedule.
+
+ALTER TABLE appointments
+    ADD INDEX idx_appointments_doctor_date_status (doctor_id, appointment_date, status, start_time);
+
+ALTER TABLE notifications
+    ADD INDEX idx_notifications_user_created (user_id, created_at),
+    ADD INDEX idx_notifications_user_unread (user_id, is_read);
+
+ALTER TABLE doctor_schedules
+    ADD INDEX idx_doctor_schedules_doctor_day (doctor_id, day_of_week, start_time);
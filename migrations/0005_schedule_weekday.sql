@@ -0,0 +1,36 @@
+-- Store schedule days as a numeric weekday (Monday = 0 ... Sunday = 6).
+--
+-- Readers used to match days with LOWER(day_of_week) = 'monday' and sort with
+-- FIELD(day_of_week, 'Monday', ...), which evaluates a function per row and
+-- can't use an index. With a TINYINT weekday they filter with plain equality
+-- and sort with the (doctor_id, weekday, start_time) index instead.
+--
+-- The backfill accepts any spelling the app used to accept ('Monday', 'mon',
+-- 'MONDAY'). Rows whose day can't be parsed were already ignored when building
+-- availability and are deleted. start_time / end_time are (re)declared TIME so
+-- databases created by hand with VARCHAR times are converted too.
+
+ALTER TABLE doctor_schedules
+    ADD COLUMN weekday TINYINT UNSIGNED NULL AFTER doctor_id;
+
+UPDATE doctor_schedules
+SET weekday = CASE LOWER(LEFT(TRIM(day_of_week), 3))
+    WHEN 'mon' THEN 0
+    WHEN 'tue' THEN 1
+    WHEN 'wed' THEN 2
+    WHEN 'thu' THEN 3
+    WHEN 'fri' THEN 4
+    WHEN 'sat' THEN 5
+    WHEN 'sun' THEN 6
+END;
+
+DELETE FROM doctor_schedules WHERE weekday IS NULL;
+
+ALTER TABLE doctor_schedules
+    DROP INDEX idx_doctor_schedules_doctor_day,
+    DROP COLUMN day_of_week,
+    MODIFY weekday TINYINT UNSIGNED NOT NULL,
+    MODIFY start_time TIME NOT NULL,
+    MODIFY end_time TIME NOT NULL,
+    ADD CONSTRAINT chk_doctor_schedules_weekday CHECK (weekday <= 6),
+    ADD INDEX idx_doctor_schedules_doctor_weekday (doctor_id, weekday, start_time);
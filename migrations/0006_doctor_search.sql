@@ -0,0 +1,20 @@
+-- FULLTEXT indexes for doctor search (doctor_search.py).
+--
+-- The typeahead is served from an in-memory index; these back the searches
+-- made while that index is cold (first request after start or after a doctor
+-- change). Each MATCH() needs an index on exactly its column list:
+--
+-- users(full_name, username): doctor names.
+-- doctors(specialization), departments(name).
+--
+-- InnoDB builds one FULLTEXT index per ALTER without a table copy only for
+-- the first index on a table, so each table gets its own statement.
+
+ALTER TABLE users
+    ADD FULLTEXT INDEX ft_users_name (full_name, username);
+
+ALTER TABLE doctors
+    ADD FULLTEXT INDEX ft_doctors_specialization (specialization);
+
+ALTER TABLE departments
+    ADD FULLTEXT INDEX ft_departments_name (name);
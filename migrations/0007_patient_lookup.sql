@@ -0,0 +1,12 @@
+-- Indexes for the patient picker (patient_search.py).
+--
+-- users(user_type, full_name): name prefix matches among patients.
+-- users(user_type, phone): phone prefix matches among patients.
+-- Email and username prefixes use uq_users_email and uq_users_username, and
+-- words inside the name use ft_users_name (0006).
+-- idx_users_type is a prefix of idx_users_type_name, so it is dropped.
+
+ALTER TABLE users
+    ADD INDEX idx_users_type_name (user_type, full_name),
+    ADD INDEX idx_users_type_phone (user_type, phone),
+    DROP INDEX idx_users_type;
@@ -0,0 +1,9 @@
+-- FULLTEXT index for searching medical records (record_search.py).
+--
+-- medical_records(diagnosis, treatment, prescription, notes): one index over
+-- all four columns, matching the MATCH() column list in record_search.MATCH_SQL.
+-- InnoDB maintains it on every insert and update; new rows become searchable
+-- when the transaction commits.
+
+ALTER TABLE medical_records
+    ADD FULLTEXT INDEX ft_medical_records_text (diagnosis, treatment, prescription, notes);
@@ -0,0 +1,44 @@
+-- Daily utilization rollups for capacity reporting (rollups.py).
+--
+-- One row per day, doctor and hour (and per day, department and hour) with
+-- the slots the schedule offered and the appointments in them:
+--   booked     appointments that aren't Cancelled
+--   confirmed / completed / cancelled   appointments in that status
+-- Appointment writes adjust the counts in the same transaction; `python
+-- rollups.py` rebuilds a day from the appointments and schedules (nightly, for
+-- the previous day) and records it in utilization_rollup_runs.
+-- department_id 0 collects doctors without a department.
+--
+-- After migrating, backfill history with:
+--   python rollups.py --from <first appointment date> --to <yesterday>
+
+CREATE TABLE IF NOT EXISTS utilization_daily (
+    day DATE NOT NULL,
+    doctor_id INT NOT NULL,
+    hour TINYINT UNSIGNED NOT NULL,
+    offered INT NOT NULL DEFAULT 0,
+    booked INT NOT NULL DEFAULT 0,
+    confirmed INT NOT NULL DEFAULT 0,
+    completed INT NOT NULL DEFAULT 0,
+    cancelled INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, doctor_id, hour),
+    KEY idx_utilization_daily_doctor (doctor_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS utilization_department_daily (
+    day DATE NOT NULL,
+    department_id INT NOT NULL,
+    hour TINYINT UNSIGNED NOT NULL,
+    offered INT NOT NULL DEFAULT 0,
+    booked INT NOT NULL DEFAULT 0,
+    confirmed INT NOT NULL DEFAULT 0,
+    completed INT NOT NULL DEFAULT 0,
+    cancelled INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, department_id, hour),
+    KEY idx_utilization_department (department_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS utilization_rollup_runs (
+    day DATE PRIMARY KEY,
+    rebuilt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
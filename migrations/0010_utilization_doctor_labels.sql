@@ -0,0 +1,17 @@
+-- Department and display name on the per-doctor utilization rollup.
+--
+-- The report filtered top doctors by department with a subquery on doctors and
+-- joined doctors and users for their names. With both stored on the rollup
+-- row (as of the write, refreshed when rollups.py rebuilds the day) it reads
+-- utilization_daily alone.
+
+ALTER TABLE utilization_daily
+    ADD COLUMN department_id INT NOT NULL DEFAULT 0 AFTER doctor_id,
+    ADD COLUMN doctor_name VARCHAR(150) NULL AFTER department_id,
+    ADD INDEX idx_utilization_daily_department (department_id, day);
+
+UPDATE utilization_daily r
+JOIN doctors d ON r.doctor_id = d.doctor_id
+JOIN users u ON d.user_id = u.user_id
+SET r.department_id = COALESCE(d.department_id, 0),
+    r.doctor_name = COALESCE(u.full_name, u.username);
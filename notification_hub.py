@@ -0,0 +1,149 @@
+"""
+Notification delivery: creation, unread counts, incremental fetch and push.
+
+- `create()` inserts a notification inside the caller's transaction; call
+  `publish(user_id)` after the commit to wake that user's open streams.
+- `unread_count()` is served from a per-user cache (refreshed after `ttl`
+  seconds, bumped on publish, zeroed by `mark_all_read()`).
+- `fetch_since()` returns only notifications newer than a given id.
+- `wait()` blocks an SSE stream until the user has something new. Idle streams
+  hold no database connection; one watcher thread per process polls
+  MAX(notification_id) so notifications created by other workers still wake
+  local streams.
+"""
+
+import logging
+import threading
+import time
+
+COLUMNS = 'notification_id, title, message, is_read, created_at'
+
+
+class NotificationHub:
+    def __init__(self, connect, ttl=30, poll_interval=2.0):
+        self.connect = connect        # returns a connection whose close() gives it back
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._seq = {}                # user_id -> bumped on every new notification
+        self._waiters = 0
+        self._unread = {}             # user_id -> (loaded_at, count)
+        self._watcher = None
+        self._max_id = None
+
+    # ---------- writes ----------
+    @staticmethod
+    def create(cur, user_id, title, message):
+        cur.execute("""
+            INSERT INTO notifications (user_id, title, message)
+            VALUES (%s, %s, %s)
+        """, (user_id, title, message))
+        return cur.lastrowid
+
+    def publish(self, user_id, count=1):
+        with self._cond:
+            self._seq[user_id] = self._seq.get(user_id, 0) + 1
+            cached = self._unread.get(user_id)
+            if cached:
+                self._unread[user_id] = (cached[0], cached[1] + count)
+            self._cond.notify_all()
+
+    def mark_all_read(self, cur, user_id):
+        cur.execute("""
+            UPDATE notifications
+            SET is_read = TRUE
+            WHERE user_id = %s AND is_read = FALSE
+        """, (user_id,))
+        with self._cond:
+            self._unread[user_id] = (time.monotonic(), 0)
+
+    # ---------- reads ----------
+    def unread_count(self, conn, user_id):
+        cached = self._unread.get(user_id)
+        if cached and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM notifications WHERE user_id = %s AND is_read = FALSE", (user_id,))
+            count = cur.fetchone()[0] or 0
+        with self._cond:
+            self._unread[user_id] = (time.monotonic(), count)
+        return count
+
+    @staticmethod
+    def fetch_since(conn, user_id, since_id=0, limit=50):
+        """Notifications with id > since_id, oldest first."""
+        with conn.cursor(dictionary=True) as cur:
+            cur.execute(f"""
+                SELECT {COLUMNS} FROM notifications
+                WHERE user_id = %s AND notification_id > %s
+                ORDER BY notification_id
+                LIMIT %s
+            """, (user_id, since_id or 0, limit))
+            return cur.fetchall()
+
+    @staticmethod
+    def latest_id(conn, user_id):
+        with conn.cursor() as cur:
+            cur.execute("SELECT MAX(notification_id) FROM notifications WHERE user_id = %s", (user_id,))
+            return cur.fetchone()[0] or 0
+
+    # ---------- push ----------
+    def seq(self, user_id):
+        return self._seq.get(user_id, 0)
+
+    def wait(self, user_id, seen, timeout):
+        """Block until user_id's sequence moves past `seen`; returns the new value or None on timeout."""
+        self._ensure_watcher()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._waiters += 1
+            try:
+                while self._seq.get(user_id, 0) == seen:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+                return self._seq[user_id]
+            finally:
+                self._waiters -= 1
+
+    def stats(self):
+        with self._cond:
+            return {'waiting_streams': self._waiters, 'cached_unread_counts': len(self._unread)}
+
+    def _ensure_watcher(self):
+        if self._watcher is None or not self._watcher.is_alive():
+            with self._cond:
+                if self._watcher is None or not self._watcher.is_alive():
+                    self._watcher = threading.Thread(target=self._watch, name='notification-watcher', daemon=True)
+                    self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            if not self._waiters:
+                continue
+            try:
+                self._poll()
+            except Exception:
+                logging.exception('Notification watcher poll failed')
+
+    def _poll(self):
+        conn = self.connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT MAX(notification_id) FROM notifications")
+                max_id = cur.fetchone()[0] or 0
+                if self._max_id is not None and max_id > self._max_id:
+                    cur.execute("""
+                        SELECT user_id, COUNT(*) FROM notifications
+                        WHERE notification_id > %s AND notification_id <= %s
+                        GROUP BY user_id
+                    """, (self._max_id, max_id))
+                    for user_id, count in cur.fetchall():
+                        # the unread cache may already include rows published locally
+                        self._unread.pop(user_id, None)
+                        self.publish(user_id, count)
+                self._max_id = max_id
+        finally:
+            conn.close()
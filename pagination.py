@@ -0,0 +1,60 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Instead of OFFSET, a page is requested with the sort key of the last row seen,
+so every page is an index range scan of `limit` rows no matter how deep it is.
+Cursors are opaque URL-safe strings wrapping that sort key.
+"""
+
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    raw = json.dumps([str(v) for v in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, length):
+    """Sort key from a cursor string; None for no cursor. Raises ValueError if malformed."""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except Exception:
+        raise ValueError('invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError('invalid cursor')
+    return values
+
+
+def seek_condition(columns, values):
+    """SQL that selects rows strictly after `values` in descending `columns` order.
+
+    Expanded to `a < %s OR (a = %s AND (b < %s OR ...))` rather than a row
+    constructor so MySQL can use it as an index range.
+    """
+    sql, params = f'{columns[-1]} < %s', [values[-1]]
+    for column, value in zip(reversed(columns[:-1]), reversed(values[:-1])):
+        sql = f'{column} < %s OR ({column} = %s AND ({sql}))'
+        params = [value, value] + params
+    return f'({sql})', params
+
+
+def paginate(rows, limit, key):
+    """Trim the `limit + 1` fetched rows to one page; returns (rows, next cursor or None)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
@@ -0,0 +1,154 @@
+"""
+Password hashing off the request thread, with backpressure and login throttling.
+
+`PasswordHasher` runs Werkzeug hash checks and hash generation on a bounded
+thread pool (hashlib's PBKDF2/scrypt release the GIL, so threads run them in
+parallel). At most `max_workers + max_queue` jobs may be in flight; beyond that
+`Overloaded` is raised immediately so a login spike turns into fast 503s instead
+of every worker thread sitting in a hash.
+
+`LoginThrottle` counts failed attempts per username and per client IP in a
+sliding window and rejects further attempts before any hashing happens.
+Counts are per process.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class Overloaded(Exception):
+    """Too many password hashes are already queued."""
+
+
+class PasswordHasher:
+    def __init__(self, max_workers=4, max_queue=16, timeout=10.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pwhash')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=1000)
+        self.counters = {'checks': 0, 'hashes': 0, 'rejected': 0, 'background_jobs': 0, 'background_failures': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise Overloaded('password hashing queue is full')
+        with self._lock:
+            self._in_flight += 1
+
+        def run():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._latencies.append(time.perf_counter() - started)
+                    self._in_flight -= 1
+                self._slots.release()
+
+        try:
+            return self._executor.submit(run)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+            raise
+
+    def check(self, stored_hash, password):
+        """check_password_hash on the pool; raises Overloaded when saturated."""
+        self._count('checks')
+        return self._submit(check_password_hash, stored_hash, password).result(self.timeout)
+
+    def hash(self, password):
+        """generate_password_hash on the pool; raises Overloaded when saturated."""
+        self._count('hashes')
+        return self._submit(generate_password_hash, password).result(self.timeout)
+
+    def run_in_background(self, fn, *args):
+        """Fire-and-forget job (e.g. migrating a legacy hash); dropped if the pool is saturated."""
+        def job():
+            try:
+                fn(*args)
+            except Exception:
+                self._count('background_failures')
+                logging.exception('Background password job failed')
+        try:
+            self._submit(job)
+            self._count('background_jobs')
+        except Overloaded:
+            logging.warning('Password pool saturated; background job skipped')
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._latencies)
+            in_flight = self._in_flight
+            data = dict(self.counters)
+        data.update(
+            workers=self.max_workers,
+            max_queue=self.max_queue,
+            in_flight=in_flight,
+            queue_depth=max(0, in_flight - self.max_workers),
+            hash_ms_p50=round(samples[len(samples) // 2] * 1000, 1) if samples else None,
+            hash_ms_p95=round(samples[int(len(samples) * 0.95)] * 1000, 1) if samples else None,
+            hash_ms_max=round(samples[-1] * 1000, 1) if samples else None,
+        )
+        return data
+
+
+class LoginThrottle:
+    def __init__(self, max_per_user=5, max_per_ip=20, window=300):
+        self.limits = {'user': max_per_user, 'ip': max_per_ip}
+        self.window = window
+        self._failures = {}     # (kind, key) -> deque of timestamps
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _keys(self, username, ip):
+        return [('user', (username or '').lower()), ('ip', ip or '')]
+
+    def retry_after(self, username, ip):
+        """Seconds until another attempt is allowed, 0 if allowed now."""
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key in self._keys(username, ip):
+                attempts = self._failures.get(key)
+                if not attempts:
+                    continue
+                while attempts and now - attempts[0] > self.window:
+                    attempts.popleft()
+                if not attempts:
+                    del self._failures[key]
+                elif len(attempts) >= self.limits[key[0]]:
+                    wait = max(wait, int(self.window - (now - attempts[0])) + 1)
+            if wait:
+                self.rejected += 1
+        return wait
+
+    def record_failure(self, username, ip):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) > 100000:
+                self._failures = {k: v for k, v in self._failures.items() if now - v[-1] <= self.window}
+            for key in self._keys(username, ip):
+                self._failures.setdefault(key, deque(maxlen=self.limits[key[0]])).append(now)
+
+    def reset(self, username):
+        with self._lock:
+            self._failures.pop(('user', (username or '').lower()), None)
+
+    def stats(self):
+        with self._lock:
+            return {'throttled': self.rejected, 'tracked_keys': len(self._failures)}
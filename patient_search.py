@@ -0,0 +1,87 @@
+"""
+Patient lookup for forms that pick a patient (add_medical_record).
+
+`search_patients(conn, query)` returns the best few patients for what has been
+typed so far, matching by name, username, email or phone. Every branch is an
+indexed prefix search, so the cost depends on the number of matches returned,
+not on the number of patients:
+
+- a phone-like query ("+44 20", "0171") matches the start of `phone`
+  (idx_users_type_phone);
+- a query with "@" matches the start of `email` (uq_users_email);
+- anything else matches the start of `full_name` (idx_users_type_name),
+  `username` and `email`, plus any word of the name through the FULLTEXT
+  index on (full_name, username), so "smi" finds "John Smith".
+
+Results are ordered: full name starting with the query, then a name word
+starting with it, then username/email matches, each alphabetically.
+
+Patients aren't cached in memory: the table is large, changes with every
+registration and profile edit, and holds contact details that shouldn't be
+copied into every worker.
+"""
+
+import re
+
+from doctor_search import MIN_FULLTEXT_WORD, words
+
+MIN_QUERY = 2
+PHONE = re.compile(r'^\+?[\d\s().-]{3,}$')
+
+COLUMNS = """
+    SELECT user_id, COALESCE(full_name, username) AS full_name, username, email, phone
+    FROM users
+"""
+
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_patients(conn, query, limit=10):
+    """[{'user_id', 'full_name', 'username', 'email', 'phone'}] best matches first ([] for short queries)."""
+    query = ' '.join(query.split())
+    if len(query) < MIN_QUERY:
+        return []
+    prefix = escape_like(query) + '%'
+    with conn.cursor(dictionary=True) as cur:
+        if PHONE.match(query):
+            cur.execute(COLUMNS + """
+                WHERE user_type = 'patient' AND phone LIKE %s
+                ORDER BY phone
+                LIMIT %s
+            """, (prefix, limit))
+            return cur.fetchall()
+        if '@' in query:
+            cur.execute(COLUMNS + """
+                WHERE email LIKE %s AND user_type = 'patient'
+                ORDER BY email
+                LIMIT %s
+            """, (prefix, limit))
+            return cur.fetchall()
+
+        branches = [
+            ("WHERE user_type = 'patient' AND full_name LIKE %s", (prefix,)),
+            ("WHERE username LIKE %s AND user_type = 'patient'", (prefix,)),
+            ("WHERE email LIKE %s AND user_type = 'patient'", (prefix,)),
+        ]
+        typed = words(query)
+        long_words = [w for w in typed if len(w) >= MIN_FULLTEXT_WORD]
+        if long_words:
+            # every typed word must start a word of the name; words too short for FULLTEXT are checked with LIKE
+            where = "WHERE MATCH(full_name, username) AGAINST (%s IN BOOLEAN MODE) AND user_type = 'patient'"
+            short_words = [w for w in typed if len(w) < MIN_FULLTEXT_WORD]
+            where += " AND CONCAT(' ', full_name) LIKE %s" * len(short_words)
+            branches.append((where, (' '.join(f'+{w}*' for w in long_words),
+                                     *(f'% {escape_like(w)}%' for w in short_words))))
+        union = ' UNION '.join(f'({COLUMNS} {where} LIMIT %s)' for where, _ in branches)
+        params = [p for _, branch_params in branches for p in (*branch_params, limit)]
+        cur.execute(f"""
+            SELECT * FROM ({union}) AS matches
+            ORDER BY CASE WHEN full_name LIKE %s THEN 0
+                          WHEN full_name LIKE %s THEN 1
+                          ELSE 2 END,
+                     full_name, user_id
+            LIMIT %s
+        """, (*params, prefix, '% ' + prefix, limit))
+        return cur.fetchall()
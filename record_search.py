@@ -0,0 +1,35 @@
+"""
+Full-text search over medical records (diagnosis, treatment, prescription, notes).
+
+Backed by the InnoDB FULLTEXT index ft_medical_records_text
+(migrations/0008_medical_record_search.sql), which MySQL keeps up to date on
+every insert, so add_medical_record needs no extra work. The /medical-records
+page adds `MATCH_SQL` to its role-scoped WHERE clause (a doctor's own records,
+a patient's own, everything for admins) and orders by the relevance score.
+
+`boolean_query(text)` turns what the user typed into a boolean-mode query
+where every word is required and matches as a prefix ("hypert asth" finds
+records mentioning both hypertension and asthma). Words InnoDB doesn't index
+(shorter than innodb_ft_min_token_size, or on its default stopword list) are
+left out, since a required word that isn't indexed would match nothing.
+
+Results are paged by (score, record_id) like the other list pages. Scores
+depend on the whole table's word statistics, so a record inserted while
+someone pages through results can shift later pages slightly.
+"""
+
+from doctor_search import MIN_FULLTEXT_WORD, words
+
+MATCH_SQL = "MATCH(mr.diagnosis, mr.treatment, mr.prescription, mr.notes) AGAINST (%s IN BOOLEAN MODE)"
+
+# INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD
+STOPWORDS = frozenset("""
+    a about an are as at be by com de en for from how i in is it la of on or
+    that the this to was what when where who will with und www
+""".split())
+
+
+def boolean_query(text):
+    """'+word1* +word2*' for the indexable words of `text`, or None if there are none."""
+    terms = [w for w in words(text) if len(w) >= MIN_FULLTEXT_WORD and w not in STOPWORDS]
+    return ' '.join(f'+{w}*' for w in dict.fromkeys(terms)) or None
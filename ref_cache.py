@@ -0,0 +1,209 @@
+"""
+Read-through cache for reference data (doctor directory, department list).
+
+This data changes rarely but is read on every dashboard render.
+`RefCache.get(key, loader)` returns the cached value, or calls `loader()` and
+stores the result for `ttl` seconds. Writers call `invalidate(key, ...)` after
+committing a change so the next read reloads it.
+
+Backends:
+- `MemoryBackend`: a dict in this process. Each gunicorn worker has its own
+  copy, so an invalidation only reaches the worker that made the change (the
+  others pick it up when the TTL expires).
+- `SQLiteBackend`: JSON rows in one SQLite file (WAL mode), shared by every
+  worker on the host and by scripts such as seed_doctors.py. An invalidation is
+  seen by all of them. `local_ttl` keeps a per-process copy for a second or so
+  to avoid even the SQLite read on hot paths.
+
+Cached values are shared between requests; treat them as read-only.
+
+`Generation(cache, key)` carries invalidations to caches that live in each
+process's memory (e.g. the availability templates). Writers call `bump()`
+(which just invalidates `key`); readers call `changed()`, which at most every
+`interval` seconds reads the current token and says whether it moved since
+they last looked. With the SQLite backend that reaches every worker and
+seed_doctors.py; with MemoryBackend only the process that bumped it.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._data = {}           # key -> (expires, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db().execute("""
+            CREATE TABLE IF NOT EXISTS ref_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+        """)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def after_fork(self):
+        """Forget the parent's SQLite handles; each process must open its own."""
+        self._local = threading.local()
+
+    def get(self, key):
+        row = self._db().execute("SELECT value FROM ref_cache WHERE key = ? AND expires > ?",
+                                 (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        self._db().execute("INSERT OR REPLACE INTO ref_cache (key, value, expires) VALUES (?, ?, ?)",
+                           (key, json.dumps(value, default=str), time.time() + ttl))
+
+    def delete(self, keys):
+        self._db().executemany("DELETE FROM ref_cache WHERE key = ?", [(key,) for key in keys])
+
+
+class RefCache:
+    def __init__(self, backend, ttl=3600, local_ttl=0.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self._local = {}              # key -> (loaded_at, value), only when local_ttl > 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.counters = {}            # key -> {'hits', 'misses', 'invalidations'}
+
+    def _count(self, key, name):
+        with self._lock:
+            counters = self.counters.setdefault(key, {'hits': 0, 'misses': 0, 'invalidations': 0})
+            counters[name] += 1
+
+    def get(self, key, loader, ttl=None):
+        if self.local_ttl:
+            entry = self._local.get(key)
+            if entry and time.monotonic() - entry[0] < self.local_ttl:
+                self._count(key, 'hits')
+                return entry[1]
+
+        value = self.backend.get(key)
+        if value is None:
+            # one loader per key per process; the rest wait and reuse its result
+            with self._lock:
+                load_lock = self._load_locks.setdefault(key, threading.Lock())
+            with load_lock:
+                value = self.backend.get(key)
+                if value is None:
+                    self._count(key, 'misses')
+                    value = loader()
+                    self.backend.set(key, value, ttl or self.ttl)
+                else:
+                    self._count(key, 'hits')
+        else:
+            self._count(key, 'hits')
+
+        if self.local_ttl:
+            with self._lock:
+                self._local[key] = (time.monotonic(), value)
+        return value
+
+    def after_fork(self):
+        """Call in a forked child (e.g. a preloaded gunicorn worker)."""
+        after_fork = getattr(self.backend, 'after_fork', None)
+        if after_fork:
+            after_fork()
+        with self._lock:
+            self._load_locks.clear()
+
+    def peek(self, key):
+        """The cached value or None, without loading (for callers that load asynchronously)."""
+        if self.local_ttl:
+            entry = self._local.get(key)
+            if entry and time.monotonic() - entry[0] < self.local_ttl:
+                self._count(key, 'hits')
+                return entry[1]
+        value = self.backend.get(key)
+        self._count(key, 'hits' if value is not None else 'misses')
+        if value is not None and self.local_ttl:
+            with self._lock:
+                self._local[key] = (time.monotonic(), value)
+        return value
+
+    def put(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl or self.ttl)
+        if self.local_ttl:
+            with self._lock:
+                self._local[key] = (time.monotonic(), value)
+
+    def invalidate(self, *keys):
+        self.backend.delete(keys)
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+        for key in keys:
+            self._count(key, 'invalidations')
+
+    def stats(self):
+        with self._lock:
+            data = {key: dict(counters) for key, counters in self.counters.items()}
+        for counters in data.values():
+            total = counters['hits'] + counters['misses']
+            counters['hit_ratio'] = round(counters['hits'] / total, 3) if total else None
+        return {'backend': type(self.backend).__name__, 'ttl': self.ttl, 'keys': data}
+
+
+class Generation:
+    """A shared "this changed" token for per-process caches (see module docstring)."""
+
+    def __init__(self, cache, key, interval=1.0):
+        self.cache = cache
+        self.key = key
+        self.interval = interval
+        self._seen = None
+        self._checked = float('-inf')
+
+    def bump(self):
+        self.cache.invalidate(self.key)
+
+    def due(self):
+        """True if the next `changed()` will read the token (callers on an event loop check this first)."""
+        return time.monotonic() - self._checked >= self.interval
+
+    def changed(self):
+        if not self.due():
+            return False
+        self._checked = time.monotonic()
+        token = self.cache.get(self.key, lambda: uuid.uuid4().hex)
+        seen, self._seen = self._seen, token
+        return seen is not None and token != seen
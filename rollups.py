@@ -0,0 +1,268 @@
+"""
+Daily utilization rollups for capacity reporting.
+
+`utilization_daily` and `utilization_department_daily`
+(migrations/0009_utilization_rollups.sql) hold, per day and hour, the slots a
+doctor's weekly template offered and the appointments in them (booked =
+not cancelled, plus confirmed / completed / cancelled), once per doctor and
+once per department. Doctor rows also carry the doctor's department and
+display name (migrations/0010), so the admin utilization report reads only
+these tables.
+
+Kept current in two ways:
+- `record_change(cur, before, after)` is an appointment change listener
+  (booking.on_appointment_change): bookings, status changes, reschedules and
+  deletes adjust the counts in the same transaction, like dashboard_stats.
+- `rebuild(conn, availability, day)` recomputes one day from the appointments
+  and the current weekly templates, replacing whatever the listener wrote, and
+  records the day in utilization_rollup_runs. Offered slots are only filled in
+  by a rebuild; run it nightly for the previous day (so the day is captured
+  with the schedules it actually had) and over a range to backfill:
+
+    python rollups.py                                  # yesterday
+    python rollups.py --from 2024-01-01 --to 2024-06-30
+
+As a fallback when the cron job didn't run, `NightlyRollup.start(connect)`
+checks every `interval` seconds on a background thread of each app worker
+(serve.py starts it) and rebuilds yesterday if no run has been recorded for it
+yet. A MySQL named lock keeps the workers from rebuilding the same day at once;
+the report itself never triggers a rebuild.
+
+Counts are attributed to the doctor's department at the time of the write;
+a rebuild reattributes the day to the current departments and names.
+"""
+
+import argparse
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from agenda import as_date
+from availability import SLOT_MINUTES, SLOTS_PER_DAY, to_minutes
+
+COUNTS = ('booked', 'confirmed', 'completed', 'cancelled')
+COLUMNS = ('offered',) + COUNTS
+NO_DEPARTMENT = 0
+
+
+def counts_for(status):
+    """(booked, confirmed, completed, cancelled) contribution of one appointment."""
+    return (int(status != 'Cancelled'), int(status == 'Confirmed'),
+            int(status == 'Completed'), int(status == 'Cancelled'))
+
+
+def hour_of(start_time):
+    minutes = to_minutes(start_time)
+    return minutes // 60 if minutes is not None else 0
+
+
+# ---------- incremental ----------
+def bump(cur, day, doctor_id, hour, deltas):
+    updates = ', '.join(f'{c} = {c} + VALUES({c})' for c in COUNTS)
+    cur.execute(f"""
+        INSERT INTO utilization_daily (day, doctor_id, department_id, doctor_name, hour, {', '.join(COUNTS)})
+        SELECT %s, d.doctor_id, COALESCE(d.department_id, {NO_DEPARTMENT}), COALESCE(u.full_name, u.username),
+               %s, %s, %s, %s, %s
+        FROM doctors d
+        JOIN users u ON d.user_id = u.user_id
+        WHERE d.doctor_id = %s
+        ON DUPLICATE KEY UPDATE {updates}
+    """, (day, hour, *deltas, doctor_id))
+    cur.execute(f"""
+        INSERT INTO utilization_department_daily (day, department_id, hour, {', '.join(COUNTS)})
+        SELECT %s, COALESCE(department_id, {NO_DEPARTMENT}), %s, %s, %s, %s, %s
+        FROM doctors
+        WHERE doctor_id = %s
+        ON DUPLICATE KEY UPDATE {updates}
+    """, (day, hour, *deltas, doctor_id))
+
+
+def record_change(cur, before, after):
+    """Appointment change listener: `before`/`after` are row snapshots, None for insert/delete."""
+    deltas = defaultdict(lambda: [0] * len(COUNTS))
+    for snapshot, sign in ((before, -1), (after, 1)):
+        if snapshot:
+            key = (as_date(snapshot['appointment_date']), int(snapshot['doctor_id']),
+                   hour_of(snapshot['start_time']))
+            for i, n in enumerate(counts_for(snapshot['status'])):
+                deltas[key][i] += sign * n
+    for (day, doctor_id, hour), values in deltas.items():
+        if any(values):
+            bump(cur, day, doctor_id, hour, values)
+
+
+def subtract_appointments(cur, where, params):
+    """Take the appointments matching `where` out of the rollups before they are deleted in bulk
+    (e.g. by the cascade from deleting their patient or doctor), one bump per doctor, day and hour."""
+    cur.execute(f"""
+        SELECT appointment_date, doctor_id, HOUR(start_time),
+               SUM(status <> 'Cancelled'), SUM(status = 'Confirmed'),
+               SUM(status = 'Completed'), SUM(status = 'Cancelled')
+        FROM appointments
+        WHERE {where}
+        GROUP BY appointment_date, doctor_id, HOUR(start_time)
+    """, params)
+    for day, doctor_id, hour, *counts in cur.fetchall():
+        bump(cur, day, doctor_id, hour, [-int(n or 0) for n in counts])
+
+
+# ---------- rebuild ----------
+def offered_by_hour(week, day):
+    """{hour: offered slots} for one doctor's weekly template on `day`."""
+    mask = week[day.weekday()]
+    hours = defaultdict(int)
+    for i in range(SLOTS_PER_DAY):
+        if mask >> i & 1:
+            hours[i * SLOT_MINUTES // 60] += 1
+    return hours
+
+
+def rebuild(conn, availability, day):
+    """Recompute both rollups for `day` and commit; returns the number of doctor rows written."""
+    with conn.cursor() as cur:
+        # lock the day's rows first so concurrent listener updates wait for the rebuild
+        cur.execute("SELECT day FROM utilization_daily WHERE day = %s FOR UPDATE", (day,))
+        cur.fetchall()
+        cur.execute("SELECT day FROM utilization_department_daily WHERE day = %s FOR UPDATE", (day,))
+        cur.fetchall()
+
+        cur.execute(f"""
+            SELECT d.doctor_id, COALESCE(d.department_id, {NO_DEPARTMENT}), COALESCE(u.full_name, u.username)
+            FROM doctors d
+            JOIN users u ON d.user_id = u.user_id
+        """)
+        departments, names = {}, {}
+        for doctor_id, department_id, name in cur.fetchall():
+            departments[doctor_id], names[doctor_id] = department_id, name
+        rows = defaultdict(lambda: [0] * len(COLUMNS))      # (doctor_id, hour) -> offered + counts
+        for doctor_id, week in availability.weeks(conn, list(departments)).items():
+            for hour, offered in offered_by_hour(week, day).items():
+                rows[doctor_id, hour][0] = offered
+        cur.execute("""
+            SELECT doctor_id, HOUR(start_time),
+                   SUM(status <> 'Cancelled'), SUM(status = 'Confirmed'),
+                   SUM(status = 'Completed'), SUM(status = 'Cancelled')
+            FROM appointments
+            WHERE appointment_date = %s
+            GROUP BY doctor_id, HOUR(start_time)
+        """, (day,))
+        for doctor_id, hour, *counts in cur.fetchall():
+            rows[doctor_id, hour][1:] = [int(n or 0) for n in counts]
+
+        by_department = defaultdict(lambda: [0] * len(COLUMNS))
+        for (doctor_id, hour), values in rows.items():
+            target = by_department[departments.get(doctor_id, NO_DEPARTMENT), hour]
+            for i, n in enumerate(values):
+                target[i] += n
+
+        placeholders = ', '.join(['%s'] * (3 + len(COLUMNS)))
+        cur.execute("DELETE FROM utilization_daily WHERE day = %s", (day,))
+        cur.executemany(f"INSERT INTO utilization_daily (day, doctor_id, department_id, doctor_name, hour, "
+                        f"{', '.join(COLUMNS)}) VALUES (%s, %s, {placeholders})",
+                        [(day, doctor_id, departments.get(doctor_id, NO_DEPARTMENT), names.get(doctor_id),
+                          hour, *values)
+                         for (doctor_id, hour), values in rows.items()])
+        cur.execute("DELETE FROM utilization_department_daily WHERE day = %s", (day,))
+        cur.executemany(f"INSERT INTO utilization_department_daily (day, department_id, hour, {', '.join(COLUMNS)}) "
+                        f"VALUES ({placeholders})",
+                        [(day, department_id, hour, *values)
+                         for (department_id, hour), values in by_department.items()])
+        cur.execute("""
+            INSERT INTO utilization_rollup_runs (day) VALUES (%s)
+            ON DUPLICATE KEY UPDATE rebuilt_at = CURRENT_TIMESTAMP
+        """, (day,))
+    conn.commit()
+    return len(rows)
+
+
+def last_run(conn):
+    """Most recent rolled-up day and when it was rebuilt, or (None, None)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT day, rebuilt_at FROM utilization_rollup_runs ORDER BY day DESC LIMIT 1")
+        return cur.fetchone() or (None, None)
+
+
+class NightlyRollup:
+    """Rebuilds yesterday at most once per `interval` seconds per process, if it hasn't been rebuilt yet."""
+
+    LOCK_NAME = 'utilization_rollup'
+
+    def __init__(self, availability, interval=3600):
+        self.availability = availability
+        self.interval = interval
+        self._last = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, connect):
+        """Run `maybe_run` every `interval` seconds on a daemon thread (call in each worker, after forking)."""
+        if not self.interval or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._loop, args=(connect,), name='utilization-rollup', daemon=True)
+        self._thread.start()
+
+    def _loop(self, connect):
+        while True:
+            conn = None
+            try:
+                conn = connect()
+                self.maybe_run(conn)
+            except Exception:
+                logging.exception('Utilization rollup check failed')
+            finally:
+                if conn is not None:
+                    conn.close()
+            time.sleep(self.interval)
+
+    def maybe_run(self, conn):
+        if not self.interval or time.monotonic() - self._last < self.interval:
+            return None
+        if not self._lock.acquire(blocking=False):
+            return None
+        locked = False
+        try:
+            self._last = time.monotonic()
+            yesterday = date.today() - timedelta(days=1)
+            with conn.cursor() as cur:
+                # another worker may be on it already
+                cur.execute("SELECT GET_LOCK(%s, 0)", (self.LOCK_NAME,))
+                locked = bool(cur.fetchone()[0])
+                if not locked:
+                    return None
+                cur.execute("SELECT 1 FROM utilization_rollup_runs WHERE day = %s", (yesterday,))
+                if cur.fetchone():
+                    return None
+            return rebuild(conn, self.availability, yesterday)
+        except Exception:
+            logging.exception('Utilization rollup failed')
+            conn.rollback()
+            return None
+        finally:
+            if locked:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT RELEASE_LOCK(%s)", (self.LOCK_NAME,))
+                    cur.fetchone()
+            self._lock.release()
+
+
+if __name__ == '__main__':
+    from app import availability, db_pool
+
+    parser = argparse.ArgumentParser(description='Rebuild the daily utilization rollups.')
+    parser.add_argument('--from', dest='start', type=date.fromisoformat, help='first day (default: yesterday)')
+    parser.add_argument('--to', dest='end', type=date.fromisoformat, help='last day (default: --from)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    start = args.start or date.today() - timedelta(days=1)
+    end = args.end or start
+    conn = db_pool.acquire()
+    try:
+        day = start
+        while day <= end:
+            logging.info('%s: %d doctor-hour rows', day, rebuild(conn, availability, day))
+            day += timedelta(days=1)
+    finally:
+        conn.close()
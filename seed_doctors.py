@@ -1,25 +1,53 @@
 """
 Seed script for inserting departments, users (doctors), doctors and doctor_schedules.
 
-Usage: python seed_doctors.py
+Usage:
+    python seed_doctors.py                      # built-in DOCTORS list
+    python seed_doctors.py --file staff.csv     # or staff.json
+    python seed_doctors.py --file staff.csv --batch 2000 --clear
 
 This script uses the same DB config as `app.py` and will:
 - create departments (if not exists)
 - create user accounts for each doctor (password set to 'password123' - change after seeding)
 - create doctors entries linked to users
 - create doctor_schedules rows for availability
+- recount the admin dashboard counters (dashboard_stats.reconcile)
+
+Loading is set-based: departments and existing users are resolved with IN
+queries and rows are written with batched `executemany` in a few transactions,
+so thousands of doctors load in seconds. Re-running with the same input is
+safe: users are matched by email, doctors by user_id (existing rows are
+updated), and each loaded doctor's schedule is replaced.
+
+CSV columns: name, email, dept, gender, specialization, years, available_days,
+available_time, short_profile, photo_url, password, schedules, where schedules
+looks like "Monday 09:00-13:00; Wednesday 10:00-14:00". JSON is a list of
+objects with the same keys (schedules may also be [[day, start, end], ...]).
+Only email and dept are required. Schedule and available_time ranges must
+start on the half-hour slot grid; doctors with other ranges are skipped with
+a warning.
 
 Notes / assumptions:
 - Table names expected: `departments`, `users`, `doctors`, `doctor_schedules`.
 - `users` is expected to accept columns (username, password_hash, email, user_type).
 - `doctors` is expected to accept at least (user_id, specialization, department_id, years_of_experience, available_days, available_time, short_profile, photo_url).
-- `doctor_schedules` is expected to accept (doctor_id, day_of_week, start_time, end_time).
+- `doctor_schedules` is expected to accept (doctor_id, weekday, start_time, end_time),
+  weekday 0-6 from Monday (migrations/0005); input files still use day names.
 
 If your schema is different, adapt the script accordingly.
 """
 
+import argparse
+import csv
+import json
+import time
+
 from werkzeug.security import generate_password_hash
-from app import get_db_connection
+import dashboard_stats
+from availability import check_range, parse_available_time, to_minutes
+from app import get_db_connection, ref_cache, DOCTOR_DIRECTORY
+from app import invalidate_availability, invalidate_doctor_profiles, invalidate_doctor_search
+from app import DEPARTMENTS as DEPARTMENTS_KEY
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -95,168 +123,310 @@ PHOTO_FALLBACKS = {
 }
 
 
-def ensure_departments(conn):
-    with conn.cursor() as cursor:
-        for dept_id, name in DEPARTMENTS:
-            # Try to find by name first
-            cursor.execute("SELECT department_id FROM departments WHERE name = %s", (name,))
-            row = cursor.fetchone()
-            if row:
-                logging.info('Department exists: %s -> id=%s', name, row[0])
+SCHEDULE_DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+DOCTOR_COLUMNS = ('specialization', 'department_id', 'years_of_experience', 'available_days',
+                  'available_time', 'short_profile', 'photo_url')
+
+
+# ---------- input ----------
+def parse_schedules(value):
+    """[(day, start, end)] from a list of triples or a string like 'Monday 09:00-13:00; Wednesday 10:00-14:00'."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        schedules = []
+        for part in value.split(';'):
+            part = part.strip()
+            if not part:
                 continue
-            try:
-                cursor.execute("INSERT INTO departments (name) VALUES (%s)", (name,))
-                conn.commit()
-                logging.info('Inserted department: %s', name)
-            except Exception as e:
-                logging.exception('Failed to insert department %s: %s', name, e)
+            day, _, hours = part.partition(' ')
+            start, _, end = hours.strip().partition('-')
+            schedules.append((day.strip(), start.strip(), end.strip()))
+        value = schedules
+    schedules = []
+    for day, start, end in value:
+        day = day.strip().capitalize()
+        if day not in SCHEDULE_DAYS:
+            raise ValueError(f'unknown day {day!r}')
+        schedules.append((day, start, end))
+    return schedules
 
 
-def get_or_create_user(conn, name, email, password='password123'):
-    username = email.split('@')[0]
-    pw_hash = generate_password_hash(password)
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (email,))
-        row = cursor.fetchone()
-        if row:
-            return row[0]
+def schedule_problem(doc):
+    """Why `doc`'s schedules or available_time can't be saved as slots, or None."""
+    ranges = [(to_minutes(start), to_minutes(end)) for _, start, end in doc.get('schedules') or ()]
+    ranges += [(start, end) for _, start, end in parse_available_time(doc.get('available_time'))]
+    for start, end in ranges:
+        problem = check_range(start, end)
+        if problem:
+            return problem
+    return None
+
+
+def load_doctors(path):
+    """Doctor dicts (same keys as DOCTORS) from a .csv or .json file."""
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+
+    doctors = []
+    first = 1 if path.lower().endswith('.json') else 2     # CSV line 1 is the header
+    for line, row in enumerate(rows, start=first):
+        row = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+        row = {k: v for k, v in row.items() if v not in (None, '')}
+        if not row.get('email') or not row.get('dept'):
+            logging.warning('Row %d: email and dept are required; skipped', line)
+            continue
         try:
-            cursor.execute(
-                "INSERT INTO users (username, password_hash, email, user_type, full_name, is_active) VALUES (%s, %s, %s, 'doctor', %s, TRUE)",
-                (username, pw_hash, email, name)
-            )
-            conn.commit()
-            return cursor.lastrowid
-        except Exception:
-            # Try without full_name column (some schemas don't have it)
-            try:
-                cursor.execute(
-                    "INSERT INTO users (username, password_hash, email, user_type) VALUES (%s, %s, %s, 'doctor')",
-                    (username, pw_hash, email)
-                )
-                conn.commit()
-                return cursor.lastrowid
-            except Exception:
-                logging.exception('Failed to create user for %s (%s)', name, email)
-                return None
-
-
-def find_department_id(conn, dept_name):
+            row['schedules'] = parse_schedules(row.get('schedules'))
+            row['years'] = int(row['years']) if 'years' in row else None
+        except ValueError as e:
+            logging.warning('Row %d (%s): %s; skipped', line, row['email'], e)
+            continue
+        row['email'] = row['email'].lower()
+        row.setdefault('name', row['email'].split('@')[0])
+        row.setdefault('specialization', row['dept'])
+        doctors.append(row)
+    return doctors
+
+
+# ---------- bulk helpers ----------
+def table_columns(cursor, table):
+    cursor.execute(f"SHOW COLUMNS FROM {table}")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def select_in(cursor, sql, values, batch):
+    """Run `sql` (containing one `IN ({})`) for `values` in chunks; returns all rows."""
+    rows = []
+    for part in chunks(list(values), batch):
+        cursor.execute(sql.format(', '.join(['%s'] * len(part))), tuple(part))
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def upsert_departments(conn, names, batch):
+    """{name: department_id}, inserting the missing names in one statement."""
     with conn.cursor() as cursor:
-        cursor.execute("SELECT department_id FROM departments WHERE name = %s", (dept_name,))
-        row = cursor.fetchone()
-        if row:
-            return row[0]
-        return None
+        existing = dict((name, dept_id) for dept_id, name in
+                        select_in(cursor, "SELECT department_id, name FROM departments WHERE name IN ({})", names, batch))
+        missing = [(name,) for name in names if name not in existing]
+        if missing:
+            cursor.executemany("INSERT INTO departments (name) VALUES (%s)", missing)
+            existing.update((name, dept_id) for dept_id, name in
+                            select_in(cursor, "SELECT department_id, name FROM departments WHERE name IN ({})",
+                                      [m[0] for m in missing], batch))
+        conn.commit()
+    logging.info('Departments: %d existing, %d inserted', len(names) - len(missing), len(missing))
+    return existing
 
 
-def create_doctor(conn, user_id, doc, dept_id, photo_path):
+def upsert_users(conn, doctors, default_password, batch):
+    """{email: user_id}; creates doctor accounts for emails not in `users` yet."""
+    emails = [doc['email'] for doc in doctors]
     with conn.cursor() as cursor:
-        try:
-            cursor.execute(
-                "INSERT INTO doctors (user_id, specialization, department_id, years_of_experience, available_days, available_time, short_profile, photo_url) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-                (user_id, doc['specialization'], dept_id, doc['years'], doc['available_days'], doc['available_time'], doc.get('short_profile'), photo_path)
-            )
-            conn.commit()
-            return cursor.lastrowid
-        except Exception:
-            logging.warning('Insert with full columns failed for %s, trying fallback inserts', doc['name'])
-            try:
-                # Try without short_profile
-                cursor.execute(
-                    "INSERT INTO doctors (user_id, specialization, department_id, years_of_experience, available_days, available_time, photo_url) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                    (user_id, doc['specialization'], dept_id, doc['years'], doc['available_days'], doc['available_time'], photo_path)
-                )
-                conn.commit()
-                return cursor.lastrowid
-            except Exception:
-                logging.warning('Insert without short_profile failed for %s, trying minimal insert', doc['name'])
-                try:
-                    # Minimal insert: some schemas only have basic columns
-                    cursor.execute(
-                        "INSERT INTO doctors (user_id, specialization, department_id, years_of_experience) VALUES (%s, %s, %s, %s)",
-                        (user_id, doc['specialization'], dept_id, doc['years'])
-                    )
-                    conn.commit()
-                    return cursor.lastrowid
-                except Exception:
-                    logging.exception('Failed to insert doctor %s after fallbacks', doc['name'])
-                    return None
-
-
-def create_schedules(conn, doctor_id, schedules):
+        columns = table_columns(cursor, 'users')
+        existing = dict((email.lower(), user_id) for user_id, email in
+                        select_in(cursor, "SELECT user_id, email FROM users WHERE email IN ({})", emails, batch))
+        new_docs = [doc for doc in doctors if doc['email'] not in existing]
+
+        # usernames are the email's local part; disambiguate clashes with the domain
+        candidates = {doc['email']: doc['email'].split('@')[0] for doc in new_docs}
+        taken = {row[0].lower() for row in
+                 select_in(cursor, "SELECT username FROM users WHERE username IN ({})", set(candidates.values()), batch)}
+
+        # accounts sharing an initial password share one hash computation
+        hashes = {}
+        rows = []
+        for doc in new_docs:
+            username = candidates[doc['email']]
+            if username.lower() in taken:
+                base = f"{username}.{doc['email'].split('@')[1].split('.')[0]}"
+                username, n = base, 1
+                while username.lower() in taken:
+                    n += 1
+                    username = f'{base}{n}'
+            taken.add(username.lower())
+            password = doc.get('password') or default_password
+            if password not in hashes:
+                hashes[password] = generate_password_hash(password)
+            row = [username, hashes[password], doc['email']]
+            if 'full_name' in columns:
+                row.append(doc['name'])
+            rows.append(tuple(row))
+
+        if rows:
+            names = 'username, password_hash, email, user_type' + (', full_name' if 'full_name' in columns else '')
+            values = "%s, %s, %s, 'doctor'" + (', %s' if 'full_name' in columns else '')
+            for part in chunks(rows, batch):
+                cursor.executemany(f"INSERT INTO users ({names}) VALUES ({values})", part)
+            existing.update((email.lower(), user_id) for user_id, email in
+                            select_in(cursor, "SELECT user_id, email FROM users WHERE email IN ({})",
+                                      [doc['email'] for doc in new_docs], batch))
+        conn.commit()
+    logging.info('Users: %d existing, %d inserted', len(doctors) - len(new_docs), len(new_docs))
+    return existing
+
+
+def upsert_doctors(conn, doctors, user_ids, dept_ids, batch):
+    """{user_id: doctor_id}; updates existing doctor rows and inserts the rest."""
     with conn.cursor() as cursor:
-        for day, start, end in schedules:
-            try:
-                cursor.execute(
-                    "INSERT INTO doctor_schedules (doctor_id, day_of_week, start_time, end_time) VALUES (%s, %s, %s, %s)",
-                    (doctor_id, day, start, end)
-                )
-            except Exception:
-                logging.exception('Failed to insert schedule %s for doctor_id=%s', day, doctor_id)
+        available = table_columns(cursor, 'doctors')
+        columns = [c for c in DOCTOR_COLUMNS if c in available]
+        existing = dict(select_in(cursor, "SELECT user_id, doctor_id FROM doctors WHERE user_id IN ({})",
+                                  [user_ids[doc['email']] for doc in doctors], batch))
+
+        # gender-aware photo fallbacks, round-robin as in the original seeder
+        counters = {'male': 0, 'female': 0, None: 0}
+        combined = PHOTO_FALLBACKS['male'] + PHOTO_FALLBACKS['female']
+        inserts, updates = [], []
+        for doc in doctors:
+            photo = doc.get('photo_url')
+            if not photo:
+                gender = doc.get('gender') if doc.get('gender') in PHOTO_FALLBACKS else None
+                choices = PHOTO_FALLBACKS[gender] if gender else combined
+                photo = choices[counters[gender] % len(choices)]
+                counters[gender] += 1
+            values = {
+                'specialization': doc.get('specialization'),
+                'department_id': dept_ids[doc['dept']],
+                'years_of_experience': doc.get('years'),
+                'available_days': doc.get('available_days'),
+                'available_time': doc.get('available_time'),
+                'short_profile': doc.get('short_profile'),
+                'photo_url': photo,
+            }
+            user_id = user_ids[doc['email']]
+            row = tuple(values[c] for c in columns)
+            if user_id in existing:
+                updates.append(row + (existing[user_id],))
+            else:
+                inserts.append((user_id,) + row)
+
+        for part in chunks(inserts, batch):
+            cursor.executemany(
+                f"INSERT INTO doctors (user_id, {', '.join(columns)}) VALUES ({', '.join(['%s'] * (len(columns) + 1))})",
+                part)
+        for part in chunks(updates, batch):
+            cursor.executemany(
+                f"UPDATE doctors SET {', '.join(c + ' = %s' for c in columns)} WHERE doctor_id = %s", part)
+        if inserts:
+            existing.update(select_in(cursor, "SELECT user_id, doctor_id FROM doctors WHERE user_id IN ({})",
+                                      [row[0] for row in inserts], batch))
         conn.commit()
+    logging.info('Doctors: %d updated, %d inserted', len(updates), len(inserts))
+    return existing
+
+
+def replace_schedules(conn, doctors, user_ids, doctor_ids, batch):
+    """Replace the weekly schedule of every loaded doctor that has one in the input."""
+    rows, ids = [], []
+    for doc in doctors:
+        if not doc.get('schedules'):
+            continue
+        doctor_id = doctor_ids[user_ids[doc['email']]]
+        ids.append(doctor_id)
+        rows.extend((doctor_id, SCHEDULE_DAYS.index(day), start, end) for day, start, end in doc['schedules'])
+    with conn.cursor() as cursor:
+        for part in chunks(ids, batch):
+            cursor.execute(f"DELETE FROM doctor_schedules WHERE doctor_id IN ({', '.join(['%s'] * len(part))})",
+                           tuple(part))
+        for part in chunks(rows, batch):
+            cursor.executemany(
+                "INSERT INTO doctor_schedules (doctor_id, weekday, start_time, end_time) VALUES (%s, %s, %s, %s)",
+                part)
+        conn.commit()
+    logging.info('Schedules: %d rows for %d doctors', len(rows), len(ids))
+    return len(rows)
+
+
+def seed(conn, doctors, department_names=(), password='password123', batch=1000, clear=False):
+    """Load `doctors` in a few set-based transactions; safe to re-run with the same input.
+
+    Users are matched by email and doctors by user_id; existing rows are updated
+    rather than duplicated, and each loaded doctor's schedule is replaced.
+    Returns (rows written, seconds, touched doctor ids).
+    """
+    started = time.perf_counter()
+    # one entry per email; the last occurrence wins
+    doctors = list({doc['email']: doc for doc in doctors}.values())
+    # slots are a fixed half-hour grid; an off-grid start would silently lose its first slot
+    valid = []
+    for doc in doctors:
+        problem = schedule_problem(doc)
+        if problem:
+            logging.warning('%s: schedule %s; skipped', doc['email'], problem)
+        else:
+            valid.append(doc)
+    doctors = valid
+    names = list(dict.fromkeys(list(department_names) + [doc['dept'] for doc in doctors]))
+
+    dept_ids = upsert_departments(conn, names, batch)
+    touched = set()
+    if clear:
+        # wipe schedules of every doctor in the seeded departments first
+        with conn.cursor() as cursor:
+            ids = [dept_ids[name] for name in names]
+            touched.update(r[0] for r in select_in(
+                cursor, "SELECT doctor_id FROM doctors WHERE department_id IN ({})", ids, batch))
+            for part in chunks(ids, batch):
+                cursor.execute("DELETE ds FROM doctor_schedules ds JOIN doctors d ON ds.doctor_id = d.doctor_id "
+                               f"WHERE d.department_id IN ({', '.join(['%s'] * len(part))})", tuple(part))
+            conn.commit()
+        logging.info('Cleared schedules for departments: %s', ids)
+
+    user_ids = upsert_users(conn, doctors, password, batch)
+    doctor_ids = upsert_doctors(conn, doctors, user_ids, dept_ids, batch)
+    schedules = replace_schedules(conn, doctors, user_ids, doctor_ids, batch)
+    touched.update(doctor_ids[user_ids[doc['email']]] for doc in doctors)
+
+    rows = len(names) + 2 * len(doctors) + schedules
+    return rows, time.perf_counter() - started, touched
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Bulk, re-runnable seeding of departments, doctor accounts and schedules.')
+    parser.add_argument('--file', help='CSV or JSON file of doctors (defaults to the built-in DOCTORS list)')
+    parser.add_argument('--batch', type=int, default=1000, help='rows per executemany / IN list')
+    parser.add_argument('--password', default='password123', help='initial password for new accounts')
+    parser.add_argument('--clear', action='store_true', help='delete existing schedules in the seeded departments first')
+    args = parser.parse_args()
+
+    if args.file:
+        doctors, departments = load_doctors(args.file), []
+    else:
+        doctors, departments = [dict(d) for d in DOCTORS], [name for _, name in DEPARTMENTS]
+    if not doctors:
+        logging.error('No doctors to load')
+        return
+
     conn = get_db_connection()
     if not conn:
         logging.error('DB connection failed')
         return
 
     try:
-        ensure_departments(conn)
-        # optional clear: if --clear passed, remove schedules for these departments first
-        import sys
-        if '--clear' in sys.argv:
-            logging.info('Clearing existing doctor schedules for seeded departments...')
-            # find department ids for our DEPARTMENTS list
-            dept_names = [d[1] for d in DEPARTMENTS]
-            with conn.cursor() as cursor:
-                # get department ids
-                cursor.execute("SELECT department_id FROM departments WHERE name IN (%s)" % (', '.join(['%s']*len(dept_names))), tuple(dept_names))
-                dept_rows = cursor.fetchall()
-                dept_ids = [r[0] for r in dept_rows]
-                if dept_ids:
-                    # delete schedules for doctors in these departments
-                    cursor.execute("DELETE ds FROM doctor_schedules ds JOIN doctors d ON ds.doctor_id = d.doctor_id WHERE d.department_id IN (%s)" % (', '.join(['%s']*len(dept_ids))), tuple(dept_ids))
-                    conn.commit()
-                    logging.info('Deleted schedules for departments: %s', dept_ids)
-
-        # counters to give different photos to doctors of the same gender
-        male_i = 0
-        female_i = 0
-
-        for idx, doc in enumerate(DOCTORS):
-            logging.info('Processing %s', doc['name'])
-            user_id = get_or_create_user(conn, doc['name'], doc['email'])
-            if not user_id:
-                logging.error('Skipping doctor %s due to user creation failure', doc['name'])
-                continue
-
-            dept_id = find_department_id(conn, doc['dept'])
-            if not dept_id:
-                logging.warning('Department %s not found for %s; skipping', doc['dept'], doc['name'])
-                continue
-
-            # choose a gender-aware photo if gender provided, otherwise fallback round-robin
-            photo = None
-            gender = doc.get('gender')
-            if gender and gender in PHOTO_FALLBACKS:
-                if gender == 'male':
-                    photo = PHOTO_FALLBACKS['male'][male_i % len(PHOTO_FALLBACKS['male'])]
-                    male_i += 1
-                else:
-                    photo = PHOTO_FALLBACKS['female'][female_i % len(PHOTO_FALLBACKS['female'])]
-                    female_i += 1
-            else:
-                # round-robin across both lists
-                combined = PHOTO_FALLBACKS['male'] + PHOTO_FALLBACKS['female']
-                photo = combined[idx % len(combined)]
-            doctor_id = create_doctor(conn, user_id, doc, dept_id, photo)
-            if doctor_id and doc.get('schedules'):
-                create_schedules(conn, doctor_id, doc['schedules'])
-
-        logging.info('Seeding complete')
+        rows, seconds, touched = seed(conn, doctors, departments, args.password, args.batch, args.clear)
+        # new doctor accounts change the dashboard totals; recount rather than bump per row
+        dashboard_stats.reconcile(conn)
+        # the running app shares this cache file (unless REF_CACHE_BACKEND=memory)
+        ref_cache.invalidate(DOCTOR_DIRECTORY, DEPARTMENTS_KEY)
+        invalidate_availability()
+        invalidate_doctor_search()
+        invalidate_doctor_profiles(*touched)
+        logging.info('Seeding complete: %d doctors, %d rows in %.2fs (%.0f rows/s)',
+                     len(doctors), rows, seconds, rows / seconds if seconds else 0)
+    except Exception:
+        conn.rollback()
+        logging.exception('Seeding failed; the current batch was rolled back')
     finally:
         try:
             conn.close()
@@ -0,0 +1,199 @@
+"""
+Production launcher: runs app.py under gunicorn with a worker model sized
+from the machine and the connection pool.
+
+How the settings are picked (each can be overridden by a flag or env var):
+
+- worker class `gthread`: requests mostly wait on MySQL, and notification
+  streams (SSE) hold a thread for minutes, so each worker serves several
+  requests concurrently with threads.
+- threads per worker = DB_POOL_SIZE + NOTIFICATION_STREAMS: notification
+  streams (SSE) hold a thread but no connection while idle, and app.py
+  serves at most NOTIFICATION_STREAMS [50] of them per worker, so open
+  dashboards never take the DB_POOL_SIZE threads left for requests. Those
+  get one pooled connection each, so a busy worker rarely waits on the pool;
+  the pool, not the thread count, limits the real work. The overflow covers
+  bursts and the background connections (notification watcher, EXPLAIN,
+  nightly rollup).
+- workers = CPU count, to spread the Python work (templates, JSON) over the
+  cores, then reduced until workers x (DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW)
+  fits in DB_MAX_CONNECTIONS minus headroom for scripts and admin sessions.
+
+The app is preloaded in the master: templates are compiled and the
+reference caches (doctor directory, departments, doctor search index,
+availability templates)
+are loaded once before forking, so workers share them copy-on-write. The
+master closes its MySQL connections before forking. Each worker drops the
+SQLite handles it inherited and opens its own pool connections before
+taking traffic. On SIGTERM, workers stop accepting connections, finish
+in-flight requests for up to WEB_GRACEFUL_TIMEOUT seconds and close their
+connections.
+
+Usage:
+    python serve.py [--bind 0.0.0.0:8000] [--workers N] [--threads N]
+                    [--worker-class gthread|sync] [--print-config]
+
+Env: WEB_BIND [0.0.0.0:8000], WEB_WORKERS, WEB_THREADS, WEB_WORKER_CLASS,
+WEB_TIMEOUT [30], WEB_GRACEFUL_TIMEOUT [30], WEB_KEEPALIVE [5],
+WEB_ACCESS_LOG (path or "-"), DB_MAX_CONNECTIONS [151, MySQL's default].
+
+gunicorn runs on Linux and macOS only; on Windows use `python app.py`.
+
+The sizing rules above have not been measured yet: benchmarks/launcher_results.md
+has no numbers. Before relying on the defaults, run benchmarks/launcher_matrix.py
+on the deployment host (it compares them with sync workers, fewer workers with
+more threads, and one big worker) and commit the section it appends; rerun it
+after changing the rules.
+"""
+
+import argparse
+import logging
+import os
+
+CONNECTION_HEADROOM = 10      # left for migrate.py, seed scripts and admin sessions
+
+
+def plan(cpus, pool_size, max_overflow, max_connections, workers=None, threads=None, worker_class=None,
+         streams=0):
+    """Worker settings for this machine; explicit values are kept as given."""
+    threads = threads or pool_size + streams
+    per_worker = pool_size + max_overflow
+    budget = max(per_worker, max_connections - CONNECTION_HEADROOM)
+    notes = []
+    if workers is None:
+        workers = max(1, cpus)
+        if workers * per_worker > budget:
+            workers = max(1, budget // per_worker)
+            notes.append(f'workers capped at {workers}: each may open {per_worker} connections '
+                         f'and DB_MAX_CONNECTIONS is {max_connections}')
+    elif workers * per_worker > max_connections:
+        notes.append(f'{workers} workers may open {workers * per_worker} connections, '
+                     f'more than DB_MAX_CONNECTIONS ({max_connections})')
+    worker_class = worker_class or ('gthread' if threads > 1 else 'sync')
+    if worker_class == 'sync':
+        notes.append('sync workers handle one request at a time; notification streams will pin them')
+    elif streams and threads <= streams:
+        notes.append(f'{threads} threads per worker: up to {streams} notification streams (NOTIFICATION_STREAMS) '
+                     f'can take all of them')
+    return {'workers': workers, 'threads': threads, 'worker_class': worker_class, 'notes': notes}
+
+
+def env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def warm(hospital):
+    """Compile templates and load the shared caches in the master, before forking."""
+    env = hospital.app.jinja_env
+    compiled = 0
+    for name in env.list_templates(extensions=['html']):
+        try:
+            env.get_template(name)
+            compiled += 1
+        except Exception as e:
+            logging.warning('Template %s failed to compile: %s', name, e)
+
+    doctors = 0
+    conn = None
+    try:
+        conn = hospital.db_pool.acquire()
+        hospital.doctor_directory(conn)
+        hospital.department_list(conn)
+        hospital.doctor_search.build(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT doctor_id FROM doctors")
+            doctors = len(hospital.availability.weeks(conn, [r[0] for r in cur.fetchall()]))
+    except Exception as e:
+        logging.warning('Cache warm-up skipped: %s', e)
+    finally:
+        if conn is not None:
+            conn.close()
+        # no MySQL sockets may be inherited by the workers
+        hospital.db_pool.dispose()
+    logging.info('Preloaded %d templates and availability for %d doctors', compiled, doctors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the hospital app under gunicorn.')
+    parser.add_argument('--bind', default=os.environ.get('WEB_BIND', '0.0.0.0:8000'))
+    parser.add_argument('--workers', type=int, default=env_int('WEB_WORKERS'))
+    parser.add_argument('--threads', type=int, default=env_int('WEB_THREADS'))
+    parser.add_argument('--worker-class', default=os.environ.get('WEB_WORKER_CLASS'), choices=['gthread', 'sync'])
+    parser.add_argument('--print-config', action='store_true', help='show the computed settings and exit')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(message)s')
+    pool_size = int(os.environ.get('DB_POOL_SIZE', 10))
+    settings = plan(
+        cpus=os.cpu_count() or 1,
+        pool_size=pool_size,
+        max_overflow=int(os.environ.get('DB_POOL_MAX_OVERFLOW', 5)),
+        max_connections=int(os.environ.get('DB_MAX_CONNECTIONS', 151)),
+        workers=args.workers, threads=args.threads, worker_class=args.worker_class,
+        streams=int(os.environ.get('NOTIFICATION_STREAMS', 50)),
+    )
+    for note in settings.pop('notes'):
+        logging.warning(note)
+    config = dict(
+        settings,
+        bind=args.bind,
+        preload_app=True,
+        timeout=int(os.environ.get('WEB_TIMEOUT', 30)),
+        graceful_timeout=int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)),
+        keepalive=int(os.environ.get('WEB_KEEPALIVE', 5)),
+        accesslog=os.environ.get('WEB_ACCESS_LOG'),
+    )
+    if args.print_config:
+        for key, value in config.items():
+            print(f'{key:<18} {value}')
+        return
+
+    from gunicorn.app.base import BaseApplication
+
+    class Launcher(BaseApplication):
+        def load_config(self):
+            for key, value in config.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+            self.cfg.set('post_fork', post_fork)
+            self.cfg.set('post_worker_init', post_worker_init)
+            self.cfg.set('worker_exit', worker_exit)
+
+        def load(self):
+            import app as hospital
+            warm(hospital)
+            return hospital.app
+
+    Launcher().run()
+
+
+# ---------- worker hooks ----------
+def post_fork(server, worker):
+    import app as hospital
+    hospital.db_pool.dispose()
+    hospital.ref_cache.after_fork()
+    hospital.doctor_search.after_fork()
+    after_fork = getattr(hospital.app.session_interface, 'after_fork', None)
+    if after_fork:
+        after_fork()
+
+
+def post_worker_init(worker):
+    import app as hospital
+    try:
+        opened = hospital.db_pool.warm(worker.cfg.threads)
+        worker.log.info('Worker %s: %d pooled connections ready', worker.pid, opened)
+    except Exception as e:
+        worker.log.warning('Worker %s: connection warm-up failed: %s', worker.pid, e)
+    # fallback for a missed nightly `python rollups.py`; keeps rebuilds out of the report route
+    hospital.nightly_rollup.start(hospital.db_pool.acquire)
+
+
+def worker_exit(server, worker):
+    import app as hospital
+    hospital.db_pool.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Server-side session backend: an in-process LRU cache in front of a SQLite file.
+
+Replaces Flask-Session's filesystem mode (one pickle file per session, read and
+rewritten on every request):
+
+- sessions are JSON (Flask's tagged serializer) rows in one SQLite database in
+  WAL mode, so all workers on a host share them and readers never block writers
+- recently used sessions are kept in a per-process LRU; an entry is trusted for
+  `cache_ttl` seconds before the shared store is consulted again, which bounds
+  how long another worker's change (e.g. a logout) can go unseen
+- a session is written back only when it changed, or when more than
+  `refresh_after` of its lifetime has passed (to slide the expiry)
+- a background thread deletes expired rows every `sweep_interval` seconds,
+  using the app's PERMANENT_SESSION_LIFETIME
+"""
+
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+
+class StoreSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expires=0.0):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires = expires
+        self.modified = False
+
+
+class SQLiteSessionInterface(SessionInterface):
+    def __init__(self, path, cache_size=10000, cache_ttl=1.0, refresh_after=0.1, sweep_interval=300):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.refresh_after = refresh_after
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._cache = OrderedDict()     # sid -> (cached_at, expires, data)
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self.counters = {'cache_hits': 0, 'store_reads': 0, 'store_writes': 0, 'writes_skipped': 0, 'swept': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires)")
+
+    # ---------- storage ----------
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _cache_put(self, sid, expires, data):
+        with self._lock:
+            self._cache[sid] = (time.monotonic(), expires, data)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_drop(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def _load(self, sid):
+        """(expires, data) for a live session, or None."""
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(sid)
+            if cached and time.monotonic() - cached[0] < self.cache_ttl and cached[1] > now:
+                self._cache.move_to_end(sid)
+                self.counters['cache_hits'] += 1
+                return cached[1], cached[2]
+        self.counters['store_reads'] += 1
+        row = self._db().execute("SELECT data, expires FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if not row or row[1] <= now:
+            self._cache_drop(sid)
+            return None
+        data = session_json_serializer.loads(row[0])
+        self._cache_put(sid, row[1], data)
+        return row[1], data
+
+    def after_fork(self):
+        """Call in a forked child: drop the parent's SQLite handle and restart the sweeper lazily."""
+        self._local = threading.local()
+        self._sweeper = None
+        self._lock = threading.Lock()
+
+    def lookup(self, sid):
+        """Session data for a cookie value, or None (for servers outside Flask, e.g. api_async.py)."""
+        loaded = self._load(sid) if sid else None
+        return loaded[1] if loaded else None
+
+    # ---------- SessionInterface ----------
+    def open_session(self, app, request):
+        self._start_sweeper()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            loaded = self._load(sid)
+            if loaded:
+                expires, data = loaded
+                return StoreSession(dict(data), sid=sid, expires=expires)
+        return StoreSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self._db().execute("DELETE FROM sessions WHERE sid = ?", (session.sid,))
+                self._cache_drop(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        stale = session.expires - now < lifetime * (1 - self.refresh_after)
+        if not (session.modified or session.new or stale):
+            self.counters['writes_skipped'] += 1
+            return
+
+        expires = now + lifetime
+        data = dict(session)
+        self._db().execute("INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)",
+                           (session.sid, session_json_serializer.dumps(data), expires))
+        self.counters['store_writes'] += 1
+        self._cache_put(session.sid, expires, data)
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    # ---------- expiry ----------
+    def sweep(self):
+        deleted = self._db().execute("DELETE FROM sessions WHERE expires <= ?", (time.time(),)).rowcount
+        self.counters['swept'] += deleted
+        return deleted
+
+    def _start_sweeper(self):
+        if self._sweeper is not None or not self.sweep_interval:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception:
+                logging.exception('Session sweep failed')
@@ -0,0 +1,283 @@
+"""
+Per-request SQL profiling and slow-query log.
+
+`SQLProfiler.wrap(conn)` returns a proxy whose cursors time every `execute()`
+and `executemany()`. For each statement it records the normalized text
+(literals replaced by `?`, IN lists collapsed), the duration, the row count
+and the endpoint that ran it, and keeps:
+
+- per-endpoint totals: requests, queries, query time, worst request
+- per-statement totals: calls, total / max time, rows
+- a slow-query log: statements over `slow_ms` are logged with their EXPLAIN
+  plan, at most once per statement every `explain_interval` seconds. Plans are
+  run by a background thread after the request has finished, on a connection
+  from `explain_connect` (which should not wait for a busy pool: the plan is
+  skipped instead), so a slow request never holds two connections
+- N+1 suspects: a request that runs the same normalized statement
+  `n_plus_one` times or more is logged and counted
+
+Call `begin(endpoint)` when a request starts and `end()` when it finishes;
+queries outside a request are counted under the "-" endpoint.
+"""
+
+import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger('sql_profiler')
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Statement text with literals and placeholders replaced by `?`."""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class ProfiledCursor:
+    def __init__(self, cursor, profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._profiler.record(operation, params, time.perf_counter() - started, self._rowcount())
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._profiler.record(operation, None, time.perf_counter() - started, self._rowcount())
+
+    def _rowcount(self):
+        try:
+            return max(self._cursor.rowcount, 0)
+        except Exception:
+            return 0
+
+
+class ProfiledConnection:
+    """Proxy around a (pooled) connection whose cursors are profiled."""
+
+    def __init__(self, conn, profiler):
+        self._conn = conn
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return ProfiledCursor(self._conn.cursor(*args, **kwargs), self._profiler)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._conn.close()
+
+
+class SQLProfiler:
+    def __init__(self, slow_ms=200, n_plus_one=10, explain_connect=None, explain_interval=300,
+                 max_statements=500, slow_log_size=50):
+        self.slow_ms = slow_ms
+        self.n_plus_one = n_plus_one
+        self.explain_connect = explain_connect
+        self.explain_interval = explain_interval
+        self.max_statements = max_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._endpoints = {}        # endpoint -> totals
+        self._statements = {}       # normalized sql -> totals
+        self._suspects = {}         # (endpoint, normalized sql) -> {'requests', 'max_calls'}
+        self._explained = {}        # normalized sql -> last EXPLAIN time
+        self._pending = queue.Queue(maxsize=100)     # slow entries waiting for the explainer
+        self._explainer = None
+        self.slow_log = deque(maxlen=slow_log_size)
+
+    def wrap(self, conn):
+        return ProfiledConnection(conn, self)
+
+    # ---------- request scope ----------
+    def begin(self, endpoint):
+        self._local.request = {'endpoint': endpoint or '-', 'queries': 0, 'seconds': 0.0,
+                               'calls': {}, 'slow': []}
+
+    def end(self):
+        current = getattr(self._local, 'request', None)
+        self._local.request = None
+        if current is None:
+            return
+        endpoint = current['endpoint']
+        with self._lock:
+            totals = self._endpoints.setdefault(endpoint, {'requests': 0, 'queries': 0, 'seconds': 0.0,
+                                                           'max_queries': 0, 'max_seconds': 0.0})
+            totals['requests'] += 1
+            totals['queries'] += current['queries']
+            totals['seconds'] += current['seconds']
+            totals['max_queries'] = max(totals['max_queries'], current['queries'])
+            totals['max_seconds'] = max(totals['max_seconds'], current['seconds'])
+            for statement, calls in current['calls'].items():
+                if calls < self.n_plus_one:
+                    continue
+                suspect = self._suspects.setdefault((endpoint, statement), {'requests': 0, 'max_calls': 0})
+                suspect['requests'] += 1
+                suspect['max_calls'] = max(suspect['max_calls'], calls)
+                log.warning('Possible N+1 in %s: %d executions of %s', endpoint, calls, statement)
+        for entry in current['slow']:
+            self._log_slow(entry)
+
+    # ---------- recording ----------
+    def record(self, operation, params, seconds, rows):
+        statement = normalize(operation)
+        current = getattr(self._local, 'request', None)
+        endpoint = current['endpoint'] if current else '-'
+        with self._lock:
+            totals = self._statements.get(statement)
+            if totals is None:
+                if len(self._statements) >= self.max_statements:
+                    statement = '(other)'
+                totals = self._statements.setdefault(statement, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                                                 'rows': 0, 'endpoints': set(),
+                                                                 'sample': (operation, params)})
+            totals['calls'] += 1
+            totals['seconds'] += seconds
+            totals['max_seconds'] = max(totals['max_seconds'], seconds)
+            totals['rows'] += rows
+            totals['endpoints'].add(endpoint)
+        if current is not None:
+            current['queries'] += 1
+            current['seconds'] += seconds
+            current['calls'][statement] = current['calls'].get(statement, 0) + 1
+        if seconds * 1000 >= self.slow_ms:
+            entry = {'endpoint': endpoint, 'statement': statement, 'sql': operation, 'params': params,
+                     'ms': round(seconds * 1000, 1), 'rows': rows, 'at': time.time()}
+            if current is not None:
+                # EXPLAIN after the request, not while the route still has unread results
+                current['slow'].append(entry)
+            else:
+                self._log_slow(entry)
+
+    def _log_slow(self, entry):
+        if self.explain_connect:
+            self._start_explainer()
+            try:
+                self._pending.put_nowait(entry)
+                return
+            except queue.Full:
+                pass        # log it without a plan rather than make the request wait
+        self._write_slow(entry, None)
+
+    def _start_explainer(self):
+        if self._explainer is not None and self._explainer.is_alive():
+            return
+        with self._lock:
+            # a thread started before a fork is not alive in the child
+            if self._explainer is not None and self._explainer.is_alive():
+                return
+            self._explainer = threading.Thread(target=self._explain_loop, name='sql-explainer', daemon=True)
+            self._explainer.start()
+
+    def _explain_loop(self):
+        while True:
+            entry = self._pending.get()
+            try:
+                self._write_slow(entry, self._explain(entry))
+            except Exception:
+                log.exception('Slow query logging failed')
+
+    def _write_slow(self, entry, explain):
+        entry['explain'] = explain
+        with self._lock:
+            self.slow_log.append({k: v for k, v in entry.items() if k not in ('sql', 'params')})
+        log.warning('Slow query (%.1f ms, %d rows) in %s: %s\nEXPLAIN: %s', entry['ms'], entry['rows'],
+                    entry['endpoint'], entry['statement'], entry['explain'] or 'n/a')
+
+    def _explain(self, entry):
+        sql = entry['sql'].decode() if isinstance(entry['sql'], (bytes, bytearray)) else entry['sql']
+        if not self.explain_connect or not sql.lstrip().upper().startswith('SELECT'):
+            return None
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained.get(entry['statement'])
+            if last is not None and now - last < self.explain_interval:
+                return None
+            self._explained[entry['statement']] = now
+        conn = None
+        try:
+            conn = self.explain_connect()
+            with conn.cursor(dictionary=True) as cur:
+                cur.execute('EXPLAIN ' + sql, entry['params'] or ())
+                return cur.fetchall()
+        except Exception as e:
+            # e.g. PoolExhausted: skipped rather than queued behind the requests
+            return f'EXPLAIN failed: {e}'
+        finally:
+            if conn is not None:
+                conn.close()
+
+    # ---------- reporting ----------
+    def report(self, top=25):
+        with self._lock:
+            endpoints = [dict(endpoint=name, **totals) for name, totals in self._endpoints.items()]
+            statements = [dict(statement=sql, **{k: v for k, v in totals.items() if k not in ('endpoints', 'sample')},
+                               endpoints=sorted(totals['endpoints']))
+                          for sql, totals in self._statements.items()]
+            suspects = [dict(endpoint=endpoint, statement=sql, **data)
+                        for (endpoint, sql), data in self._suspects.items()]
+            slow = list(self.slow_log)
+        for row in endpoints:
+            row['avg_queries'] = round(row['queries'] / row['requests'], 1) if row['requests'] else 0
+            row['avg_ms'] = round(1000 * row['seconds'] / row['requests'], 2) if row['requests'] else 0
+            row['total_ms'] = round(1000 * row.pop('seconds'), 1)
+            row['max_ms'] = round(1000 * row.pop('max_seconds'), 1)
+        for row in statements:
+            row['avg_ms'] = round(1000 * row['seconds'] / row['calls'], 2) if row['calls'] else 0
+            row['total_ms'] = round(1000 * row.pop('seconds'), 1)
+            row['max_ms'] = round(1000 * row.pop('max_seconds'), 1)
+        endpoints.sort(key=lambda r: r['total_ms'], reverse=True)
+        statements.sort(key=lambda r: r['total_ms'], reverse=True)
+        suspects.sort(key=lambda r: r['max_calls'], reverse=True)
+        return {'endpoints': endpoints, 'statements': statements[:top], 'n_plus_one': suspects,
+                'slow_queries': slow[::-1], 'slow_ms': self.slow_ms, 'n_plus_one_threshold': self.n_plus_one}
+
+    def samples(self):
+        """{normalized statement: (first raw sql, its params, endpoints)} for EXPLAIN tooling."""
+        with self._lock:
+            return {sql: (totals['sample'][0], totals['sample'][1], sorted(totals['endpoints']))
+                    for sql, totals in self._statements.items() if sql != '(other)'}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._statements.clear()
+            self._suspects.clear()
+            self.slow_log.clear()
@@ -0,0 +1,32 @@
+from availability import DEFAULT_DAY_MASK, build_week, check_range, mask_to_slots, range_mask
+
+
+def test_range_mask_on_grid():
+    assert mask_to_slots(range_mask(9 * 60, 11 * 60)) == ['09:00', '09:30', '10:00', '10:30']
+
+
+def test_range_mask_partial_end_slot_is_offered():
+    assert mask_to_slots(range_mask(9 * 60, 10 * 60 + 15)) == ['09:00', '09:30', '10:00']
+
+
+def test_range_mask_rounds_off_grid_start_up():
+    # documented behaviour; check_range rejects such starts before they are saved
+    assert mask_to_slots(range_mask(9 * 60 + 15, 10 * 60 + 30)) == ['09:30', '10:00']
+
+
+def test_check_range():
+    assert check_range(9 * 60, 12 * 60) is None
+    assert 'slot boundary' in check_range(9 * 60 + 15, 12 * 60)
+    assert 'ends before' in check_range(12 * 60, 9 * 60)
+    assert check_range(None, 9 * 60) == 'invalid time'
+
+
+def test_build_week_combines_text_and_schedule_rows():
+    week = build_week('Mon 09:00-10:00', [(2, '14:00', '15:00')])
+    assert mask_to_slots(week[0]) == ['09:00', '09:30']
+    assert mask_to_slots(week[2]) == ['14:00', '14:30']
+    assert week[1] == 0
+
+
+def test_build_week_defaults_without_hours():
+    assert build_week('', []) == (DEFAULT_DAY_MASK,) * 7